@@ -1,8 +1,19 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, Response, render_template, jsonify, request, stream_with_context
+import json
+import math
 import threading
 import time
 import logging # Para depuración
+import os
 from simulation import SimulationManager # Importa tu clase
+import checkpoint
+from eventos import ExportadorEventos, TIPOS_POR_NOMBRE
+from trayectoria import GrabadorTrayectoria, HistorialTrayectoria
+from muertes import ArchivoMuertes
+from especies import EspeciesEnLinea
+from control import ControlVelocidad, INTERVALO_MAXIMO_MS
+from metricas import LockMedido
+from instantaneas import PublicadorInstantaneas
 
 # Configuración básica de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -14,13 +25,58 @@ SIM_WIDTH = 30
 SIM_HEIGHT = 20
 INITIAL_SNAKES = 5
 INITIAL_FOOD = 10
-SIM_SPEED_MS = 500 # Milisegundos entre pasos
+SIM_SPEED_MS = 500 # Milisegundos entre pasos al arrancar (se puede cambiar con /velocidad/config)
+SIM_TURBO = 1 # Pasos por lote (con el lock tomado una vez); más de 1 es el modo turbo
+SIM_MOTOR = 'python' # 'python' (simulation.py) o 'numpy' (simulation_numpy.py, vectorizado para poblaciones grandes)
+EVENTOS_ACTIVOS = False # Trazado de eventos al arrancar (se puede cambiar en caliente con /eventos/config)
+EVENTOS_INTERVALO_S = 5.0 # Cada cuánto se vuelcan los eventos nuevos al log
+EVENTOS_MUESTREO = 100 # Se vuelca 1 de cada N eventos
+SIM_SEED = None # Semilla de la simulación (None: una al azar, que queda guardada en /replay)
+CHECKPOINT_RUTA = 'checkpoints/simulacion.ckpt' # Estado guardado (solo motor python); None para desactivar
+CHECKPOINT_INTERVALO_S = 300 # Cada cuánto se guarda mientras corre (además de al cerrar)
+CHECKPOINT_COMPRESION = 'zlib' # 'ninguna', 'zlib' o 'lzma'
+METRICAS_ACTIVAS = False # Tiempos por fase de step() al arrancar (se puede cambiar con /metricas/config)
+TRAYECTORIA_RUTA = 'trayectorias/simulacion' # Grabación de cada paso para /game_state?paso=N (solo motor python); None para desactivar
+TRAYECTORIA_KEYFRAME_CADA = 1000 # Pasos entre keyframes de la grabación
+HISTORIAL_FOTOGRAMAS = 2000 # Fotogramas decodificados que se guardan en la caché LRU
+MUERTES_RUTA = None # Directorio donde volcar por bloques el archivo de muertes; None: solo en memoria
+ESPECIES_ACTIVAS = False # Agrupar los genomas en especies al arrancar (se puede cambiar con /especies/config)
+INSTANTANEA_CADA_MS = 50 # A toda velocidad, como mucho una instantánea publicada cada N ms (la web pide cada 150)
 
-# ¡Importante! Crear un Lock para proteger el acceso al estado de la simulación
-simulation_lock = threading.Lock()
+# ¡Importante! Crear un Lock para proteger el acceso al estado de la simulación.
+# Solo lo toman el hilo de simulación y las rutas que cambian el estado; las lecturas
+# usan la última instantánea publicada. LockMedido anota cuánto espera cada uno.
+simulation_lock = LockMedido()
+publicador = PublicadorInstantaneas()
 try:
-    simulation = SimulationManager(SIM_WIDTH, SIM_HEIGHT, INITIAL_SNAKES, INITIAL_FOOD)
-    logging.info("SimulationManager inicializado correctamente.")
+    simulation = None
+    if SIM_MOTOR == 'numpy':
+        from simulation_numpy import SimulationManagerNumpy
+        simulation = SimulationManagerNumpy(SIM_WIDTH, SIM_HEIGHT, INITIAL_SNAKES, INITIAL_FOOD, seed=SIM_SEED)
+    elif CHECKPOINT_RUTA and os.path.exists(CHECKPOINT_RUTA):
+        # Retomar la ejecución anterior en vez de empezar de cero
+        try:
+            simulation = checkpoint.cargar(CHECKPOINT_RUTA)
+            logging.info(f"Restaurado {CHECKPOINT_RUTA}: paso {simulation.paso_actual}, {len(simulation.serpientes)} serpientes.")
+        except (checkpoint.ErrorCheckpoint, OSError) as e:
+            logging.error(f"No se pudo restaurar {CHECKPOINT_RUTA}, se empieza de cero: {e}")
+    if simulation is None:
+        simulation = SimulationManager(SIM_WIDTH, SIM_HEIGHT, INITIAL_SNAKES, INITIAL_FOOD, seed=SIM_SEED)
+    simulation.eventos.activo = EVENTOS_ACTIVOS
+    simulation.metricas.activo = METRICAS_ACTIVAS
+    if ESPECIES_ACTIVAS:
+        simulation.activar_especies()
+    if MUERTES_RUTA:
+        simulation.archivo = ArchivoMuertes(simulation.archivo.num_genes, ruta=MUERTES_RUTA)
+    grabador = historial = None
+    if TRAYECTORIA_RUTA and isinstance(simulation, SimulationManager):
+        grabador = GrabadorTrayectoria(simulation, TRAYECTORIA_RUTA, TRAYECTORIA_KEYFRAME_CADA)
+        historial = HistorialTrayectoria(TRAYECTORIA_RUTA, grabador, simulation_lock, HISTORIAL_FOTOGRAMAS)
+        logging.info(f"Grabando la trayectoria en {TRAYECTORIA_RUTA}.tray desde el tick {simulation.tick}.")
+    with simulation_lock:
+        partes = publicador.capturar(simulation)
+    publicador.publicar(partes)
+    logging.info(f"{type(simulation).__name__} inicializado correctamente (semilla {simulation.seed}).")
 except Exception as e:
     logging.error(f"Error al inicializar SimulationManager: {e}", exc_info=True)
     # Decide cómo manejar este error crítico. Podrías salir o intentar de nuevo.
@@ -30,33 +86,69 @@ except Exception as e:
 
 # --- Hilo para correr la simulación en background ---
 _simulation_running = True # Variable para controlar el bucle del hilo
+control = ControlVelocidad(SIM_SPEED_MS, SIM_TURBO) # Pausa, paso a paso, ritmo y turbo
+
+def guardar_checkpoint():
+    """Guarda el estado en CHECKPOINT_RUTA (llamar con simulation_lock tomado)."""
+    if not CHECKPOINT_RUTA or not isinstance(simulation, SimulationManager):
+        return
+    try:
+        inicio = time.perf_counter()
+        tam = checkpoint.guardar(simulation, CHECKPOINT_RUTA, CHECKPOINT_COMPRESION)
+        logging.info(f"Checkpoint del paso {simulation.paso_actual} guardado ({tam} bytes, {(time.perf_counter() - inicio) * 1000:.0f} ms).")
+    except Exception as e:
+        logging.error(f"Error guardando checkpoint: {e}", exc_info=True)
+
+def republicar():
+    """Publica una instantánea nueva tras un cambio hecho fuera del hilo de simulación."""
+    with simulation_lock:
+        partes = publicador.capturar(simulation)
+    publicador.publicar(partes)
 
 def run_simulation():
     global _simulation_running
     logging.info("Iniciando hilo de simulación...")
+    ultimo_checkpoint = time.monotonic()
+    ultima_publicacion = 0.0
     while _simulation_running:
-        with simulation_lock: # Adquirir el lock antes de modificar el estado
-            try:
-                simulation.step()
-                # logging.debug(f"Simulación avanzó al paso {simulation.paso_actual}") # Puede ser muy verboso
-            except Exception as e:
-                logging.error(f"Error en simulation.step(): {e}", exc_info=True)
-                # Considera si detener el hilo o solo loggear
-                # _simulation_running = False # Descomentar para detener en error
-
-        # Controla la velocidad de la simulación
-        # time.sleep(SIM_SPEED_MS / 1000.0)
-        # Corrección: time.sleep espera segundos, no milisegundos
-        sleep_duration = SIM_SPEED_MS / 1000.0
-        if sleep_duration > 0:
-             time.sleep(sleep_duration)
-        else:
-             # Evitar espera negativa o nula si SIM_SPEED_MS es 0 o negativo
-             pass # Opcionalmente, yield para ceder control si es muy rápido
+        # Espera hasta que toque (ritmo, pausa) y da el lote entero con el lock tomado una vez
+        try:
+            pasos = control.siguiente_lote(lambda: _simulation_running)
+        except Exception as e:
+            # Un valor raro en el control no debe tumbar el hilo (el servidor seguiría con el mundo congelado)
+            logging.error(f"Error en control.siguiente_lote(): {e}", exc_info=True)
+            time.sleep(0.5)
+            continue
+        if not pasos:
+            continue
+        inicio = time.monotonic()
+        partes = None
+        with simulation_lock.medir('simulacion'): # Adquirir el lock antes de modificar el estado
+            for _ in range(pasos):
+                try:
+                    simulation.step()
+                    # logging.debug(f"Simulación avanzó al paso {simulation.paso_actual}") # Puede ser muy verboso
+                except Exception as e:
+                    logging.error(f"Error en simulation.step(): {e}", exc_info=True)
+                    # Considera si detener el hilo o solo loggear
+                    # _simulation_running = False # Descomentar para detener en error
+                    break
+            if time.monotonic() - ultimo_checkpoint >= CHECKPOINT_INTERVALO_S:
+                guardar_checkpoint()
+                ultimo_checkpoint = time.monotonic()
+            # A ritmo lento se publica cada lote; a toda velocidad, como mucho cada INSTANTANEA_CADA_MS
+            if (time.monotonic() - ultima_publicacion >= INSTANTANEA_CADA_MS / 1000
+                    or control.intervalo_ms >= INSTANTANEA_CADA_MS or control.pausado):
+                partes = publicador.capturar(simulation)
+        if partes is not None:
+            publicador.publicar(partes) # Serializar ya fuera del lock
+            ultima_publicacion = time.monotonic()
+        control.registrar(pasos, inicio)
 
     logging.info("Hilo de simulación detenido.")
 
 simulation_thread = threading.Thread(target=run_simulation, daemon=True)
+exportador_eventos = ExportadorEventos(simulation.eventos, intervalo=EVENTOS_INTERVALO_S, muestreo=EVENTOS_MUESTREO)
 # Se inicia más abajo, después de definir las rutas, o dentro del if __name__ == '__main__':
 
 # --- Rutas de Flask ---
@@ -65,29 +157,118 @@ def index():
     """Sirve la página HTML principal."""
     logging.info("Sirviendo index.html")
     # Pasa las dimensiones al template si el JS las necesita al inicio
-    return render_template('index.html', width=SIM_WIDTH, height=SIM_HEIGHT)
+    return render_template('index.html', width=simulation.width, height=simulation.height)
 
 @app.route('/game_state')
 def game_state():
-    """Devuelve el estado actual del juego en formato JSON."""
+    """Devuelve el estado actual del juego en formato JSON, o el de un paso pasado con ?paso=N
+    (N es el tick, que no vuelve a 0 con los reinicios)."""
     logging.debug("Petición a /game_state recibida.")
-    state = None # Inicializar state fuera del try
-    with simulation_lock: # Adquirir lock para leer el estado de forma segura
-        try:
-            state = simulation.get_state()
-            # <<< DEBUG LOGGING >>>
-            logging.info(f"Enviando estado desde /game_state: Pasos={state.get('paso')}, Serpientes={len(state.get('serpientes', []))}, Comida={len(state.get('comida', []))}")
-            # Log detallado de las primeras serpientes (si existen)
-            if state.get('serpientes'):
-                 logging.debug(f"  Detalle primeras serpientes: {state['serpientes'][:2]}") # Loguea las 2 primeras
-            # <<< FIN DEBUG LOGGING >>>
-            return jsonify(state)
-        except Exception as e:
-            logging.error(f"Error en get_state() o jsonify: {e}", exc_info=True)
-            # Loguear el estado si se obtuvo antes del error
-            if state:
-                logging.error(f"  Estado parcial antes del error: {state}")
-            return jsonify({"error": "Error al obtener el estado"}), 500
+    if request.args.get('paso') is not None:
+        return estado_historico(request.args.get('paso', type=int))
+    # Sin lock: la última instantánea publicada, ya serializada
+    instantanea = publicador.actual()
+    # Formato perezoso: no cuesta nada si el nivel DEBUG está filtrado
+    logging.debug("Enviando estado desde /game_state: Paso=%s, tick=%s, %d bytes",
+                  instantanea.paso, instantanea.tick, len(instantanea.estado_json))
+    return Response(instantanea.estado_json, mimetype='application/json')
+
+def estado_historico(tick):
+    """Fotograma de un paso pasado desde la grabación (no toma el lock salvo para volcarla)."""
+    if historial is None:
+        return jsonify({"error": "No hay grabación de la trayectoria (TRAYECTORIA_RUTA)"}), 404
+    if tick is None:
+        return jsonify({"error": "paso debe ser un entero"}), 400
+    try:
+        return jsonify(historial.fotograma(tick))
+    except IndexError as e:
+        return jsonify({"error": str(e)}), 404
+
+@app.route('/game_state/rango')
+def game_state_rango():
+    """Fotogramas de desde a hasta como NDJSON (una línea por paso), para reproducir a cualquier
+    velocidad. Parámetros: desde, hasta (por defecto el último grabado), cada (saltar pasos)."""
+    if historial is None:
+        return jsonify({"error": "No hay grabación de la trayectoria (TRAYECTORIA_RUTA)"}), 404
+    limites = historial.limites()
+    desde = request.args.get('desde', default=limites['desde'], type=int)
+    hasta = request.args.get('hasta', default=limites['hasta'], type=int)
+    cada = max(1, request.args.get('cada', default=1, type=int))
+    if not limites['desde'] <= desde <= limites['hasta'] or hasta < desde:
+        return jsonify({"error": f"Rango fuera de la grabación ({limites['desde']}..{limites['hasta']})"}), 404
+    generar = (json.dumps(f, separators=(',', ':')) + '\n' for f in historial.rango(desde, hasta, cada))
+    return Response(stream_with_context(generar), mimetype='application/x-ndjson')
+
+@app.route('/estadisticas')
+def estadisticas():
+    """Agregados actuales de la población y su serie temporal por paso (buffer circular).
+    Parámetros: desde (tick), cada (quedarse con uno de cada N pasos)."""
+    instantanea = publicador.actual()
+    serie = instantanea.serie_dict(request.args.get('desde', type=int), request.args.get('cada', default=1, type=int))
+    return jsonify({'actuales': instantanea.estadisticas, 'serie': serie})
+
+@app.route('/especies')
+def especies():
+    """Centroides, tamaño de cada especie y diversidad genética (calculados en el último
+    paso de actualización; la consulta no recorre la población)."""
+    return jsonify(publicador.actual().especies)
+
+@app.route('/especies/config', methods=['POST'])
+def configurar_especies():
+    """Activa/desactiva las especies. JSON: activo, k, cada (pasos entre actualizaciones),
+    muestra (genomas muestreados); cambiar k reinicia los centroides."""
+    datos = request.get_json(silent=True) or {}
+    try:
+        parametros = {clave: int(datos[clave]) for clave in ('k', 'cada', 'muestra') if clave in datos}
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "k, cada y muestra deben ser enteros"}), 400
+    if any(valor < 1 for valor in parametros.values()):
+        return jsonify({"status": "error", "message": "k, cada y muestra deben ser positivos"}), 400
+    with simulation_lock:
+        actual = simulation.especies
+        if parametros:
+            activo = actual.activo
+            simulation.especies = EspeciesEnLinea(**{'k': actual.k, 'cada': actual.cada, 'muestra': actual.muestra,
+                                                     **parametros}, num_genes=actual.num_genes)
+            if activo:
+                simulation.activar_especies()
+        if 'activo' in datos:
+            simulation.activar_especies(bool(datos['activo']))
+        logging.info(f"Especies: activo={simulation.especies.activo}, k={simulation.especies.k}")
+        respuesta = jsonify({"status": "success", "activo": simulation.especies.activo, "k": simulation.especies.k,
+                             "cada": simulation.especies.cada, "muestra": simulation.especies.muestra})
+    republicar() # Las etiquetas de /game_state cambian sin esperar al siguiente paso
+    return respuesta
+
+# Archivo de muertes: el lock solo se toma para la instantánea; la consulta corre fuera
+@app.route('/muertes')
+def muertes():
+    """Muertes por causa, vida media y percentiles. Parámetro opcional: desde (tick)."""
+    with simulation_lock:
+        consulta = simulation.archivo.instantanea()
+    return jsonify(consulta.resumen(desde=request.args.get('desde', type=int)))
+
+@app.route('/muertes/vida_por_gen')
+def muertes_vida_por_gen():
+    """Distribución de la vida por cubetas de un gen. Parámetros: gen, cubetas, causa
+    (pared, energia, edad), desde (tick), bins (del histograma de vida)."""
+    with simulation_lock:
+        consulta = simulation.archivo.instantanea()
+    try:
+        return jsonify(consulta.vida_por_gen(request.args.get('gen', default=0, type=int),
+                                             cubetas=max(1, request.args.get('cubetas', default=10, type=int)),
+                                             causa=request.args.get('causa'),
+                                             desde=request.args.get('desde', type=int),
+                                             bins_vida=max(1, request.args.get('bins', default=20, type=int))))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/trayectoria')
+def trayectoria():
+    """Ticks disponibles en la grabación y estado de la caché de fotogramas."""
+    if historial is None:
+        return jsonify({"error": "No hay grabación de la trayectoria (TRAYECTORIA_RUTA)"}), 404
+    return jsonify(historial.limites())
 
 # Nueva ruta para reiniciar la simulación
 @app.route('/reset_simulation', methods=['POST'])
@@ -97,21 +278,162 @@ def reset_simulation():
     with simulation_lock:
         try:
             success = simulation.reset()
-            if success:
-                return jsonify({"status": "success", "message": "Simulación reiniciada correctamente"})
-            else:
-                return jsonify({"status": "error", "message": "Error al reiniciar la simulación"}), 500
+            partes = publicador.capturar(simulation) if success else None
         except Exception as e:
             logging.error(f"Error en reset_simulation: {e}", exc_info=True)
             return jsonify({"status": "error", "message": str(e)}), 500
+    if not success:
+        return jsonify({"status": "error", "message": "Error al reiniciar la simulación"}), 500
+    publicador.publicar(partes) # Los lectores ven el estado inicial sin esperar al siguiente paso
+    return jsonify({"status": "success", "message": "Simulación reiniciada correctamente"})
+
+# Control de velocidad (no toma el lock de la simulación: ControlVelocidad tiene el suyo)
+@app.route('/velocidad')
+def velocidad():
+    """Pausa, ritmo, turbo y pasos por segundo conseguidos."""
+    return jsonify(control.estado())
+
+@app.route('/velocidad/config', methods=['POST'])
+def configurar_velocidad():
+    """JSON: pausado, turbo (pasos por lote) e intervalo_ms (entre inicios de lote) o
+    pasos_por_segundo (objetivo; 0 es sin espera). Se aplica al momento, sin reiniciar nada."""
+    datos = request.get_json(silent=True) or {}
+    try:
+        intervalo_ms = float(datos['intervalo_ms']) if 'intervalo_ms' in datos else None
+        if intervalo_ms is not None and not math.isfinite(intervalo_ms):
+            raise ValueError("intervalo_ms debe ser un número finito")
+        turbo = int(datos['turbo']) if 'turbo' in datos else None
+        if 'pasos_por_segundo' in datos:
+            objetivo = float(datos['pasos_por_segundo'])
+            if not (math.isfinite(objetivo) and objetivo >= 0):
+                raise ValueError("pasos_por_segundo debe ser un número no negativo")
+            # Cada lote son `turbo` pasos: el intervalo entre lotes crece con él
+            intervalo_ms = 1000.0 * (turbo or control.turbo) / objetivo if objetivo else 0.0
+            if intervalo_ms > INTERVALO_MAXIMO_MS:
+                raise ValueError(f"pasos_por_segundo demasiado bajo: como mucho {INTERVALO_MAXIMO_MS} ms entre lotes")
+        pausado = bool(datos['pausado']) if 'pausado' in datos else None
+        control.configurar(pausado=pausado, intervalo_ms=intervalo_ms, turbo=turbo)
+    except (TypeError, ValueError, OverflowError) as e: # OverflowError: int(inf) en turbo
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if pausado:
+        republicar() # A toda velocidad el último lote puede no estar publicado
+    logging.info(f"Velocidad: pausado={control.pausado}, intervalo={control.intervalo_ms} ms, turbo={control.turbo}")
+    return jsonify({"status": "success", **control.estado()})
+
+@app.route('/velocidad/avanzar', methods=['POST'])
+def avanzar_pasos():
+    """Da N pasos sueltos aunque la simulación esté en pausa. JSON: pasos (por defecto 1)."""
+    datos = request.get_json(silent=True) or {}
+    try:
+        control.avanzar(int(datos.get('pasos', 1)))
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"status": "success", **control.estado()})
+
+# Eventos de la simulación (no toma el lock: el registro admite lecturas concurrentes)
+@app.route('/eventos')
+def eventos():
+    """Devuelve eventos registrados. Parámetros: desde (secuencia), tipo (nombre), limite."""
+    tipo = request.args.get('tipo')
+    if tipo is not None and tipo not in TIPOS_POR_NOMBRE:
+        return jsonify({"status": "error", "message": f"Tipo de evento desconocido: {tipo}"}), 400
+    try:
+        desde = int(request.args.get('desde', 0))
+        limite = min(int(request.args.get('limite', 1000)), simulation.eventos.capacidad)
+    except ValueError:
+        return jsonify({"status": "error", "message": "desde y limite deben ser enteros"}), 400
+    lista, siguiente = simulation.eventos.consultar(desde, TIPOS_POR_NOMBRE.get(tipo), limite)
+    return jsonify({"eventos": lista, "siguiente": siguiente, **simulation.eventos.resumen()})
+
+@app.route('/eventos/config', methods=['POST'])
+def configurar_eventos():
+    """Activa/desactiva el trazado y ajusta el volcado al log sin reiniciar. JSON: activo, muestreo, intervalo."""
+    datos = request.get_json(silent=True) or {}
+    try:
+        muestreo = max(1, int(datos['muestreo'])) if 'muestreo' in datos else None
+        intervalo = max(0.1, float(datos['intervalo'])) if 'intervalo' in datos else None
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "muestreo debe ser un entero e intervalo un número"}), 400
+    if 'activo' in datos:
+        simulation.eventos.activo = bool(datos['activo'])
+    if muestreo is not None:
+        exportador_eventos.muestreo = muestreo
+    if intervalo is not None:
+        exportador_eventos.intervalo = intervalo
+    logging.info(f"Trazado de eventos: activo={simulation.eventos.activo}, muestreo=1/{exportador_eventos.muestreo}, intervalo={exportador_eventos.intervalo}s")
+    return jsonify({"status": "success", "muestreo": exportador_eventos.muestreo,
+                    "intervalo": exportador_eventos.intervalo, **simulation.eventos.resumen()})
+
+# Registro de replay: con él, replay.resimular() regenera cualquier paso de esta ejecución
+@app.route('/replay')
+def registro_replay():
+    """Semilla, configuración, comandos externos y tick actual (de la última instantánea)."""
+    respuesta = jsonify(publicador.actual().replay)
+    respuesta.headers['Content-Disposition'] = 'attachment; filename=replay.json'
+    return respuesta
+
+# Métricas de rendimiento por fase de step()
+@app.route('/metricas')
+def metricas():
+    """Percentiles, histogramas y contadores por fase de los últimos pasos, espera para
+    tomar el lock por rol y coste de publicar las instantáneas."""
+    with simulation_lock:
+        resumen = simulation.metricas.resumen()
+    resumen['lock'] = simulation_lock.resumen()
+    resumen['instantaneas'] = publicador.resumen()
+    return jsonify(resumen)
+
+@app.route('/metricas/config', methods=['POST'])
+def configurar_metricas():
+    """Activa/desactiva las métricas o las reinicia. JSON: activo, reiniciar."""
+    datos = request.get_json(silent=True) or {}
+    with simulation_lock:
+        if 'activo' in datos:
+            simulation.metricas.activo = bool(datos['activo'])
+        if datos.get('reiniciar'):
+            simulation.metricas.reiniciar()
+        logging.info(f"Métricas por fase: activo={simulation.metricas.activo}")
+        return jsonify({"status": "success", "activo": simulation.metricas.activo})
+
+@app.route('/metricas/traza', methods=['GET', 'POST'])
+def traza_metricas():
+    """POST {"pasos": N}: captura los próximos N pasos (activa las métricas).
+    GET: descarga la captura como traza de Chrome (chrome://tracing, Perfetto)."""
+    with simulation_lock:
+        if request.method == 'POST':
+            datos = request.get_json(silent=True) or {}
+            try:
+                pasos = int(datos.get('pasos', 100))
+            except (TypeError, ValueError):
+                return jsonify({"status": "error", "message": "pasos debe ser un entero"}), 400
+            simulation.metricas.activo = True
+            simulation.metricas.capturar_traza(pasos)
+            logging.info(f"Capturando traza de {pasos} pasos")
+            return jsonify({"status": "success", **simulation.metricas.estado_traza()})
+        estado = simulation.metricas.estado_traza()
+        if estado['pendientes']:
+            return jsonify({"status": "pendiente", **estado}), 202
+        respuesta = jsonify(simulation.metricas.traza_chrome())
+    respuesta.headers['Content-Disposition'] = 'attachment; filename=traza_simulacion.json'
+    return respuesta
 
 # --- Manejo de cierre limpio (opcional pero recomendado) ---
 def shutdown_hook():
     global _simulation_running
     logging.info("Señal de apagado recibida. Deteniendo hilo de simulación...")
     _simulation_running = False
+    control.despertar() # Por si el hilo está en pausa o esperando su turno
     if simulation_thread.is_alive():
         simulation_thread.join(timeout=2) # Esperar un poco a que el hilo termine
+    exportador_eventos.detener()
+    exportador_eventos.exportar() # Volcar lo que quede pendiente
+    with simulation_lock:
+        guardar_checkpoint()
+        if grabador is not None:
+            grabador.cerrar()
+        simulation.archivo.volcar()
+    if historial is not None:
+        historial.cerrar()
     logging.info("Aplicación Flask terminando.")
 
 # Registrar el hook de apagado (requiere `pip install Werkzeug>=2.0` si no está ya)
@@ -130,6 +452,7 @@ if __name__ == '__main__':
     # Iniciar el hilo de simulación ANTES de iniciar el servidor Flask
     simulation_thread.start()
     logging.info("Hilo de simulación iniciado.")
+    exportador_eventos.iniciar()
 
     # Nota: El servidor de desarrollo de Flask no es ideal para producción con hilos.
     # Para algo más robusto, considera Gunicorn/uWSGI.
@@ -0,0 +1,184 @@
+"""Barrido de parámetros con réplicas, repartido entre procesos.
+
+Cada combinación de la rejilla de parámetros se ejecuta `--replicas` veces con
+semillas distintas (semilla_base + número de ejecución, así que el barrido entero es
+reproducible) en un ProcessPoolExecutor con un proceso por núcleo. Los resultados
+llegan según terminan: cada ejecución se escribe como una línea JSON y se suma a los
+acumuladores de su combinación (media, desviación e IC del 95% en una sola pasada),
+de modo que la memoria no crece con el número de ejecuciones.
+
+Uso:
+    python barrido.py -p mutation_rate=0.05,0.1,0.2 -p food_energy=30,50 --replicas 20 \\
+        --pasos 5000 --ejecuciones runs.jsonl --salida resumen.json
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from estadisticas import AcumuladorGrupo
+from headless import crear_simulacion, ejecutar
+
+# Parámetros de SimulationManager.__init__ que se pueden barrer, con su tipo
+PARAMETROS = {
+    'mutation_rate': float,
+    'reproduction_energy_cost': int,
+    'max_age': int,
+    'food_energy': int,
+    'snake_initial_energy': int,
+}
+
+
+def leer_rejilla(especificaciones):
+    """Convierte ['nombre=v1,v2', ...] en {nombre: [v1, v2]} con el tipo de cada parámetro."""
+    rejilla = {}
+    for especificacion in especificaciones:
+        nombre, _, valores = especificacion.partition('=')
+        nombre = nombre.strip()
+        if nombre not in PARAMETROS:
+            raise ValueError(f"Parámetro desconocido: {nombre} (válidos: {', '.join(PARAMETROS)})")
+        if not valores:
+            raise ValueError(f"Sin valores para {nombre}")
+        rejilla[nombre] = [PARAMETROS[nombre](v) for v in valores.split(',')]
+    return rejilla
+
+
+def combinaciones(rejilla):
+    """Producto cartesiano de la rejilla como lista de dicts (un dict vacío si no hay parámetros)."""
+    nombres = list(rejilla)
+    return [dict(zip(nombres, valores)) for valores in itertools.product(*(rejilla[n] for n in nombres))]
+
+
+def _preparar_proceso(nivel_log):
+    logging.basicConfig(level=nivel_log, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger().setLevel(nivel_log)
+
+
+def ejecutar_tarea(tarea):
+    """Una ejecución completa (en un proceso del pool). Devuelve su resumen."""
+    mundo = tarea['mundo']
+    sim = crear_simulacion(mundo['motor'], mundo['width'], mundo['height'], mundo['serpientes'], mundo['comida'],
+                           seed=tarea['semilla'], **tarea['parametros'])
+    resultado = ejecutar(sim, mundo['pasos'])
+    final = resultado['final']
+    return {
+        'ejecucion': tarea['ejecucion'],
+        'combinacion': tarea['combinacion'],
+        'replica': tarea['replica'],
+        'parametros': tarea['parametros'],
+        'semilla': tarea['semilla'],
+        'pasos': resultado['pasos'],
+        'paso_extincion': resultado['paso_extincion'],
+        'pico_poblacion': resultado['pico_poblacion'],
+        'serpientes_final': final['serpientes'],
+        'energia_media_final': final['energia_media'],
+        'genes_medios_final': final['genes_medios'],
+        'segundos': resultado['segundos'],
+    }
+
+
+def _tareas(combos, replicas, mundo, semilla_base):
+    ejecucion = 0
+    for c, parametros in enumerate(combos):
+        for replica in range(replicas):
+            yield {'ejecucion': ejecucion, 'combinacion': c, 'replica': replica, 'parametros': parametros,
+                   'semilla': semilla_base + ejecucion, 'mundo': mundo}
+            ejecucion += 1
+
+
+def barrer(combos, replicas, mundo, semilla_base=0, procesos=None, nivel_log=logging.ERROR):
+    """Generador: lanza las ejecuciones y devuelve cada resumen en cuanto termina.
+
+    Como mucho hay 2 * procesos tareas enviadas a la vez, así que ni las tareas
+    pendientes ni los resultados se acumulan en memoria.
+    """
+    procesos = procesos or os.cpu_count() or 1
+    tareas = _tareas(combos, replicas, mundo, semilla_base)
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_preparar_proceso, initargs=(nivel_log,)) as pool:
+        en_curso = set()
+        for tarea in itertools.islice(tareas, 2 * procesos):
+            en_curso.add(pool.submit(ejecutar_tarea, tarea))
+        while en_curso:
+            hechas, en_curso = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in hechas:
+                yield futuro.result()
+                siguiente = next(tareas, None)
+                if siguiente is not None:
+                    en_curso.add(pool.submit(ejecutar_tarea, siguiente))
+
+
+def acumular(grupo, resumen):
+    """Suma un resumen de ejecución a los acumuladores de su combinación."""
+    extinguida = resumen['paso_extincion'] is not None
+    grupo.añadir('extinguida', 1.0 if extinguida else 0.0)
+    if extinguida:
+        grupo.añadir('paso_extincion', resumen['paso_extincion'])
+    grupo.añadir('pico_poblacion', resumen['pico_poblacion'])
+    grupo.añadir('serpientes_final', resumen['serpientes_final'])
+    if resumen['serpientes_final']:
+        grupo.añadir('energia_media_final', resumen['energia_media_final'])
+        for g, valor in enumerate(resumen['genes_medios_final']):
+            grupo.añadir(f'gen{g}', valor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-p', '--parametro', action='append', default=[],
+                        help=f"nombre=v1,v2,... (repetible). Parámetros: {', '.join(PARAMETROS)}")
+    parser.add_argument('--replicas', type=int, default=10)
+    parser.add_argument('--pasos', type=int, default=2000, help='Pasos máximos por ejecución')
+    parser.add_argument('--motor', choices=['python', 'numpy'], default='python')
+    parser.add_argument('--width', type=int, default=30)
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--serpientes', type=int, default=5)
+    parser.add_argument('--comida', type=int, default=10)
+    parser.add_argument('--semilla-base', type=int, default=0)
+    parser.add_argument('--procesos', type=int, help='Procesos del pool (por defecto, uno por núcleo)')
+    parser.add_argument('--ejecuciones', help='Escribir cada ejecución como una línea JSON en este fichero')
+    parser.add_argument('--salida', help='Guardar el resumen agregado por combinación en este JSON')
+    parser.add_argument('--log', default='ERROR', help='Nivel de logging de las simulaciones')
+    args = parser.parse_args()
+
+    try:
+        combos = combinaciones(leer_rejilla(args.parametro))
+    except ValueError as e:
+        parser.error(str(e))
+    mundo = {'motor': args.motor, 'width': args.width, 'height': args.height,
+             'serpientes': args.serpientes, 'comida': args.comida, 'pasos': args.pasos}
+    total = len(combos) * args.replicas
+    grupos = [AcumuladorGrupo() for _ in combos]
+    fichero = open(args.ejecuciones, 'w') if args.ejecuciones else None
+    inicio = time.perf_counter()
+    try:
+        for k, resumen in enumerate(barrer(combos, args.replicas, mundo, args.semilla_base, args.procesos, args.log.upper()), 1):
+            acumular(grupos[resumen['combinacion']], resumen)
+            if fichero:
+                fichero.write(json.dumps(resumen) + '\n')
+                fichero.flush()
+            extincion = resumen['paso_extincion'] if resumen['paso_extincion'] is not None else '-'
+            print(f"[{k}/{total}] {resumen['parametros']} réplica {resumen['replica']}: "
+                  f"extinción {extincion}, pico {resumen['pico_poblacion']}, final {resumen['serpientes_final']}", file=sys.stderr)
+    finally:
+        if fichero:
+            fichero.close()
+    print(f"{total} ejecuciones en {time.perf_counter() - inicio:.1f} s", file=sys.stderr)
+
+    agregado = [{'parametros': parametros, 'metricas': grupo.como_dict()} for parametros, grupo in zip(combos, grupos)]
+    for fila in agregado:
+        m = fila['metricas']
+        extincion = m['extinguida']
+        pico = m['pico_poblacion']
+        print(f"{fila['parametros']}: extinción {extincion['media']:.0%}, "
+              f"pico {pico['media']:.1f} (IC95 {pico['ic95'][0]:.1f}-{pico['ic95'][1]:.1f})")
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump({'mundo': mundo, 'replicas': args.replicas, 'semilla_base': args.semilla_base,
+                       'combinaciones': agregado}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
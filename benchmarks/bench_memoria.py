@@ -0,0 +1,49 @@
+"""Mide la memoria que ocupa cada Serpiente (objeto, cuerpo, genes y color).
+
+Usa tracemalloc, así que cuenta todo lo que Python reserva al crear las serpientes
+(incluidas las tuplas de los segmentos), no solo el tamaño del objeto.
+
+Uso:
+    python benchmarks/bench_memoria.py [--serpientes 100000]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulation import Serpiente
+
+LONGITUDES = [1, 10, 50]
+
+
+def bytes_por_serpiente(num_serpientes, longitud):
+    random.seed(1)
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    serpientes = []
+    for i in range(num_serpientes):
+        s = Serpiente(i, 0, 0, color=0x0000FF)
+        for k in range(1, longitud):
+            s.cuerpo.empujar_cabeza((k, i % 1000))
+        serpientes.append(s)
+    despues = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (despues - antes) / num_serpientes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--serpientes', type=int, default=100000)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print(f"{'longitud':>8} {'bytes/serpiente':>16}")
+    for longitud in LONGITUDES:
+        print(f"{longitud:>8} {bytes_por_serpiente(args.serpientes, longitud):16.0f}")
+
+
+if __name__ == '__main__':
+    main()
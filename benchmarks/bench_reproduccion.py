@@ -0,0 +1,91 @@
+"""Benchmark de la fase de reproducción por adyacencia de SimulationManager.step.
+
+Compara la búsqueda antigua por pares (doble bucle O(N²)) con el mapa de cabezas
+que se usa ahora (O(N)), y mide el paso completo para poblaciones crecientes con
+densidad constante (unas 10 celdas por serpiente).
+
+Uso:
+    python benchmarks/bench_reproduccion.py [--max-cuadratico 20000]
+"""
+import argparse
+import logging
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulation import SimulationManager
+
+POBLACIONES = [1000, 2000, 5000, 10000, 20000, 50000]
+
+
+def pares_adyacentes_cuadratico(padres):
+    """Búsqueda antigua: compara todas las parejas de cabezas."""
+    pares = 0
+    for idx1 in range(len(padres)):
+        head1 = padres[idx1].cuerpo[0]
+        for idx2 in range(idx1 + 1, len(padres)):
+            head2 = padres[idx2].cuerpo[0]
+            if abs(head1[0] - head2[0]) + abs(head1[1] - head2[1]) == 1:
+                pares += 1
+    return pares
+
+
+def pares_adyacentes_mapa(padres):
+    """Búsqueda actual: mapa posición -> índices y sondeo de las 4 celdas vecinas."""
+    cabezas = {}
+    for idx, s in enumerate(padres):
+        cabezas.setdefault(s.cuerpo[0], []).append(idx)
+    pares = 0
+    for idx1, s1 in enumerate(padres):
+        x, y = s1.cuerpo[0]
+        for vecina in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)):
+            for idx2 in cabezas.get(vecina, ()):
+                if idx2 > idx1:
+                    pares += 1
+    return pares
+
+
+def crear_mundo(num_serpientes, semilla):
+    random.seed(semilla)
+    lado = int(math.sqrt(num_serpientes * 10))
+    return SimulationManager(lado, lado, num_serpientes, num_serpientes // 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-cuadratico', type=int, default=20000,
+                        help='Población máxima para la que se mide el doble bucle antiguo')
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print(f"{'serpientes':>10} {'pares O(N²) ms':>15} {'mapa ms':>9} {'step ms':>9} {'µs/serpiente':>13}")
+    for n in POBLACIONES:
+        sim = crear_mundo(n, args.semilla)
+        padres = list(sim.serpientes)
+
+        t0 = time.perf_counter()
+        pares_mapa = pares_adyacentes_mapa(padres)
+        t_mapa = time.perf_counter() - t0
+
+        if n <= args.max_cuadratico:
+            t0 = time.perf_counter()
+            pares_cuad = pares_adyacentes_cuadratico(padres)
+            t_cuad = time.perf_counter() - t0
+            assert pares_cuad == pares_mapa
+            cuad_txt = f"{t_cuad * 1000:15.1f}"
+        else:
+            cuad_txt = f"{'-':>15}"
+
+        t0 = time.perf_counter()
+        sim.step()
+        t_step = time.perf_counter() - t0
+
+        print(f"{n:>10} {cuad_txt} {t_mapa * 1000:9.1f} {t_step * 1000:9.1f} {t_step * 1e6 / n:13.1f}")
+
+
+if __name__ == '__main__':
+    main()
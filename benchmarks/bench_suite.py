@@ -0,0 +1,228 @@
+"""Suite de benchmarks reproducible de la simulación.
+
+Dos capas:
+- micro: métodos sueltos de Serpiente y SimulationManager (decidir_movimiento,
+  _get_visible_targets, _find_closest_target, reproducir, _añadir_comida, get_state)
+  sobre un mundo fijo, en µs por llamada.
+- macro: step() completo sobre una matriz de tamaños de tablero, poblaciones y
+  densidades de comida, en ms por paso y serpiente-pasos/s.
+
+Los resultados se guardan en JSON (--salida) y se pueden comparar con una línea
+base guardada antes (--comparar); si algún caso empeora más que --umbral, el
+script termina con código 1.
+
+Uso:
+    python benchmarks/bench_suite.py --salida base.json
+    python benchmarks/bench_suite.py --comparar base.json
+    python benchmarks/bench_suite.py --completa --motor numpy --capa macro
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from headless import crear_simulacion
+
+# (ancho, alto, serpientes, comida por serpiente)
+MATRIZ_RAPIDA = [
+    (30, 20, 5, 2),
+    (100, 100, 200, 2),
+    (300, 300, 2000, 1),
+    (300, 300, 2000, 4),
+]
+MATRIZ_COMPLETA = MATRIZ_RAPIDA + [
+    (500, 500, 10000, 1),
+    (500, 500, 10000, 4),
+    (1000, 1000, 50000, 1),
+    (2000, 2000, 100000, 1),
+    (2000, 2000, 100000, 4),
+]
+
+# Mundo fijo de los micro-benchmarks
+MICRO_MUNDO = (200, 200, 2000, 2000)
+
+
+def _medir(funcion, repeticiones):
+    """Ejecuta funcion() `repeticiones` veces; devuelve la lista de segundos de cada una."""
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - t0)
+    return tiempos
+
+
+def _resultado(tiempos, llamadas, unidad_escala, unidad):
+    por_llamada = [t * unidad_escala / llamadas for t in tiempos]
+    return {'mediana': statistics.median(por_llamada), 'minimo': min(por_llamada), 'unidad': unidad, 'llamadas': llamadas}
+
+
+def _mundo_micro(semilla):
+    w, h, n, comida = MICRO_MUNDO
+    return crear_simulacion('python', w, h, n, comida, seed=semilla)
+
+
+def micro(semilla, repeticiones):
+    resultados = {}
+    sim = _mundo_micro(semilla)
+    serpientes = list(sim.serpientes)
+    comida = sim.comida.como_lista()
+
+    def decidir():
+        sim.rng.seed(semilla)
+        for s in serpientes:
+            s.decidir_movimiento(sim)
+    resultados['micro/decidir_movimiento'] = _resultado(_medir(decidir, repeticiones), len(serpientes), 1e6, 'us')
+
+    # Los dos auxiliares recorren una lista completa de objetivos (la comida del mundo)
+    muestra = serpientes[:200]
+
+    def visibles():
+        for s in muestra:
+            s._get_visible_targets(s.cuerpo[0], comida, s._get_vision_range())
+    resultados['micro/_get_visible_targets'] = _resultado(_medir(visibles, repeticiones), len(muestra), 1e6, 'us')
+
+    def cercano():
+        for s in muestra:
+            s._find_closest_target(s.cuerpo[0], comida)
+    resultados['micro/_find_closest_target'] = _resultado(_medir(cercano, repeticiones), len(muestra), 1e6, 'us')
+
+    def estado():
+        sim.get_state()
+    resultados['micro/get_state'] = _resultado(_medir(estado, repeticiones), 1, 1e3, 'ms')
+
+    # reproducir y _añadir_comida cambian el mundo: uno nuevo por repetición, fuera del tiempo medido
+    parejas = 200
+    tiempos = []
+    for r in range(repeticiones):
+        sim = _mundo_micro(semilla + r)
+        padres = list(sim.serpientes)[:parejas * 2]
+        for s in padres:
+            s.energia = 10 ** 6
+        t0 = time.perf_counter()
+        for k in range(parejas):
+            sim.reproducir(padres[2 * k], padres[2 * k + 1])
+        tiempos.append(time.perf_counter() - t0)
+    resultados['micro/reproducir'] = _resultado(tiempos, parejas, 1e6, 'us')
+
+    cantidad = 1000
+    tiempos = []
+    for r in range(repeticiones):
+        sim = _mundo_micro(semilla + r)
+        t0 = time.perf_counter()
+        for _ in range(cantidad):
+            sim._añadir_comida(1)
+        tiempos.append(time.perf_counter() - t0)
+    resultados['micro/_añadir_comida'] = _resultado(tiempos, cantidad, 1e6, 'us')
+    return resultados
+
+
+def macro(matriz, motor, semilla, pasos, calentamiento):
+    resultados = {}
+    for w, h, n, comida_por_serpiente in matriz:
+        nombre = f"macro/{motor}/{w}x{h}/n{n}/c{comida_por_serpiente}"
+        sim = crear_simulacion(motor, w, h, n, n * comida_por_serpiente, seed=semilla)
+        for _ in range(calentamiento):
+            sim.step()
+        tiempos = []
+        serpiente_pasos = 0
+        for _ in range(pasos):
+            serpiente_pasos += sim.num_serpientes()
+            t0 = time.perf_counter()
+            sim.step()
+            tiempos.append(time.perf_counter() - t0)
+        total = sum(tiempos)
+        res = _resultado(tiempos, 1, 1e3, 'ms')
+        res['serpiente_pasos_por_segundo'] = serpiente_pasos / total if total > 0 else 0.0
+        res['serpientes_final'] = sim.num_serpientes()
+        resultados[nombre] = res
+        print(f"  {nombre}: {res['mediana']:.2f} ms/paso, {res['serpiente_pasos_por_segundo']:.0f} serpiente-pasos/s", file=sys.stderr)
+    return resultados
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def comparar(actual, base, umbral):
+    """Imprime la comparación caso a caso y devuelve la lista de regresiones (> umbral)."""
+    regresiones = []
+    print(f"{'caso':<45} {'base':>10} {'actual':>10} {'cambio':>8}")
+    for nombre, res in actual['resultados'].items():
+        ref = base['resultados'].get(nombre)
+        if ref is None:
+            print(f"{nombre:<45} {'-':>10} {res['mediana']:10.2f} {'nuevo':>8}")
+            continue
+        cambio = res['mediana'] / ref['mediana'] - 1 if ref['mediana'] > 0 else 0.0
+        marca = ''
+        if cambio > umbral:
+            marca = ' REGRESIÓN'
+            regresiones.append(nombre)
+        print(f"{nombre:<45} {ref['mediana']:10.2f} {res['mediana']:10.2f} {cambio:+8.1%}{marca}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--capa', choices=['micro', 'macro', 'todas'], default='todas')
+    parser.add_argument('--motor', choices=['python', 'numpy'], default='python', help='Motor de los macro-benchmarks')
+    parser.add_argument('--completa', action='store_true', help='Matriz completa (hasta 2000x2000 y 100k serpientes; lento)')
+    parser.add_argument('--pasos', type=int, default=5, help='Pasos medidos por caso macro')
+    parser.add_argument('--calentamiento', type=int, default=2, help='Pasos sin medir antes de cada caso macro')
+    parser.add_argument('--repeticiones', type=int, default=5, help='Repeticiones de cada micro-benchmark')
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--salida', help='Guardar los resultados en este JSON')
+    parser.add_argument('--comparar', help='JSON de línea base con el que comparar')
+    parser.add_argument('--umbral', type=float, default=0.10, help='Empeoramiento relativo que cuenta como regresión')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    actual = {
+        'meta': {
+            'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': _commit_actual(),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'semilla': args.semilla,
+            'motor': args.motor,
+            'completa': args.completa,
+        },
+        'resultados': {},
+    }
+    if args.capa in ('micro', 'todas'):
+        print("Micro-benchmarks...", file=sys.stderr)
+        actual['resultados'].update(micro(args.semilla, args.repeticiones))
+    if args.capa in ('macro', 'todas'):
+        print("Macro-benchmarks...", file=sys.stderr)
+        matriz = MATRIZ_COMPLETA if args.completa else MATRIZ_RAPIDA
+        actual['resultados'].update(macro(matriz, args.motor, args.semilla, args.pasos, args.calentamiento))
+
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump(actual, f, indent=2, ensure_ascii=False)
+
+    if args.comparar:
+        with open(args.comparar) as f:
+            base = json.load(f)
+        regresiones = comparar(actual, base, args.umbral)
+        if regresiones:
+            print(f"{len(regresiones)} regresiones por encima del {args.umbral:.0%}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        for nombre, res in actual['resultados'].items():
+            print(f"{nombre:<45} {res['mediana']:10.2f} {res['unidad']}")
+
+
+if __name__ == '__main__':
+    main()
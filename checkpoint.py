@@ -0,0 +1,251 @@
+"""Checkpoints binarios del estado completo de SimulationManager.
+
+Formato (versión 2), todo en little-endian:
+
+    cabecera: MAGIA (6 bytes) | versión (uint16) | compresión (uint8: 0 ninguna, 1 zlib, 2 lzma)
+    cuerpo (comprimido en streaming): secciones [longitud uint32][bytes], en este orden:
+        meta            JSON: config, semilla, tick, paso, siguiente id, comandos de replay...
+        rng             estado del Mersenne Twister (625 uint32)
+        serpientes      columnas: id, energía, edad, tick de nacimiento (int64); comida, hijos, color (uint32)
+        genes           nº de genes por serpiente (uint8) y todos los genes (float64)
+        cuerpos         longitud de cada cuerpo (uint32) y segmentos x, y (int32), de cabeza a cola
+        comida          posiciones x, y (int32) en el orden del almacén
+        orden_comida    posiciones x, y en el orden del índice espacial de comida
+        orden_cabezas   índice de cada serpiente en el orden del índice de cabezas (uint32)
+        libres          celdas libres (int32) en el orden del muestreador (vacía con EntornoDisperso)
+
+Los órdenes internos (índices espaciales, muestreador de celdas libres) se guardan
+para que una simulación restaurada siga exactamente igual que la original. Se
+escribe en un fichero temporal que sustituye al destino con os.replace, así que
+un corte a mitad de escritura nunca deja un checkpoint roto.
+"""
+import json
+import lzma
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+from simulation import Cuerpo, Serpiente, SimulationManager
+
+MAGIA = b'EVSNCK'
+VERSION = 2 # La 2 añade el tick de nacimiento de cada serpiente
+COMPRESIONES = {'ninguna': 0, 'zlib': 1, 'lzma': 2}
+_CABECERA = struct.Struct('<6sHB')
+_LONGITUD = struct.Struct('<I')
+_BLOQUE_LECTURA = 1 << 20
+
+
+class ErrorCheckpoint(Exception):
+    """El fichero no es un checkpoint válido o no se puede restaurar."""
+
+
+def _a_bytes(datos):
+    if sys.byteorder == 'big':
+        datos = array(datos.typecode, datos)
+        datos.byteswap()
+    return datos.tobytes()
+
+
+def _de_bytes(codigo, datos):
+    resultado = array(codigo)
+    resultado.frombytes(datos)
+    if sys.byteorder == 'big':
+        resultado.byteswap()
+    return resultado
+
+
+class _Escritor:
+    """Escribe secciones con prefijo de longitud a través de un compresor en streaming."""
+    def __init__(self, fichero, compresion):
+        self.fichero = fichero
+        if compresion == 1:
+            self.compresor = zlib.compressobj(6)
+        elif compresion == 2:
+            self.compresor = lzma.LZMACompressor()
+        else:
+            self.compresor = None
+
+    def _escribir(self, datos):
+        self.fichero.write(self.compresor.compress(datos) if self.compresor else datos)
+
+    def seccion(self, *partes):
+        self._escribir(_LONGITUD.pack(sum(len(p) for p in partes)))
+        for parte in partes:
+            self._escribir(parte)
+
+    def cerrar(self):
+        if self.compresor:
+            self.fichero.write(self.compresor.flush())
+
+
+class _Lector:
+    def __init__(self, datos):
+        self.datos = datos
+        self.pos = 0
+
+    def seccion(self):
+        if self.pos + _LONGITUD.size > len(self.datos):
+            raise ErrorCheckpoint("Checkpoint truncado")
+        (n,) = _LONGITUD.unpack_from(self.datos, self.pos)
+        inicio = self.pos + _LONGITUD.size
+        self.pos = inicio + n
+        if self.pos > len(self.datos):
+            raise ErrorCheckpoint("Checkpoint truncado")
+        return self.datos[inicio:self.pos]
+
+
+def _pares_a_array(pares):
+    plano = array('i')
+    for x, y in pares:
+        plano.append(x)
+        plano.append(y)
+    return plano
+
+
+def _array_a_pares(plano):
+    return list(zip(plano[0::2], plano[1::2]))
+
+
+def guardar(sim, ruta, compresion='zlib'):
+    """Guarda el estado de `sim` en `ruta` de forma atómica. Devuelve los bytes escritos."""
+    if compresion not in COMPRESIONES:
+        raise ValueError(f"Compresión desconocida: {compresion}")
+    codigo = COMPRESIONES[compresion]
+    version_rng, estado_rng, gauss_siguiente = sim.rng.getstate()
+    meta = {
+        'config': sim._config,
+        'semilla': sim.seed,
+        'tick': sim.tick,
+        'paso_actual': sim.paso_actual,
+        'siguiente_id': sim._next_snake_id,
+        'initial_snakes': sim._initial_snakes,
+        'initial_food': sim._initial_food,
+        'comandos': [list(c) for c in sim._comandos],
+        'rng_version': version_rng,
+        'rng_gauss': gauss_siguiente,
+    }
+    serpientes = sim.serpientes
+    posicion = {id(s): i for i, s in enumerate(serpientes)}
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    os.makedirs(directorio, exist_ok=True)
+    temporal = ruta + '.tmp'
+    with open(temporal, 'wb') as f:
+        f.write(_CABECERA.pack(MAGIA, VERSION, codigo))
+        escritor = _Escritor(f, codigo)
+        escritor.seccion(json.dumps(meta, separators=(',', ':')).encode('utf-8'))
+        escritor.seccion(_a_bytes(array('I', estado_rng)))
+        escritor.seccion(_a_bytes(array('q', [s.id for s in serpientes])),
+                         _a_bytes(array('q', [s.energia for s in serpientes])),
+                         _a_bytes(array('q', [s.edad for s in serpientes])),
+                         _a_bytes(array('q', [s.nacimiento for s in serpientes])),
+                         _a_bytes(array('I', [s.comida_comida for s in serpientes])),
+                         _a_bytes(array('I', [s.hijos_generados for s in serpientes])),
+                         _a_bytes(array('I', [s.color_rgb for s in serpientes])))
+        genes = array('d')
+        for s in serpientes:
+            genes.extend(s.genes)
+        escritor.seccion(_a_bytes(array('B', [len(s.genes) for s in serpientes])), _a_bytes(genes))
+        segmentos = array('i')
+        for s in serpientes:
+            segmentos.extend(_pares_a_array(s.cuerpo))
+        escritor.seccion(_a_bytes(array('I', [len(s.cuerpo) for s in serpientes])), _a_bytes(segmentos))
+        escritor.seccion(_a_bytes(_pares_a_array(sim.comida)))
+        escritor.seccion(_a_bytes(_pares_a_array(pos for pos, _ in sim.comida.indice)))
+        escritor.seccion(_a_bytes(array('I', [posicion[id(s)] for s, _ in sim.indice_cabezas])))
+        escritor.seccion(_a_bytes(sim.entorno.libres_en_orden()))
+        escritor.cerrar()
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+    return os.path.getsize(ruta)
+
+
+def _leer_cuerpo(ruta):
+    with open(ruta, 'rb') as f:
+        cabecera = f.read(_CABECERA.size)
+        if len(cabecera) < _CABECERA.size:
+            raise ErrorCheckpoint("Checkpoint truncado")
+        magia, version, codigo = _CABECERA.unpack(cabecera)
+        if magia != MAGIA:
+            raise ErrorCheckpoint(f"{ruta} no es un checkpoint de la simulación")
+        if version != VERSION:
+            raise ErrorCheckpoint(f"Versión de checkpoint no soportada: {version}")
+        if codigo == 0:
+            return f.read()
+        if codigo == 1:
+            descompresor = zlib.decompressobj()
+        elif codigo == 2:
+            descompresor = lzma.LZMADecompressor()
+        else:
+            raise ErrorCheckpoint(f"Compresión desconocida: {codigo}")
+        partes = []
+        try:
+            while True:
+                bloque = f.read(_BLOQUE_LECTURA)
+                if not bloque:
+                    break
+                partes.append(descompresor.decompress(bloque))
+        except (zlib.error, lzma.LZMAError) as e:
+            raise ErrorCheckpoint(f"Checkpoint corrupto: {e}") from e
+        return b''.join(partes)
+
+
+def cargar(ruta):
+    """Crea un SimulationManager con el estado guardado en `ruta`."""
+    lector = _Lector(_leer_cuerpo(ruta))
+    try:
+        meta = json.loads(lector.seccion().decode('utf-8'))
+        estado_rng = _de_bytes('I', lector.seccion())
+        columnas = lector.seccion()
+        n = len(columnas) // 44 # 4 columnas int64 + 3 uint32 por serpiente
+        ids = _de_bytes('q', columnas[:8 * n])
+        energias = _de_bytes('q', columnas[8 * n:16 * n])
+        edades = _de_bytes('q', columnas[16 * n:24 * n])
+        nacimientos = _de_bytes('q', columnas[24 * n:32 * n])
+        comidas = _de_bytes('I', columnas[32 * n:36 * n])
+        hijos = _de_bytes('I', columnas[36 * n:40 * n])
+        colores = _de_bytes('I', columnas[40 * n:44 * n])
+        seccion = lector.seccion()
+        num_genes = _de_bytes('B', seccion[:n])
+        genes = _de_bytes('d', seccion[n:])
+        seccion = lector.seccion()
+        longitudes = _de_bytes('I', seccion[:4 * n])
+        segmentos = _de_bytes('i', seccion[4 * n:])
+        comida = _array_a_pares(_de_bytes('i', lector.seccion()))
+        orden_comida = _array_a_pares(_de_bytes('i', lector.seccion()))
+        orden_cabezas = _de_bytes('I', lector.seccion())
+        libres = _de_bytes('i', lector.seccion())
+
+        config = meta['config']
+        sim = SimulationManager(**dict(config, initial_snakes=0, initial_food=0), seed=meta['semilla'])
+        sim._config = config
+        sim._initial_snakes = meta['initial_snakes']
+        sim._initial_food = meta['initial_food']
+        sim.tick = meta['tick']
+        sim.paso_actual = meta['paso_actual']
+        sim._next_snake_id = meta['siguiente_id']
+        sim._comandos = [tuple(c) for c in meta['comandos']]
+        sim.rng.setstate((meta['rng_version'], tuple(estado_rng), meta['rng_gauss']))
+
+        serpientes = []
+        g = 0
+        k = 0
+        for i in range(n):
+            cuerpo = _array_a_pares(segmentos[k:k + 2 * longitudes[i]])
+            k += 2 * longitudes[i]
+            s = Serpiente(ids[i], *cuerpo[0], color=colores[i], genes=genes[g:g + num_genes[i]], nacimiento=nacimientos[i])
+            s.cuerpo = Cuerpo(cuerpo)
+            g += num_genes[i]
+            s.energia = energias[i]
+            s.edad = edades[i]
+            s.comida_comida = comidas[i]
+            s.hijos_generados = hijos[i]
+            serpientes.append(s)
+        sim.serpientes = serpientes
+        sim._reconstruir_indices(comida, orden_comida, orden_cabezas, libres)
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        # JSON roto, claves que faltan o columnas de otra longitud: para app.py es lo mismo que un truncado
+        raise ErrorCheckpoint(f"Checkpoint inconsistente: {e}") from e
+    return sim
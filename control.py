@@ -0,0 +1,115 @@
+"""Control de velocidad del hilo de simulación: pausa, paso a paso, ritmo y turbo.
+
+El hilo de simulación pide a ControlVelocidad cuántos pasos dar en el siguiente lote
+(siguiente_lote) y los da todos con el lock tomado una sola vez. En modo normal un
+lote es un paso; en turbo son K, así que los clientes solo ven uno de cada K estados.
+Entre lotes se espera hasta completar `intervalo_ms` desde el inicio del anterior
+(si el lote tarda más, no se espera). Las esperas son sobre una Condition, de modo
+que pausar, reanudar, avanzar o cambiar el ritmo surte efecto en el acto.
+
+Los pasos por segundo conseguidos se miden sobre una ventana deslizante de los
+últimos lotes.
+"""
+import math
+import threading
+import time
+from collections import deque
+
+TURBO_MAXIMO = 10000 # Pasos por lote como máximo (el lock se retiene todo el lote)
+INTERVALO_MAXIMO_MS = 3600 * 1000 # Una hora entre lotes; muy por debajo de threading.TIMEOUT_MAX
+
+
+class ControlVelocidad:
+    def __init__(self, intervalo_ms=500, turbo=1, ventana_s=5.0):
+        self._condicion = threading.Condition()
+        self.pausado = False
+        self.intervalo_ms = intervalo_ms
+        self.turbo = turbo # Pasos por lote (1: normal)
+        self.ventana_s = ventana_s
+        self._pendientes = 0 # Pasos sueltos pedidos con avanzar()
+        self._proximo = 0.0 # Momento (monotonic) a partir del cual puede empezar el lote siguiente
+        self._lotes = deque() # (fin del lote, pasos) dentro de la ventana
+        self.pasos_totales = 0
+
+    def configurar(self, pausado=None, intervalo_ms=None, turbo=None):
+        """Cambia lo que se indique; los valores fuera de rango lanzan ValueError."""
+        if intervalo_ms is not None and not (math.isfinite(intervalo_ms) and 0 <= intervalo_ms <= INTERVALO_MAXIMO_MS):
+            raise ValueError(f"intervalo_ms debe estar entre 0 y {INTERVALO_MAXIMO_MS}")
+        if turbo is not None and not 1 <= turbo <= TURBO_MAXIMO:
+            raise ValueError(f"turbo debe estar entre 1 y {TURBO_MAXIMO}")
+        with self._condicion:
+            if pausado is not None:
+                self.pausado = pausado
+            if intervalo_ms is not None:
+                self.intervalo_ms = intervalo_ms
+                self._proximo = 0.0 # El ritmo nuevo empieza ya, sin esperar al antiguo
+            if turbo is not None:
+                self.turbo = turbo
+            self._condicion.notify_all()
+
+    def avanzar(self, pasos=1):
+        """Pide `pasos` pasos sueltos (pensado para la pausa). Se dan en lotes de como mucho
+        TURBO_MAXIMO, soltando el lock de la simulación entre uno y otro."""
+        if not 1 <= pasos <= TURBO_MAXIMO:
+            raise ValueError(f"pasos debe estar entre 1 y {TURBO_MAXIMO}")
+        with self._condicion:
+            self._pendientes += pasos
+            self._condicion.notify_all()
+
+    def despertar(self):
+        """Saca al hilo de simulación de cualquier espera (p. ej. al apagar)."""
+        with self._condicion:
+            self._condicion.notify_all()
+
+    def siguiente_lote(self, seguir):
+        """Bloquea hasta que toque dar pasos y devuelve cuántos; 0 si seguir() pasa a ser
+        False durante la espera."""
+        with self._condicion:
+            while seguir():
+                if self._pendientes:
+                    # Varias peticiones seguidas pueden acumular más de un lote máximo
+                    pasos = min(self._pendientes, TURBO_MAXIMO)
+                    self._pendientes -= pasos
+                    return pasos
+                if self.pausado:
+                    self._condicion.wait()
+                    continue
+                espera = self._proximo - time.monotonic()
+                if espera <= 0:
+                    return self.turbo
+                self._condicion.wait(espera)
+            return 0
+
+    def registrar(self, pasos, inicio):
+        """Anota un lote de `pasos` empezado en `inicio` (time.monotonic()) y ya terminado."""
+        fin = time.monotonic()
+        with self._condicion:
+            self._proximo = inicio + self.intervalo_ms / 1000.0
+            self.pasos_totales += pasos
+            self._lotes.append((fin, pasos))
+            while self._lotes and fin - self._lotes[0][0] > self.ventana_s:
+                self._lotes.popleft()
+
+    def pasos_por_segundo(self):
+        with self._condicion:
+            if not self._lotes:
+                return 0.0
+            ahora = time.monotonic()
+            if ahora - self._lotes[-1][0] > self.ventana_s:
+                return 0.0 # Parado (en pausa o atascado) desde hace más que la ventana
+            # Pasos de los lotes posteriores al primero entre el fin del primero y el del último
+            primero, ultimo = self._lotes[0][0], self._lotes[-1][0]
+            pasos = sum(p for _, p in self._lotes) - self._lotes[0][1]
+            return pasos / (ultimo - primero) if ultimo > primero else 0.0
+
+    def estado(self):
+        pasos_por_segundo = self.pasos_por_segundo()
+        with self._condicion:
+            return {
+                'pausado': self.pausado,
+                'intervalo_ms': self.intervalo_ms,
+                'turbo': self.turbo,
+                'pasos_pendientes': self._pendientes,
+                'pasos_por_segundo': pasos_por_segundo,
+                'pasos_totales': self.pasos_totales,
+            }
@@ -0,0 +1,198 @@
+"""Especies en línea: k-means por mini-lotes sobre los genes y diversidad muestreada.
+
+Cada `cada` pasos, EspeciesEnLinea toma un mini-lote con los genomas nacidos desde la
+última vez y una muestra al azar de la población viva. Asigna cada genoma al centroide
+más cercano y mueve los centroides hacia la media de lo asignado, con tasa
+1 / (peso acumulado) (Sculley, 2010). El peso se limita a `memoria` para que los centroides
+sigan la deriva de la población en vez de congelarse. Al nacer, cada serpiente recibe
+la etiqueta de su centroide más cercano; al morir, su etiqueta se descuenta. Las
+serpientes de la muestra se re-etiquetan en cada actualización.
+
+La diversidad se estima sobre una muestra: distancia euclídea media entre pares
+(con la matriz de Gram, vectorizada) y entropía de Shannon de cada gen en 10 cubetas.
+Todo se calcula en actualizar() y se guarda, así que resumen() es O(1).
+
+Usa su propio generador: activarla no cambia la ejecución de la simulación.
+"""
+try:
+    import numpy as np
+except ImportError: # Solo se necesita con las especies activas
+    np = None
+
+CUBETAS_ENTROPIA = 10
+
+
+class EspeciesEnLinea:
+    def __init__(self, k=6, num_genes=10, lote=256, muestra=512, cada=10, memoria=5000, semilla=0):
+        self.k = k
+        self.num_genes = num_genes
+        self.lote = lote
+        self.muestra = muestra
+        self.cada = cada
+        self.memoria = memoria
+        self.semilla = semilla
+        self.activo = False
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self._rng = np.random.default_rng(self.semilla) if np is not None else None
+        self.centroides = None # (k, num_genes), se siembran con la primera muestra
+        self._pesos = None
+        self.etiquetas = {} # id de serpiente -> especie
+        self._tamaños = [0] * self.k
+        self._nacidos = [] # Genomas nacidos desde la última actualización
+        self._muertos_sin_etiqueta = set() # Nacidos en el intervalo que ya murieron
+        self._ultimo_tick = None
+        self._resumen = {'activo': False}
+
+    def activar(self, n, obtener):
+        """Activa el seguimiento y etiqueta a toda la población actual (una pasada O(N)).
+        obtener(indices) devuelve (ids, genes) de esas posiciones de la población."""
+        if np is None:
+            raise ImportError("Las especies necesitan NumPy")
+        self._reiniciar()
+        self.activo = True
+        if n:
+            ids, genes = obtener(range(n))
+            genes = self._matriz(genes)
+            self._sembrar(genes)
+            for id_serpiente, etiqueta in zip(ids, self._asignar(genes)[0].tolist()):
+                self.etiquetas[id_serpiente] = etiqueta
+                self._tamaños[etiqueta] += 1
+
+    def desactivar(self):
+        self.activo = False
+        self._reiniciar()
+
+    def olvidar_poblacion(self):
+        """Tras un reinicio de la simulación: se conservan los centroides, no las etiquetas."""
+        self.etiquetas = {}
+        self._tamaños = [0] * self.k
+        self._nacidos = []
+        self._muertos_sin_etiqueta = set()
+
+    # --- Altas y bajas (O(1); el trabajo vectorizado va en actualizar) ---
+    def alta(self, id_serpiente, genes):
+        self._nacidos.append((id_serpiente, genes))
+
+    def alta_lote(self, ids, genes):
+        self._nacidos.extend(zip(ids, genes))
+
+    def baja(self, id_serpiente):
+        etiqueta = self.etiquetas.pop(id_serpiente, None)
+        if etiqueta is not None:
+            self._tamaños[etiqueta] -= 1
+        elif self._nacidos:
+            self._muertos_sin_etiqueta.add(id_serpiente) # Nació en este intervalo: no se etiquetará
+
+    # --- Mini-lotes ---
+    def _matriz(self, genes):
+        if isinstance(genes, np.ndarray) and genes.ndim == 2 and genes.shape[1] == self.num_genes:
+            return genes.astype(np.float64)
+        matriz = np.full((len(genes), self.num_genes), np.nan)
+        for i, g in enumerate(genes):
+            g = list(g)[:self.num_genes]
+            matriz[i, :len(g)] = g
+        return np.nan_to_num(matriz, nan=0.5)
+
+    def _sembrar(self, genes):
+        elegidos = self._rng.choice(len(genes), size=self.k, replace=len(genes) < self.k)
+        self.centroides = genes[elegidos].copy()
+        self.centroides += self._rng.normal(0, 1e-3, self.centroides.shape) # Separar duplicados
+        self._pesos = np.ones(self.k)
+
+    def _asignar(self, genes):
+        """Centroide más cercano de cada genoma y su distancia al cuadrado."""
+        d2 = ((genes ** 2).sum(axis=1)[:, None] - 2 * genes @ self.centroides.T
+              + (self.centroides ** 2).sum(axis=1)[None, :])
+        etiquetas = d2.argmin(axis=1)
+        return etiquetas, np.maximum(d2[np.arange(len(genes)), etiquetas], 0)
+
+    def actualizar(self, tick, n, obtener):
+        """Llamado al final de cada paso; trabaja uno de cada `cada` pasos."""
+        if self._ultimo_tick is not None and tick - self._ultimo_tick < self.cada:
+            return
+        self._ultimo_tick = tick
+        nacidos, self._nacidos = self._nacidos, []
+        muertos, self._muertos_sin_etiqueta = self._muertos_sin_etiqueta, set()
+        indices = self._rng.choice(n, size=min(n, self.muestra), replace=False) if n else []
+        ids, genes = obtener(indices) if n else ([], [])
+        muestra = self._matriz(genes)
+        if self.centroides is None:
+            if not n:
+                return
+            self._sembrar(muestra)
+
+        # Nacidos: etiqueta inicial (salvo los que ya murieron) y parte del mini-lote
+        vivos_nacidos = [(i, g) for i, g in nacidos if i not in muertos]
+        lote = muestra[:self.lote]
+        if vivos_nacidos:
+            genes_nacidos = self._matriz([g for _, g in vivos_nacidos])
+            lote = np.vstack([genes_nacidos, lote])
+        etiquetas_lote, _ = self._asignar(lote)
+        for (id_serpiente, _), etiqueta in zip(vivos_nacidos, etiquetas_lote[:len(vivos_nacidos)].tolist()):
+            self.etiquetas[id_serpiente] = etiqueta
+            self._tamaños[etiqueta] += 1
+        self._mover_centroides(lote, etiquetas_lote)
+
+        # Re-etiquetar la muestra con los centroides nuevos
+        etiquetas, d2 = self._asignar(muestra)
+        for id_serpiente, etiqueta in zip(ids, etiquetas.tolist()):
+            anterior = self.etiquetas.get(id_serpiente)
+            if anterior != etiqueta:
+                if anterior is not None:
+                    self._tamaños[anterior] -= 1
+                self._tamaños[etiqueta] += 1
+                self.etiquetas[id_serpiente] = etiqueta
+        self._resumir(tick, n, muestra, etiquetas, d2)
+
+    def _mover_centroides(self, lote, etiquetas):
+        cuenta = np.bincount(etiquetas, minlength=self.k).astype(np.float64)
+        suma = np.zeros_like(self.centroides)
+        np.add.at(suma, etiquetas, lote)
+        con_datos = cuenta > 0
+        nuevos_pesos = self._pesos + cuenta
+        self.centroides[con_datos] = ((self._pesos[con_datos, None] * self.centroides[con_datos] + suma[con_datos])
+                                      / nuevos_pesos[con_datos, None])
+        self._pesos = np.minimum(nuevos_pesos, self.memoria)
+        # Especies extinguidas: resembrar en el genoma peor representado del lote
+        vacias = [c for c in range(self.k) if self._tamaños[c] <= 0 and not con_datos[c]]
+        if vacias and len(lote):
+            _, d2 = self._asignar(lote)
+            for c, fila in zip(vacias, np.argsort(d2)[::-1].tolist()):
+                self.centroides[c] = lote[fila]
+                self._pesos[c] = 1.0
+
+    def _resumir(self, tick, n, muestra, etiquetas, d2):
+        m = len(muestra)
+        diversidad = {'muestra': m, 'distancia_media': 0.0, 'entropia_genes': [0.0] * self.num_genes, 'entropia_media': 0.0}
+        if m > 1:
+            cuadrados = (muestra ** 2).sum(axis=1)
+            distancias = np.sqrt(np.maximum(cuadrados[:, None] + cuadrados[None, :] - 2 * muestra @ muestra.T, 0))
+            diversidad['distancia_media'] = float(distancias.sum() / (m * (m - 1)))
+            cubetas = np.clip((muestra * CUBETAS_ENTROPIA).astype(np.int64), 0, CUBETAS_ENTROPIA - 1)
+            # Cuenta por (gen, cubeta) de una vez desplazando las cubetas de cada gen
+            cuentas = np.bincount((cubetas + np.arange(self.num_genes) * CUBETAS_ENTROPIA).ravel(),
+                                  minlength=self.num_genes * CUBETAS_ENTROPIA).reshape(self.num_genes, CUBETAS_ENTROPIA)
+            p = cuentas / m
+            with np.errstate(divide='ignore', invalid='ignore'):
+                entropia = -np.where(p > 0, p * np.log2(p), 0).sum(axis=1)
+            diversidad['entropia_genes'] = entropia.tolist()
+            diversidad['entropia_media'] = float(entropia.mean())
+        proporciones = np.bincount(etiquetas, minlength=self.k) / m if m else np.zeros(self.k)
+        self._resumen = {
+            'activo': True,
+            'tick': tick,
+            'serpientes': n,
+            'k': self.k,
+            'centroides': self.centroides.tolist(),
+            'tamaños': list(self._tamaños),
+            'proporciones_muestra': proporciones.tolist(),
+            'distancia_media_al_centroide': float(np.sqrt(d2).mean()) if m else 0.0,
+            'diversidad': diversidad,
+            'entropia_maxima': float(np.log2(CUBETAS_ENTROPIA)),
+        }
+
+    def resumen(self):
+        """Último resultado calculado (O(1))."""
+        return self._resumen
@@ -0,0 +1,204 @@
+"""Estadísticas en una sola pasada para agregar muchas ejecuciones sin guardarlas.
+
+Acumulador usa el algoritmo de Welford: media y varianza se actualizan con cada
+valor en O(1) y memoria constante, sin la pérdida de precisión de sumar cuadrados.
+EstadisticasPoblacion aplica la misma idea a la población viva, con altas y bajas.
+"""
+import math
+from collections import deque
+
+# Valores críticos de la t de Student (dos colas, 95%) para 1..30 grados de libertad
+_T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+         2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+         2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+_Z_95 = 1.960
+
+
+class Acumulador:
+    """Media, varianza, mínimo y máximo de una serie de valores, en O(1) por valor."""
+    __slots__ = ('n', 'media', '_m2', 'minimo', 'maximo')
+
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self._m2 = 0.0 # Suma de cuadrados de las desviaciones respecto a la media
+        self.minimo = math.inf
+        self.maximo = -math.inf
+
+    def añadir(self, valor):
+        self.n += 1
+        delta = valor - self.media
+        self.media += delta / self.n
+        self._m2 += delta * (valor - self.media)
+        if valor < self.minimo:
+            self.minimo = valor
+        if valor > self.maximo:
+            self.maximo = valor
+
+    def combinar(self, otro):
+        """Suma a este acumulador los valores de otro (fórmula de Chan et al.)."""
+        if not otro.n:
+            return
+        if not self.n:
+            self.n, self.media, self._m2, self.minimo, self.maximo = otro.n, otro.media, otro._m2, otro.minimo, otro.maximo
+            return
+        n = self.n + otro.n
+        delta = otro.media - self.media
+        self.media += delta * otro.n / n
+        self._m2 += otro._m2 + delta * delta * self.n * otro.n / n
+        self.n = n
+        self.minimo = min(self.minimo, otro.minimo)
+        self.maximo = max(self.maximo, otro.maximo)
+
+    @property
+    def varianza(self):
+        """Varianza muestral (n - 1)."""
+        return self._m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def desviacion(self):
+        return math.sqrt(self.varianza)
+
+    def intervalo_95(self):
+        """Intervalo de confianza del 95% para la media (t de Student hasta 30 g.l.)."""
+        if self.n < 2:
+            return (self.media, self.media)
+        critico = _T_95[self.n - 2] if self.n - 1 <= len(_T_95) else _Z_95
+        margen = critico * self.desviacion / math.sqrt(self.n)
+        return (self.media - margen, self.media + margen)
+
+    def como_dict(self):
+        if not self.n:
+            return {'n': 0}
+        inferior, superior = self.intervalo_95()
+        return {'n': self.n, 'media': self.media, 'desviacion': self.desviacion,
+                'ic95': [inferior, superior], 'min': self.minimo, 'max': self.maximo}
+
+
+class AcumuladorGrupo:
+    """Un Acumulador por nombre de métrica, creado la primera vez que aparece."""
+    def __init__(self):
+        self.metricas = {}
+
+    def añadir(self, nombre, valor):
+        acumulador = self.metricas.get(nombre)
+        if acumulador is None:
+            acumulador = self.metricas[nombre] = Acumulador()
+        acumulador.añadir(valor)
+
+    def como_dict(self):
+        return {nombre: a.como_dict() for nombre, a in self.metricas.items()}
+
+
+def serie_en_columnas(filas, desde=None, cada=1):
+    """Filas de la serie (las de EstadisticasPoblacion.serie o una copia) en columnas,
+    solo los ticks >= desde y una de cada `cada`."""
+    filas = [f for f in filas if desde is None or f[0] >= desde][::max(1, cada)]
+    return {campo: [f[i] for f in filas] for i, campo in enumerate(EstadisticasPoblacion.CAMPOS_SERIE)}
+
+
+class EstadisticasPoblacion:
+    """Agregados de la población viva mantenidos de forma incremental.
+
+    La simulación llama a alta/baja al nacer y morir cada serpiente y a ajustar con
+    los cambios de energía y edad del paso, así que consultar cuesta O(1) con cualquier
+    población. Media y varianza de cada gen usan Welford con altas y bajas (los genes
+    no cambian en vida). cerrar_paso guarda una fila por paso en un buffer circular.
+    """
+    CAMPOS_SERIE = ('tick', 'paso', 'serpientes', 'energia_media', 'edad_media', 'comida', 'nacimientos', 'muertes',
+                    'genes_medios')
+
+    def __init__(self, num_genes=10, capacidad=3600):
+        self.num_genes = num_genes
+        self.serie = deque(maxlen=capacidad)
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Población vacía (la serie se conserva)."""
+        self.n = 0
+        self.energia_total = 0
+        self.edad_total = 0
+        self._medias = [0.0] * self.num_genes
+        self._m2 = [0.0] * self.num_genes
+        self.nacimientos = 0 # Del paso en curso
+        self.muertes = 0
+        self.ultimo = None
+
+    def alta(self, serpiente):
+        self.n += 1
+        self.energia_total += serpiente.energia
+        self.edad_total += serpiente.edad
+        n = self.n
+        medias, m2 = self._medias, self._m2
+        for g, valor in zip(range(self.num_genes), serpiente.genes):
+            delta = valor - medias[g]
+            medias[g] += delta / n
+            m2[g] += delta * (valor - medias[g])
+
+    def baja(self, serpiente):
+        self.n -= 1
+        self.energia_total -= serpiente.energia
+        self.edad_total -= serpiente.edad
+        n = self.n
+        if not n:
+            self._medias = [0.0] * self.num_genes
+            self._m2 = [0.0] * self.num_genes
+            return
+        medias, m2 = self._medias, self._m2
+        for g, valor in zip(range(self.num_genes), serpiente.genes):
+            delta = valor - medias[g]
+            medias[g] -= delta / n
+            m2[g] = max(0.0, m2[g] - delta * (valor - medias[g]))
+
+    def ajustar(self, energia=0, edad=0):
+        self.energia_total += energia
+        self.edad_total += edad
+
+    def recalcular(self, serpientes):
+        """Reconstruye los agregados desde cero (tras restaurar un estado)."""
+        self.reiniciar()
+        for s in serpientes:
+            self.alta(s)
+
+    def fijar(self, n, energia_total, edad_total, medias, varianzas, nacimientos, muertes):
+        """Para motores que calculan los agregados de golpe (el motor NumPy, vectorizado)."""
+        self.n = n
+        self.energia_total = energia_total
+        self.edad_total = edad_total
+        self._medias = list(medias)
+        self._m2 = [v * (n - 1) for v in varianzas] if n > 1 else [0.0] * len(medias)
+        self.nacimientos = nacimientos
+        self.muertes = muertes
+
+    def medias(self):
+        return list(self._medias)
+
+    def varianzas(self):
+        return [m2 / (self.n - 1) for m2 in self._m2] if self.n > 1 else [0.0] * len(self._m2)
+
+    def cerrar_paso(self, tick, paso, comida):
+        """Guarda la fila del paso en la serie y pone a cero los contadores del paso."""
+        n = self.n
+        self.ultimo = (tick, paso, n, self.energia_total / n if n else 0, self.edad_total / n if n else 0, comida,
+                       self.nacimientos, self.muertes, tuple(self._medias))
+        self.serie.append(self.ultimo)
+        self.nacimientos = 0
+        self.muertes = 0
+
+    def como_dict(self, comida):
+        n = self.n
+        return {
+            'num_serpientes': n,
+            'num_comida': comida,
+            'energia_total': self.energia_total,
+            'energia_media': self.energia_total / n if n else 0,
+            'edad_media': self.edad_total / n if n else 0,
+            'genes_medios': self.medias(),
+            'genes_varianza': self.varianzas(),
+            'nacimientos_ultimo_paso': self.ultimo[6] if self.ultimo else 0,
+            'muertes_ultimo_paso': self.ultimo[7] if self.ultimo else 0,
+        }
+
+    def serie_dict(self, desde=None, cada=1):
+        """Serie temporal en columnas (solo los ticks >= desde, uno de cada `cada`)."""
+        return serie_en_columnas(self.serie, desde, cada)
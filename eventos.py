@@ -0,0 +1,151 @@
+"""Trazado estructurado de eventos de la simulación.
+
+Los eventos (muerte, nacimiento, comida, serpiente atrapada, choque consigo misma)
+se guardan como registros de enteros en un buffer circular preasignado. Mientras
+el registro está desactivado, el código de la simulación solo paga una comprobación
+de `registro.activo` por evento, sin formatear nada.
+
+ExportadorEventos vuelca al logger, desde su propio hilo, lotes muestreados de los
+eventos nuevos, para que el hilo de simulación nunca formatee mensajes.
+"""
+import logging
+import threading
+
+# Tipos de evento
+EVENTO_MUERTE = 1
+EVENTO_NACIMIENTO = 2
+EVENTO_COMIDA = 3
+EVENTO_ATRAPADA = 4
+EVENTO_CHOQUE_PROPIO = 5
+NOMBRES_EVENTO = {
+    EVENTO_MUERTE: 'muerte',
+    EVENTO_NACIMIENTO: 'nacimiento',
+    EVENTO_COMIDA: 'comida',
+    EVENTO_ATRAPADA: 'atrapada',
+    EVENTO_CHOQUE_PROPIO: 'choque_propio',
+}
+TIPOS_POR_NOMBRE = {nombre: tipo for tipo, nombre in NOMBRES_EVENTO.items()}
+
+# Causas de muerte (campo `dato` de EVENTO_MUERTE)
+CAUSA_PARED = 1
+CAUSA_ENERGIA = 2
+CAUSA_EDAD = 3
+NOMBRES_CAUSA = {CAUSA_PARED: 'pared', CAUSA_ENERGIA: 'energia', CAUSA_EDAD: 'edad'}
+
+# Significado de `dato` según el tipo, para la salida legible
+_SIGNIFICADO_DATO = {
+    EVENTO_MUERTE: 'causa', # dato = CAUSA_*
+    EVENTO_NACIMIENTO: 'padres', # dato, dato2 = ids de los padres
+    EVENTO_COMIDA: 'energia', # dato = energía tras comer
+}
+
+
+class RegistroEventos:
+    """Buffer circular de eventos con campos en listas preasignadas.
+
+    Cada evento tiene un número de secuencia creciente; el buffer guarda los últimos
+    `capacidad`, de los que se pueden leer `capacidad - 1`. Lo escribe un único hilo (el
+    de la simulación); los lectores copian un rango y descartan lo que el escritor haya
+    sobrescrito o esté sobrescribiendo mientras tanto, así que no hace falta lock.
+    """
+    def __init__(self, capacidad=65536, activo=False):
+        self.activo = activo
+        self.capacidad = capacidad
+        self.total = 0 # Eventos registrados desde el inicio (secuencia del siguiente)
+        self._paso = [0] * capacidad
+        self._tipo = [0] * capacidad
+        self._id = [0] * capacidad
+        self._x = [0] * capacidad
+        self._y = [0] * capacidad
+        self._dato = [0] * capacidad
+        self._dato2 = [0] * capacidad
+
+    def registrar(self, tipo, paso, id, x, y, dato=0, dato2=0):
+        """Guarda un evento. Llamar solo si self.activo (la comprobación la hace quien llama)."""
+        i = self.total % self.capacidad
+        self._paso[i] = paso
+        self._tipo[i] = tipo
+        self._id[i] = id
+        self._x[i] = x
+        self._y[i] = y
+        self._dato[i] = dato
+        self._dato2[i] = dato2
+        self.total += 1
+
+    def registrar_lote(self, tipo, paso, ids, xs, ys, datos=None, datos2=None):
+        """Guarda varios eventos del mismo tipo (listas paralelas), p. ej. desde el motor NumPy."""
+        n = len(ids)
+        datos = datos if datos is not None else [0] * n
+        datos2 = datos2 if datos2 is not None else [0] * n
+        for k in range(n):
+            self.registrar(tipo, paso, ids[k], xs[k], ys[k], datos[k], datos2[k])
+
+    def consultar(self, desde=0, tipo=None, limite=1000):
+        """Devuelve (eventos, siguiente): hasta `limite` eventos con secuencia >= desde
+        (opcionalmente de un solo tipo) y la secuencia desde la que seguir leyendo."""
+        total = self.total
+        seq = max(desde, total - self.capacidad, 0)
+        eventos = []
+        while seq < total and len(eventos) < limite:
+            i = seq % self.capacidad
+            if tipo is None or self._tipo[i] == tipo:
+                eventos.append((seq, self._paso[i], self._tipo[i], self._id[i], self._x[i], self._y[i], self._dato[i], self._dato2[i]))
+            seq += 1
+        # Descartar los que el escritor haya pisado mientras copiábamos. El hueco del evento
+        # `total` (aún sin contar) es el de total - capacidad: también puede estar a medias
+        sobrescritos = self.total - self.capacidad + 1
+        return [_a_dict(e) for e in eventos if e[0] >= sobrescritos], seq
+
+    def resumen(self):
+        return {'activo': self.activo, 'capacidad': self.capacidad, 'total': self.total}
+
+
+def _a_dict(evento):
+    seq, paso, tipo, id, x, y, dato, dato2 = evento
+    d = {'seq': seq, 'paso': paso, 'tipo': NOMBRES_EVENTO.get(tipo, tipo), 'id': id, 'pos': [x, y]}
+    campo = _SIGNIFICADO_DATO.get(tipo)
+    if campo == 'causa':
+        d['causa'] = NOMBRES_CAUSA.get(dato, dato)
+    elif campo == 'padres':
+        d['padres'] = [dato, dato2]
+    elif campo:
+        d[campo] = dato
+    return d
+
+
+class ExportadorEventos:
+    """Hilo que cada `intervalo` segundos vuelca al logger uno de cada `muestreo` eventos nuevos."""
+    def __init__(self, registro, intervalo=5.0, muestreo=100, logger=None):
+        self.registro = registro
+        self.intervalo = intervalo
+        self.muestreo = muestreo
+        self.logger = logger or logging.getLogger('eventos')
+        self._siguiente = 0
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def detener(self):
+        self._parar.set()
+        if self._hilo.is_alive():
+            self._hilo.join(timeout=2)
+
+    def _bucle(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.exportar()
+            except Exception as e:
+                self.logger.error(f"Error exportando eventos: {e}", exc_info=True)
+
+    def exportar(self):
+        """Vuelca un lote muestreado de los eventos registrados desde la última llamada."""
+        eventos, self._siguiente = self.registro.consultar(self._siguiente, limite=self.registro.capacidad)
+        if not eventos:
+            return
+        conteo = {}
+        for e in eventos:
+            conteo[e['tipo']] = conteo.get(e['tipo'], 0) + 1
+        muestra = eventos[::max(1, self.muestreo)]
+        self.logger.info("%d eventos nuevos %s; muestra 1/%d: %s", len(eventos), conteo, self.muestreo, muestra)
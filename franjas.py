@@ -0,0 +1,578 @@
+"""Un solo mundo grande repartido en franjas horizontales, cada una en su proceso.
+
+MundoPorFranjas parte el tablero en K franjas de filas. Cada proceso es dueño de una
+franja: de las serpientes con la cabeza en ella, de su comida y de la ocupación de sus
+celdas. Cada paso tiene tres fases y en cada una las K franjas trabajan en paralelo:
+
+  1. mover: cada franja mueve sus serpientes como SimulationManager.step. Para decidir
+     ve, además de lo suyo, un halo con la comida y las cabezas de las VISION_MAXIMA
+     filas vecinas de las otras franjas (tal como estaban al empezar el paso). Una
+     serpiente cuya cabeza cruza a otra franja se entrega a la dueña de esa fila.
+  2. reproducir: cada franja acoge a las serpientes que le llegan (comen o recortan la
+     cola en su franja nueva) y empareja las cabezas adyacentes de su franja. Las
+     serpientes sin pareja en la primera o la última fila son candidatas de frontera.
+  3. cerrar: el coordinador empareja en orden fijo (x, id) a las candidatas a ambos
+     lados de cada frontera; la franja de arriba crea al hijo. Cada franja informa en
+     la fase 2 de sus celdas libres, así que el coordinador sabe ya qué parejas tendrán
+     hueco para el hijo y las dos franjas cuentan lo mismo. Después cada franja
+     elimina sus muertas, añade los hijos y prepara el halo del paso siguiente.
+
+Los segmentos de un cuerpo pueden quedar en otra franja. Las altas de ocupación
+siempre son locales (una cabeza está en la franja que la mueve); las bajas fuera de la
+franja viajan como deltas hasta su dueña en la fase siguiente. La ocupación solo sirve
+para elegir celdas libres, así que ese retraso solo deja una celda ocupada un poco más.
+
+La dinámica no es idéntica a la de SimulationManager: cada franja tiene su propio
+generador y la comida y los hijos nacen en una celda libre de su franja, no en
+cualquier sitio del tablero. Con la misma semilla y el mismo número de franjas, la
+ejecución es siempre la misma, con procesos o sin ellos (procesos=False, útil para
+depurar). Eventos, métricas, archivo de muertes, especies, grabación y checkpoints
+son del motor de un solo proceso y aquí no están.
+
+Uso:
+    python headless.py --motor franjas --franjas 8 --width 4000 --height 4000 --serpientes 40000 --comida 80000
+"""
+import logging
+import multiprocessing
+import random
+from bisect import bisect_right
+
+from eventos import RegistroEventos, CAUSA_PARED, CAUSA_ENERGIA, CAUSA_EDAD
+from simulation import (AlmacenComida, IndiceEspacial, Serpiente, crear_entorno, cruzar,
+                        COLORES_INICIALES, NUM_GENES, VISION_MAXIMA)
+
+
+class Fantasma:
+    """Copia mínima de una serpiente de otra franja: lo que miran la visión y el cruce."""
+    __slots__ = ('id', 'energia', 'cuerpo', 'genes', 'color_rgb', 'hijos_generados')
+
+    def __init__(self, id, energia, cabeza, genes=None, color_rgb=0):
+        self.id = id
+        self.energia = energia
+        self.cuerpo = (cabeza,)
+        self.genes = genes
+        self.color_rgb = color_rgb
+        self.hijos_generados = 0
+
+
+class Franja:
+    """Filas y0 (incluida) a y1 (excluida) del mundo. Ofrece los atributos de
+    SimulationManager que usa Serpiente.decidir_movimiento."""
+    def __init__(self, indice, limites, width, height, num_serpientes, num_comida, semilla, parametros):
+        self.indice = indice
+        self.limites = limites # Primera fila de cada franja y, al final, height
+        self.num_franjas = len(limites) - 1
+        self.y0, self.y1 = limites[indice], limites[indice + 1]
+        self.width = width
+        self.height = height
+        self.mutation_rate = parametros.get('mutation_rate', 0.1)
+        self.reproduction_energy_cost = parametros.get('reproduction_energy_cost', 25)
+        self.max_age = parametros.get('max_age', 10000)
+        self.food_energy = parametros.get('food_energy', 50)
+        self.snake_initial_energy = parametros.get('snake_initial_energy', 1000)
+        self.rng = random.Random(f'{semilla}/{indice}') # Generador propio de la franja
+        self.eventos = RegistroEventos() # Desactivado; decidir_movimiento lo consulta
+        self._inicializar(num_serpientes, num_comida)
+
+    def _inicializar(self, num_serpientes, num_comida):
+        self.paso_actual = 0
+        self._siguiente_id = 0
+        self.serpientes = []
+        self.comida = AlmacenComida() # La propia y, durante la fase de mover, el halo
+        self.indice_cabezas = IndiceEspacial()
+        self.entorno = crear_entorno(self.width, self.y1 - self.y0, self.rng) # Coordenadas locales
+        self._deltas = [] # Celdas de otras franjas que pierden un segmento
+        self._muertas = {} # id -> causa, hasta el final del paso
+        self._nuevas = []
+        self._comida_halo = []
+        self._fantasmas = []
+        self._contadores = {'comidas': 0, 'movidas': 0, 'nacimientos': 0, 'muertes': 0}
+        for _ in range(num_serpientes):
+            pos = self._libre_aleatoria()
+            if pos is None:
+                logging.warning("Franja %d: no queda espacio para más serpientes iniciales.", self.indice)
+                break
+            color = self.rng.choice(COLORES_INICIALES)
+            serpiente = Serpiente(self._nuevo_id(), pos[0], pos[1], color=color, rng=self.rng)
+            serpiente.energia = self.snake_initial_energy
+            self.serpientes.append(serpiente)
+            self.entorno.ocupar(self._local(pos))
+            self.indice_cabezas.añadir(serpiente, pos)
+        self._añadir_comida(num_comida)
+        return self.informe()
+
+    def reiniciar(self, num_serpientes, num_comida):
+        return self._inicializar(num_serpientes, num_comida)
+
+    # --- Coordenadas y celdas ---
+    def _nuevo_id(self):
+        # Ids únicos en todo el mundo sin coordinarse: cada franja usa su clase de resto
+        self._siguiente_id += 1
+        return (self._siguiente_id - 1) * self.num_franjas + self.indice + 1
+
+    def _local(self, pos):
+        return (pos[0], pos[1] - self.y0)
+
+    def _propia(self, y):
+        return self.y0 <= y < self.y1
+
+    def _dueña(self, y):
+        return bisect_right(self.limites, y) - 1
+
+    def _libre_aleatoria(self):
+        pos = self.entorno.celda_libre_aleatoria()
+        return None if pos is None else (pos[0], pos[1] + self.y0)
+
+    def _liberar(self, pos):
+        if self._propia(pos[1]):
+            self.entorno.liberar(self._local(pos))
+        else:
+            self._deltas.append(pos)
+
+    def _aplicar_deltas(self, deltas):
+        for pos in deltas:
+            self.entorno.liberar(self._local(pos))
+
+    def _tomar_deltas(self):
+        deltas, self._deltas = self._deltas, []
+        return deltas
+
+    def _añadir_comida(self, cantidad):
+        for _ in range(cantidad):
+            pos = self._libre_aleatoria()
+            if pos is None:
+                logging.warning("Franja %d: no se pudo encontrar espacio para añadir comida.", self.indice)
+                return
+            self.comida.añadir(pos)
+            self.entorno.poner_comida(self._local(pos))
+
+    # --- Fase 1: mover ---
+    def mover(self, halo, deltas, comida_extra):
+        """Mueve las serpientes propias. Devuelve ({franja destino: [serpientes que se
+        van]}, deltas de ocupación para otras franjas)."""
+        self._aplicar_deltas(deltas)
+        self._añadir_comida(comida_extra)
+        comida_halo, cabezas_halo = halo
+        for pos in comida_halo:
+            self.comida.añadir(pos)
+        for id_serpiente, energia, x, y in cabezas_halo:
+            fantasma = Fantasma(id_serpiente, energia, (x, y))
+            self.indice_cabezas.añadir(fantasma, (x, y))
+            self._fantasmas.append(fantasma)
+        self._comida_halo = comida_halo
+        self._contadores = {'comidas': 0, 'movidas': 0, 'nacimientos': 0, 'muertes': 0}
+
+        salientes = {}
+        ids_salientes = set()
+        muertas = self._muertas
+        for i in range(len(self.serpientes) - 1, -1, -1):
+            serpiente = self.serpientes[i]
+            if serpiente.energia <= 0:
+                muertas[serpiente.id] = CAUSA_ENERGIA
+                continue
+            if serpiente.edad > self.max_age:
+                muertas[serpiente.id] = CAUSA_EDAD
+                continue
+            direccion = serpiente.decidir_movimiento(self)
+            if not serpiente.mover(direccion, self.width, self.height):
+                muertas[serpiente.id] = CAUSA_PARED
+                continue
+            self._contadores['movidas'] += 1
+            cabeza = serpiente.cuerpo[0]
+            if not self._propia(cabeza[1]):
+                # Cruza la frontera: la franja dueña decide si come y recorta la cola
+                self.indice_cabezas.quitar(serpiente, serpiente.cuerpo[1])
+                salientes.setdefault(self._dueña(cabeza[1]), []).append(serpiente)
+                ids_salientes.add(serpiente.id)
+                continue
+            self.indice_cabezas.mover(serpiente, serpiente.cuerpo[1], cabeza)
+            self._terminar_movimiento(serpiente)
+        if ids_salientes:
+            self.serpientes = [s for s in self.serpientes if s.id not in ids_salientes]
+
+        for pos in self._comida_halo:
+            self.comida.quitar(pos)
+        for fantasma in self._fantasmas:
+            self.indice_cabezas.quitar(fantasma, fantasma.cuerpo[0])
+        self._comida_halo = []
+        self._fantasmas = []
+        return salientes, self._tomar_deltas()
+
+    def _terminar_movimiento(self, serpiente):
+        """Comer, ocupar la cabeza, recortar la cola y muertes del final del turno (la
+        cabeza ya está en esta franja)."""
+        cabeza = serpiente.cuerpo[0]
+        comio_comida = cabeza in self.comida
+        if comio_comida:
+            serpiente.energia += self.food_energy
+            serpiente.comida_comida += 1
+            self._contadores['comidas'] += 1
+            self._añadir_comida(1)
+            self.comida.quitar(cabeza)
+            self.entorno.quitar_comida(self._local(cabeza))
+        self.entorno.ocupar(self._local(cabeza))
+        if not comio_comida and len(serpiente.cuerpo) > 1:
+            self._liberar(serpiente.cuerpo.quitar_cola())
+        if serpiente.energia <= 0:
+            self._muertas[serpiente.id] = CAUSA_ENERGIA
+        elif serpiente.edad > self.max_age:
+            self._muertas[serpiente.id] = CAUSA_EDAD
+
+    # --- Fase 2: acoger y reproducir ---
+    def reproducir(self, llegadas, deltas):
+        """Acoge las serpientes que cruzaron y empareja las cabezas adyacentes de la
+        franja. Devuelve (candidatas de frontera, deltas, celdas libres)."""
+        self._aplicar_deltas(deltas)
+        for serpiente in llegadas:
+            self.serpientes.append(serpiente)
+            self.indice_cabezas.añadir(serpiente, serpiente.cuerpo[0])
+            self._terminar_movimiento(serpiente)
+
+        reproducidas = set()
+        padres = [s for s in self.serpientes if s.id not in self._muertas]
+        cabezas = {}
+        for idx, s in enumerate(padres):
+            cabezas.setdefault(s.cuerpo[0], []).append(idx)
+        for idx1, s1 in enumerate(padres):
+            if s1.id in reproducidas:
+                continue
+            x, y = s1.cuerpo[0]
+            candidatos = []
+            for vecina in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)):
+                for idx2 in cabezas.get(vecina, ()):
+                    if idx2 > idx1:
+                        candidatos.append(idx2)
+            candidatos.sort()
+            for idx2 in candidatos:
+                s2 = padres[idx2]
+                if s2.id in reproducidas:
+                    continue
+                if self._reproducir(s1, s2):
+                    reproducidas.add(s1.id)
+                    reproducidas.add(s2.id)
+                    break
+
+        # Sin pareja en la primera o la última fila: pueden emparejarse con la franja vecina
+        frontera = []
+        for s in padres:
+            x, y = s.cuerpo[0]
+            if s.id in reproducidas or s.energia < self.reproduction_energy_cost:
+                continue
+            if (y == self.y0 and self.indice > 0) or (y == self.y1 - 1 and self.indice < self.num_franjas - 1):
+                frontera.append((s.id, x, y, s.energia, s.genes, s.color_rgb))
+        # Hasta cerrar solo se liberan celdas: hay hueco para al menos tantos hijos de frontera
+        return frontera, self._tomar_deltas(), self.entorno.num_libres()
+
+    def _reproducir(self, s1, s2):
+        """Como SimulationManager.reproducir, con el hijo en una celda libre de la franja.
+        s2 puede ser un Fantasma de la franja vecina (su dueña ya descuenta lo suyo)."""
+        coste = self.reproduction_energy_cost
+        if s1.energia < coste or s2.energia < coste:
+            return None
+        s1.energia -= coste
+        s2.energia -= coste
+        genes_hijo, color_hijo = cruzar(s1, s2, self.mutation_rate, self.rng)
+        pos = self._libre_aleatoria()
+        if pos is None:
+            logging.warning("Franja %d: no hay espacio para el hijo de %s y %s.", self.indice, s1.id, s2.id)
+            return None
+        s1.hijos_generados += 1
+        s2.hijos_generados += 1
+        hijo = Serpiente(self._nuevo_id(), pos[0], pos[1], color=color_hijo, genes=genes_hijo, rng=self.rng)
+        hijo.energia = coste * 2
+        self.entorno.ocupar(self._local(pos))
+        self.indice_cabezas.añadir(hijo, pos)
+        self._nuevas.append(hijo)
+        self._contadores['nacimientos'] += 1
+        return hijo
+
+    # --- Fase 3: cruces de frontera, muertes e hijos ---
+    def cerrar(self, cruces, deltas):
+        """Aplica los cruces decididos por el coordinador, elimina las muertas y añade los
+        hijos. cruces: [(id propio, Fantasma de la pareja o None, nace)]; con Fantasma, esta
+        franja crea al hijo, con None lo crea la otra. Si nace es False no hay hueco para el
+        hijo: ambos pagan el coste sin contar hijo, como en SimulationManager.reproducir.
+        Devuelve (informe, deltas, halo)."""
+        self._aplicar_deltas(deltas)
+        if cruces:
+            por_id = {s.id: s for s in self.serpientes}
+            coste = self.reproduction_energy_cost
+            for id_serpiente, pareja, nace in cruces:
+                serpiente = por_id[id_serpiente]
+                if pareja is not None and nace:
+                    self._reproducir(serpiente, pareja)
+                    continue
+                serpiente.energia -= coste
+                if nace:
+                    serpiente.hijos_generados += 1 # La franja de arriba crea al hijo
+                elif pareja is not None:
+                    logging.warning("Franja %d: no hay espacio para el hijo de %s y %s.", self.indice, id_serpiente, pareja.id)
+
+        supervivientes = []
+        for serpiente in self.serpientes:
+            if serpiente.id not in self._muertas:
+                supervivientes.append(serpiente)
+                continue
+            self.indice_cabezas.quitar(serpiente, serpiente.cuerpo[0])
+            for segmento in serpiente.cuerpo:
+                self._liberar(segmento)
+        self._contadores['muertes'] = len(self.serpientes) - len(supervivientes)
+        supervivientes.extend(self._nuevas)
+        self.serpientes = supervivientes
+        self._nuevas = []
+        self._muertas = {}
+        self.paso_actual += 1
+        return self.informe(), self._tomar_deltas(), self.halo()
+
+    def halo(self):
+        """Comida y cabezas de las VISION_MAXIMA filas junto a cada frontera:
+        (para la franja de arriba, para la de abajo)."""
+        arriba_hasta = self.y0 + VISION_MAXIMA
+        abajo_desde = self.y1 - VISION_MAXIMA
+        comida_arriba = [pos for pos in self.comida if pos[1] < arriba_hasta] if self.indice > 0 else []
+        comida_abajo = [pos for pos in self.comida if pos[1] >= abajo_desde] if self.indice < self.num_franjas - 1 else []
+        cabezas_arriba, cabezas_abajo = [], []
+        for s in self.serpientes:
+            x, y = s.cuerpo[0]
+            if y < arriba_hasta and self.indice > 0:
+                cabezas_arriba.append((s.id, s.energia, x, y))
+            if y >= abajo_desde and self.indice < self.num_franjas - 1:
+                cabezas_abajo.append((s.id, s.energia, x, y))
+        return (comida_arriba, cabezas_arriba), (comida_abajo, cabezas_abajo)
+
+    # --- Consultas ---
+    def informe(self):
+        """Población, comida, sumas de energía y edad y contadores del último paso."""
+        energia = edad = 0
+        for s in self.serpientes:
+            energia += s.energia
+            edad += s.edad
+        return dict(self._contadores, serpientes=len(self.serpientes), comida=len(self.comida), energia=energia, edad=edad)
+
+    def suma_genes(self):
+        suma = [0.0] * NUM_GENES
+        for s in self.serpientes:
+            for g, valor in enumerate(s.genes[:NUM_GENES]):
+                suma[g] += valor
+        return suma
+
+    def estado(self):
+        """Serpientes y comida de la franja con el formato de SimulationManager.get_state."""
+        serpientes = [{
+            'id': s.id,
+            'cuerpo': list(s.cuerpo),
+            'color': s.color,
+            'energia': s.energia,
+            'edad': s.edad,
+            'comida_comida': s.comida_comida,
+            'hijos': s.hijos_generados,
+            'genes_display': [round(g, 2) for g in s.genes[:3]],
+        } for s in self.serpientes]
+        return serpientes, self.comida.como_lista()
+
+
+def _proceso_franja(conexion, argumentos, nivel_log):
+    """Bucle de una franja: cada mensaje es (método, argumentos); None la termina."""
+    logging.basicConfig(level=nivel_log, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger().setLevel(nivel_log)
+    franja = Franja(*argumentos)
+    while True:
+        mensaje = conexion.recv()
+        if mensaje is None:
+            break
+        metodo, args = mensaje
+        conexion.send(getattr(franja, metodo)(*args))
+    conexion.close()
+
+
+class MundoPorFranjas:
+    """Coordina las franjas: lanza los procesos, reparte halos, serpientes que cruzan,
+    deltas de ocupación y parejas de frontera, y agrega los resúmenes. Tiene step(),
+    resumen(), num_serpientes(), get_state() y reset() como SimulationManager."""
+    def __init__(self, width, height, initial_snakes=5, initial_food=10, num_franjas=None, procesos=True,
+                 seed=None, nivel_log=logging.ERROR, **parametros):
+        # Por defecto una franja por núcleo, sin bajar de VISION_MAXIMA filas por franja
+        num_franjas = num_franjas or max(1, min(multiprocessing.cpu_count() or 1, height // VISION_MAXIMA))
+        if num_franjas > 1 and height // num_franjas < VISION_MAXIMA:
+            raise ValueError(f"Cada franja necesita al menos {VISION_MAXIMA} filas (height // franjas)")
+        self.width = width
+        self.height = height
+        self.seed = seed if seed is not None else random.getrandbits(63)
+        self.rng = random.Random(self.seed) # Solo para repartir la comida de reposición
+        self.num_franjas = num_franjas
+        self.limites = [height * b // num_franjas for b in range(num_franjas + 1)]
+        self.paso_actual = 0
+        self.tick = 0
+        self._initial_snakes = initial_snakes
+        self._initial_food = initial_food
+        self._conexiones = []
+        self._procesos = []
+        self._locales = None
+        argumentos = [(b, self.limites, width, height, self._cuota(initial_snakes, b), self._cuota(initial_food, b),
+                       self.seed, parametros) for b in range(num_franjas)]
+        if procesos:
+            for args in argumentos:
+                propia, ajena = multiprocessing.Pipe()
+                proceso = multiprocessing.Process(target=_proceso_franja, args=(ajena, args, nivel_log), daemon=True)
+                proceso.start()
+                ajena.close()
+                self._conexiones.append(propia)
+                self._procesos.append(proceso)
+        else:
+            self._locales = [Franja(*args) for args in argumentos]
+        self._empezar()
+
+    def _cuota(self, total, b):
+        """Parte de `total` que toca a la franja b, proporcional a sus filas."""
+        return total * self.limites[b + 1] // self.height - total * self.limites[b] // self.height
+
+    def _llamar(self, metodo, argumentos):
+        """Llama a `metodo` en cada franja con sus argumentos; todas trabajan a la vez."""
+        if self._locales is not None:
+            return [getattr(franja, metodo)(*args) for franja, args in zip(self._locales, argumentos)]
+        for conexion, args in zip(self._conexiones, argumentos):
+            conexion.send((metodo, args))
+        return [conexion.recv() for conexion in self._conexiones]
+
+    def _empezar(self):
+        self._halos = self._llamar('halo', [()] * self.num_franjas)
+        self._informes = self._llamar('informe', [()] * self.num_franjas)
+        self._deltas = [[] for _ in range(self.num_franjas)]
+        self._comida_extra = [0] * self.num_franjas
+
+    def _repartir_deltas(self, deltas_por_franja):
+        for deltas in deltas_por_franja:
+            for pos in deltas:
+                self._deltas[bisect_right(self.limites, pos[1]) - 1].append(pos)
+
+    def _tomar_deltas(self):
+        deltas, self._deltas = self._deltas, [[] for _ in range(self.num_franjas)]
+        return deltas
+
+    def step(self):
+        k = self.num_franjas
+        # 1. Mover, con el halo de las franjas vecinas
+        halos = []
+        for b in range(k):
+            comida, cabezas = [], []
+            if b > 0:
+                comida += self._halos[b - 1][1][0]
+                cabezas += self._halos[b - 1][1][1]
+            if b < k - 1:
+                comida += self._halos[b + 1][0][0]
+                cabezas += self._halos[b + 1][0][1]
+            halos.append((comida, cabezas))
+        respuestas = self._llamar('mover', list(zip(halos, self._tomar_deltas(), self._comida_extra)))
+        llegadas = [[] for _ in range(k)]
+        for salientes, _ in respuestas: # En orden de franja de origen: determinista
+            for destino, serpientes in salientes.items():
+                llegadas[destino].extend(serpientes)
+        self._repartir_deltas(d for _, d in respuestas)
+
+        # 2. Acoger y reproducir dentro de cada franja
+        respuestas = self._llamar('reproducir', [(l, d) for l, d in zip(llegadas, self._tomar_deltas())])
+        self._repartir_deltas(d for _, d, _ in respuestas)
+
+        # 3. Parejas de frontera, muertes e hijos
+        cruces = self._emparejar_fronteras([f for f, _, _ in respuestas], [libres for _, _, libres in respuestas])
+        respuestas = self._llamar('cerrar', list(zip(cruces, self._tomar_deltas())))
+        self._informes = [r[0] for r in respuestas]
+        self._repartir_deltas(r[1] for r in respuestas)
+        self._halos = [r[2] for r in respuestas]
+        self.paso_actual += 1
+        self.tick += 1
+        self._reponer_comida()
+
+    def _emparejar_fronteras(self, frontera_por_franja, libres_por_franja):
+        """Cada candidata de la última fila de una franja se empareja con la primera libre
+        (por id) de la misma columna al otro lado, recorriendo por (x, id). Solo las
+        primeras parejas, tantas como celdas libres tiene la franja de arriba, tienen hijo."""
+        cruces = [[] for _ in range(self.num_franjas)]
+        for b in range(self.num_franjas - 1):
+            fila = self.limites[b + 1]
+            arriba = sorted((c for c in frontera_por_franja[b] if c[2] == fila - 1), key=lambda c: (c[1], c[0]))
+            abajo = {}
+            for c in sorted((c for c in frontera_por_franja[b + 1] if c[2] == fila), key=lambda c: c[0]):
+                abajo.setdefault(c[1], []).append(c)
+            hijos = 0 # Hijos que creará la franja b (cruces[b] también lleva sus parejas de arriba)
+            for id_serpiente, x, y, _, genes, color in arriba:
+                columna = abajo.get(x)
+                if not columna:
+                    continue
+                id_pareja, _, y_pareja, energia_pareja, genes_pareja, color_pareja = columna.pop(0)
+                nace = hijos < libres_por_franja[b]
+                hijos += nace
+                cruces[b].append((id_serpiente, Fantasma(id_pareja, energia_pareja, (x, y_pareja), genes_pareja, color_pareja),
+                                  nace))
+                cruces[b + 1].append((id_pareja, None, nace))
+        return cruces
+
+    def _reponer_comida(self):
+        """Mínimo de comida de SimulationManager.step, aplicado al principio del paso
+        siguiente en franjas elegidas al azar."""
+        self._comida_extra = [0] * self.num_franjas
+        serpientes = self.num_serpientes()
+        comida = sum(i['comida'] for i in self._informes)
+        if not serpientes or comida >= 5:
+            return
+        for _ in range(min(5, serpientes) if comida == 0 else 1):
+            self._comida_extra[self.rng.randrange(self.num_franjas)] += 1
+
+    def num_serpientes(self):
+        return sum(i['serpientes'] for i in self._informes)
+
+    def resumen(self):
+        """Resumen numérico de la población (mismo formato que SimulationManager.resumen)."""
+        n = self.num_serpientes()
+        genes = []
+        if n:
+            sumas = self._llamar('suma_genes', [()] * self.num_franjas)
+            genes = [sum(suma[g] for suma in sumas) / n for g in range(NUM_GENES)]
+        return {
+            'paso': self.paso_actual,
+            'serpientes': n,
+            'comida': sum(i['comida'] for i in self._informes),
+            'energia_media': sum(i['energia'] for i in self._informes) / n if n else 0,
+            'edad_media': sum(i['edad'] for i in self._informes) / n if n else 0,
+            'genes_medios': genes,
+        }
+
+    def contadores(self):
+        """Comidas, movimientos, nacimientos y muertes del último paso en todo el mundo."""
+        return {clave: sum(i[clave] for i in self._informes) for clave in ('comidas', 'movidas', 'nacimientos', 'muertes')}
+
+    def get_state(self):
+        """Estado completo con el formato de SimulationManager.get_state (junta las franjas)."""
+        serpientes, comida = [], []
+        for s, c in self._llamar('estado', [()] * self.num_franjas):
+            serpientes.extend(s)
+            comida.extend(c)
+        return {'paso': self.paso_actual, 'tick': self.tick, 'serpientes': serpientes, 'comida': comida,
+                'dimensiones': {'width': self.width, 'height': self.height}}
+
+    def reset(self):
+        self._informes = self._llamar('reiniciar', [(self._cuota(self._initial_snakes, b), self._cuota(self._initial_food, b))
+                                                    for b in range(self.num_franjas)])
+        self.paso_actual = 0
+        self.tick += 1 # El reinicio ocupa un tick propio, como en SimulationManager
+        self._empezar()
+        return True
+
+    def cerrar(self):
+        for conexion in self._conexiones:
+            try:
+                conexion.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for proceso in self._procesos:
+            proceso.join(timeout=5)
+        for conexion in self._conexiones:
+            conexion.close()
+        self._conexiones = []
+        self._procesos = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
@@ -0,0 +1,192 @@
+"""Ejecución por lotes de la simulación, sin Flask ni esperas entre pasos.
+
+Corre un mundo configurado durante N pasos (o hasta que se extingan las serpientes)
+tan rápido como se pueda e informa de pasos/s, serpiente-pasos/s y memoria pico.
+Opcionalmente escribe una fila de resumen cada K pasos en un CSV.
+
+Uso:
+    python headless.py --pasos 5000 --width 100 --height 100 --serpientes 50 --csv resumen.csv
+"""
+import argparse
+import csv
+import logging
+import sys
+import time
+
+try:
+    import resource # Solo en sistemas tipo Unix
+except ImportError:
+    resource = None
+
+import replay
+from simulation import SimulationManager
+
+NUM_GENES_CSV = 10
+
+
+def crear_simulacion(motor='python', width=30, height=20, initial_snakes=5, initial_food=10, **parametros):
+    """Crea un SimulationManager (o SimulationManagerNumpy si motor == 'numpy', o un
+    MundoPorFranjas en varios procesos si motor == 'franjas', que acepta num_franjas)."""
+    if motor == 'franjas':
+        from franjas import MundoPorFranjas
+        return MundoPorFranjas(width, height, initial_snakes, initial_food, **parametros)
+    if motor == 'numpy':
+        from simulation_numpy import SimulationManagerNumpy
+        return SimulationManagerNumpy(width, height, initial_snakes, initial_food, **parametros)
+    if motor != 'python':
+        raise ValueError(f"Motor desconocido: {motor}")
+    return SimulationManager(width, height, initial_snakes, initial_food, **parametros)
+
+
+def memoria_pico_kb():
+    """Memoria residente máxima del proceso en KB, o None si no se puede medir."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico // 1024 if sys.platform == 'darwin' else pico # macOS lo da en bytes
+
+
+def ejecutar(sim, pasos, resumen_cada=0, al_resumir=None):
+    """Avanza `sim` hasta `pasos` pasos o hasta la extinción.
+
+    Si resumen_cada > 0, llama a al_resumir(sim.resumen()) cada resumen_cada pasos y al
+    terminar. Devuelve un dict con las métricas de rendimiento y de la corrida.
+    """
+    serpiente_pasos = 0
+    pico_poblacion = sim.num_serpientes()
+    paso_extincion = None
+    pasos_hechos = 0
+    inicio = time.perf_counter()
+    while pasos_hechos < pasos:
+        sim.step()
+        pasos_hechos += 1
+        n = sim.num_serpientes()
+        serpiente_pasos += n
+        if n > pico_poblacion:
+            pico_poblacion = n
+        if resumen_cada and al_resumir and pasos_hechos % resumen_cada == 0:
+            al_resumir(sim.resumen())
+        if n == 0:
+            paso_extincion = sim.paso_actual
+            break
+    segundos = time.perf_counter() - inicio
+    resumen_final = sim.resumen()
+    if resumen_cada and al_resumir and pasos_hechos % resumen_cada != 0:
+        al_resumir(resumen_final)
+    return {
+        'pasos': pasos_hechos,
+        'segundos': segundos,
+        'pasos_por_segundo': pasos_hechos / segundos if segundos > 0 else float('inf'),
+        'serpiente_pasos_por_segundo': serpiente_pasos / segundos if segundos > 0 else float('inf'),
+        'pico_poblacion': pico_poblacion,
+        'paso_extincion': paso_extincion,
+        'memoria_pico_kb': memoria_pico_kb(),
+        'final': resumen_final,
+    }
+
+
+def _fila_csv(resumen):
+    fila = {k: v for k, v in resumen.items() if k != 'genes_medios'}
+    genes = resumen['genes_medios']
+    for g in range(NUM_GENES_CSV):
+        fila[f'gen{g}'] = genes[g] if g < len(genes) else ''
+    return fila
+
+
+def _imprimir_metricas(resumen):
+    print(f"{'fase':<20} {'media ms':>10} {'p50 ms':>10} {'p99 ms':>10} {'fracción':>9}", file=sys.stderr)
+    for nombre, fase in resumen['fases'].items():
+        print(f"{nombre:<20} {fase['media_ms']:10.3f} {fase['p50_ms']:10.3f} {fase['p99_ms']:10.3f} {fase['fraccion']:9.1%}", file=sys.stderr)
+    for nombre, contador in resumen['contadores'].items():
+        print(f"{nombre:<20} media {contador['media']:.1f}, total {contador['total']}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pasos', type=int, default=1000, help='Pasos máximos (se para antes si se extinguen)')
+    parser.add_argument('--motor', choices=['python', 'numpy', 'franjas'], default='python')
+    parser.add_argument('--franjas', type=int, help='Franjas (procesos) del motor franjas (por defecto, una por núcleo)')
+    parser.add_argument('--width', type=int, default=30)
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--serpientes', type=int, default=5, help='Serpientes iniciales')
+    parser.add_argument('--comida', type=int, default=10, help='Comida inicial')
+    parser.add_argument('--mutation-rate', type=float, default=0.1)
+    parser.add_argument('--reproduction-energy-cost', type=int, default=25)
+    parser.add_argument('--max-age', type=int, default=10000)
+    parser.add_argument('--food-energy', type=int, default=50)
+    parser.add_argument('--snake-initial-energy', type=int, default=1000)
+    parser.add_argument('--semilla', type=int, help='Semilla (por defecto, una al azar que se informa al terminar)')
+    parser.add_argument('--guardar-replay', help='Guardar el registro de replay (semilla, configuración, comandos) en este JSON')
+    parser.add_argument('--resumen-cada', type=int, default=0, help='Escribir una fila de resumen cada K pasos')
+    parser.add_argument('--csv', help='Fichero CSV para las filas de resumen (por defecto, la salida estándar)')
+    parser.add_argument('--metricas', action='store_true', help='Medir los tiempos por fase de step() e imprimirlos al final')
+    parser.add_argument('--traza', help='Exportar como traza de Chrome los primeros --traza-pasos pasos a este fichero')
+    parser.add_argument('--traza-pasos', type=int, default=100)
+    parser.add_argument('--trayectoria', help='Grabar cada paso en <RUTA>.tray / <RUTA>.idx (solo motor python)')
+    parser.add_argument('--keyframe-cada', type=int, default=1000, help='Pasos entre keyframes de la trayectoria')
+    parser.add_argument('--log', default='WARNING', help='Nivel de logging')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log.upper(), format='%(asctime)s - %(levelname)s - %(message)s')
+    extra = {}
+    if args.motor == 'franjas':
+        if args.metricas or args.traza or args.trayectoria or args.guardar_replay:
+            parser.error("--metricas, --traza, --trayectoria y --guardar-replay no están disponibles con el motor franjas")
+        extra = {'num_franjas': args.franjas, 'nivel_log': args.log.upper()}
+
+    sim = crear_simulacion(args.motor, args.width, args.height, args.serpientes, args.comida, **extra,
+                           mutation_rate=args.mutation_rate,
+                           reproduction_energy_cost=args.reproduction_energy_cost,
+                           max_age=args.max_age, food_energy=args.food_energy,
+                           snake_initial_energy=args.snake_initial_energy, seed=args.semilla)
+    if args.metricas or args.traza:
+        sim.metricas.activo = True
+    if args.traza:
+        sim.metricas.capturar_traza(args.traza_pasos)
+    grabador = None
+    if args.trayectoria:
+        if args.motor != 'python':
+            parser.error("--trayectoria solo está disponible con el motor python")
+        from trayectoria import GrabadorTrayectoria
+        grabador = GrabadorTrayectoria(sim, args.trayectoria, args.keyframe_cada)
+
+    fichero = None
+    escritor = None
+    al_resumir = None
+    if args.resumen_cada:
+        fichero = open(args.csv, 'w', newline='') if args.csv else sys.stdout
+        columnas = list(_fila_csv(sim.resumen()).keys())
+        escritor = csv.DictWriter(fichero, fieldnames=columnas)
+        escritor.writeheader()
+        al_resumir = lambda resumen: escritor.writerow(_fila_csv(resumen))
+
+    try:
+        resultado = ejecutar(sim, args.pasos, args.resumen_cada, al_resumir)
+    finally:
+        if fichero is not None and fichero is not sys.stdout:
+            fichero.close()
+        if grabador is not None:
+            grabador.cerrar()
+        if args.motor == 'franjas':
+            sim.cerrar()
+
+    if args.traza:
+        sim.metricas.exportar_traza(args.traza)
+    if args.guardar_replay:
+        replay.guardar(sim.registro_replay(), args.guardar_replay)
+    if args.metricas:
+        _imprimir_metricas(sim.metricas.resumen())
+
+    memoria = resultado['memoria_pico_kb']
+    print(f"Semilla: {sim.seed}", file=sys.stderr)
+    print(f"Pasos: {resultado['pasos']} en {resultado['segundos']:.2f} s", file=sys.stderr)
+    print(f"Pasos/s: {resultado['pasos_por_segundo']:.1f}", file=sys.stderr)
+    print(f"Serpiente-pasos/s: {resultado['serpiente_pasos_por_segundo']:.0f}", file=sys.stderr)
+    print(f"Población pico: {resultado['pico_poblacion']}", file=sys.stderr)
+    if resultado['paso_extincion'] is not None:
+        print(f"Extinción en el paso {resultado['paso_extincion']}", file=sys.stderr)
+    print(f"Memoria pico: {f'{memoria / 1024:.1f} MB' if memoria is not None else 'no disponible'}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Instantáneas inmutables del estado para servir lecturas sin el lock de la simulación.
+
+Tras cada lote de pasos, el hilo de simulación copia con el lock tomado lo que sirven las
+rutas de lectura (get_state, la serie de estadísticas, el resumen de especies y el registro
+de replay). Ya sin el lock lo serializa a JSON una sola vez y publica la Instantanea
+cambiando una referencia, que en CPython es una asignación atómica. Las peticiones leen la
+referencia actual y responden con bytes ya hechos, así que nunca esperan a step() ni
+step() a ellas. Cada lector ve una instantánea completa: o la anterior o la nueva.
+También publican las rutas que cambian el estado (reinicio, especies...); cada captura
+lleva un número de secuencia y una captura vieja nunca sustituye a otra más reciente.
+
+    partes = publicador.capturar(simulacion) # Con el lock
+    publicador.publicar(partes) # Sin el lock
+    publicador.actual().estado_json # Desde cualquier hilo
+"""
+import json
+import threading
+import time
+from collections import deque
+
+from estadisticas import serie_en_columnas
+
+
+class Instantanea:
+    """Estado publicado de un paso. No admite cambios tras crearse; sus listas y dicts
+    no los toca nadie más (son copias hechas al capturar)."""
+    __slots__ = ('tick', 'paso', 'creada', 'estado_json', 'estadisticas', 'serie', 'especies', 'replay')
+
+    def __init__(self, tick, paso, estado_json, estadisticas, serie, especies, replay):
+        for nombre, valor in (('tick', tick), ('paso', paso), ('creada', time.monotonic()),
+                              ('estado_json', estado_json), ('estadisticas', estadisticas), ('serie', serie),
+                              ('especies', especies), ('replay', replay)):
+            object.__setattr__(self, nombre, valor)
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError("Instantanea es inmutable")
+
+    def edad_ms(self):
+        return (time.monotonic() - self.creada) * 1000
+
+    def serie_dict(self, desde=None, cada=1):
+        return serie_en_columnas(self.serie, desde, cada)
+
+
+class PublicadorInstantaneas:
+    def __init__(self, ventana=100):
+        self._actual = None
+        self._secuencia = 0 # Última captura (se incrementa con el lock de la simulación)
+        self._publicada = 0 # Secuencia de la instantánea actual
+        self._mutex = threading.Lock() # Solo para comparar y cambiar la referencia
+        self.publicadas = 0
+        self._captura_ms = deque(maxlen=ventana) # Con el lock tomado
+        self._serializacion_ms = deque(maxlen=ventana) # Ya sin el lock
+
+    def capturar(self, simulacion):
+        """Copia lo que se va a publicar (llamar con el lock de la simulación tomado)."""
+        inicio = time.perf_counter()
+        self._secuencia += 1
+        estado = simulacion.get_state()
+        partes = (self._secuencia, estado, tuple(simulacion.estadisticas.serie), simulacion.especies.resumen(),
+                  simulacion.registro_replay())
+        self._captura_ms.append((time.perf_counter() - inicio) * 1000)
+        return partes
+
+    def publicar(self, partes):
+        """Serializa lo capturado (sin el lock) y lo publica si no hay ya una captura
+        posterior publicada. Devuelve la instantánea actual."""
+        inicio = time.perf_counter()
+        secuencia, estado, serie, especies, replay = partes
+        instantanea = Instantanea(estado['tick'], estado['paso'], json.dumps(estado, separators=(',', ':')).encode(),
+                                  estado['stats'], serie, especies, replay)
+        with self._mutex:
+            if secuencia > self._publicada:
+                self._actual = instantanea # Cambio de referencia: los lectores ven la anterior o esta
+                self._publicada = secuencia
+                self.publicadas += 1
+            self._serializacion_ms.append((time.perf_counter() - inicio) * 1000)
+            return self._actual
+
+    def actual(self):
+        return self._actual
+
+    def resumen(self):
+        instantanea = self._actual
+        captura, serializacion = list(self._captura_ms), list(self._serializacion_ms)
+        return {
+            'publicadas': self.publicadas,
+            'tick': instantanea.tick if instantanea else None,
+            'edad_ms': instantanea.edad_ms() if instantanea else None,
+            'captura_media_ms': sum(captura) / len(captura) if captura else 0.0,
+            'serializacion_media_ms': sum(serializacion) / len(serializacion) if serializacion else 0.0,
+        }
@@ -0,0 +1,159 @@
+"""Modelo de islas: K mundos independientes en procesos distintos con migración.
+
+Cada isla es un SimulationManager (o SimulationManagerNumpy) en su propio proceso,
+así que las K avanzan en paralelo sin el límite del GIL. Cada `--cada` pasos, cada
+isla envía copias de sus `--migrantes` mejores serpientes (por comida_comida,
+hijos_generados o energia) a otras islas, en anillo (a la siguiente) o completa (a
+todas las demás por turnos). Por las tuberías solo viajan registros compactos
+(genes, energía, color) y un resumen por isla.
+
+Uso:
+    python islas.py --islas 8 --pasos 10000 --cada 500 --migrantes 3 --topologia anillo
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+from headless import crear_simulacion
+from simulation import CRITERIOS_MIGRACION
+
+TOPOLOGIAS = ('anillo', 'completa')
+
+
+def _proceso_isla(conexion, motor, mundo, parametros, semilla, nivel_log):
+    """Bucle de una isla. Cada mensaje es una época: (inmigrantes, pasos, num_emigrantes,
+    criterio); responde (resumen, emigrantes, serpiente_pasos). None la termina."""
+    logging.basicConfig(level=nivel_log, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger().setLevel(nivel_log)
+    sim = crear_simulacion(motor, *mundo, seed=semilla, **parametros)
+    while True:
+        mensaje = conexion.recv()
+        if mensaje is None:
+            break
+        inmigrantes, pasos, num_emigrantes, criterio = mensaje
+        sim.insertar_migrantes(inmigrantes)
+        serpiente_pasos = 0
+        for _ in range(pasos):
+            sim.step()
+            serpiente_pasos += sim.num_serpientes()
+        emigrantes = sim.extraer_migrantes(num_emigrantes, criterio) if num_emigrantes else []
+        conexion.send((sim.resumen(), emigrantes, serpiente_pasos))
+    conexion.close()
+
+
+def repartir_migrantes(emigrantes_por_isla, topologia):
+    """Lista de inmigrantes de cada isla a partir de los emigrantes de cada una."""
+    k = len(emigrantes_por_isla)
+    destino = [[] for _ in range(k)]
+    if k < 2:
+        return destino
+    for origen, emigrantes in enumerate(emigrantes_por_isla):
+        if topologia == 'anillo':
+            destino[(origen + 1) % k].extend(emigrantes)
+        else:
+            otras = [i for i in range(k) if i != origen]
+            for j, migrante in enumerate(emigrantes):
+                destino[otras[j % len(otras)]].append(migrante)
+    return destino
+
+
+class Archipielago:
+    """Coordina las islas: lanza los procesos, avanza épocas y reparte los migrantes."""
+    def __init__(self, num_islas, motor='python', mundo=(30, 20, 5, 10), parametros=None, semilla_base=0,
+                 topologia='anillo', migrantes=2, criterio='comida_comida', nivel_log=logging.ERROR):
+        if topologia not in TOPOLOGIAS:
+            raise ValueError(f"Topología desconocida: {topologia}")
+        if criterio not in CRITERIOS_MIGRACION:
+            raise ValueError(f"Criterio de migración desconocido: {criterio}")
+        self.topologia = topologia
+        self.migrantes = migrantes
+        self.criterio = criterio
+        self.paso = 0
+        self._pendientes = [[] for _ in range(num_islas)] # Inmigrantes para la próxima época
+        self._conexiones = []
+        self._procesos = []
+        for i in range(num_islas):
+            propia, ajena = multiprocessing.Pipe()
+            proceso = multiprocessing.Process(target=_proceso_isla, daemon=True,
+                                              args=(ajena, motor, mundo, parametros or {}, semilla_base + i, nivel_log))
+            proceso.start()
+            ajena.close()
+            self._conexiones.append(propia)
+            self._procesos.append(proceso)
+
+    def epoca(self, pasos):
+        """Avanza todas las islas `pasos` pasos en paralelo y prepara la migración siguiente.
+        Devuelve (resúmenes por isla, serpiente-pasos totales)."""
+        for conexion, inmigrantes in zip(self._conexiones, self._pendientes):
+            conexion.send((inmigrantes, pasos, self.migrantes, self.criterio))
+        respuestas = [conexion.recv() for conexion in self._conexiones]
+        self.paso += pasos
+        self._pendientes = repartir_migrantes([r[1] for r in respuestas], self.topologia)
+        return [r[0] for r in respuestas], sum(r[2] for r in respuestas)
+
+    def cerrar(self):
+        for conexion in self._conexiones:
+            try:
+                conexion.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for proceso in self._procesos:
+            proceso.join(timeout=5)
+        for conexion in self._conexiones:
+            conexion.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--islas', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--pasos', type=int, default=5000, help='Pasos totales de cada isla')
+    parser.add_argument('--cada', type=int, default=500, help='Pasos entre migraciones')
+    parser.add_argument('--migrantes', type=int, default=2, help='Serpientes que emigran de cada isla en cada migración')
+    parser.add_argument('--criterio', choices=CRITERIOS_MIGRACION, default='comida_comida')
+    parser.add_argument('--topologia', choices=TOPOLOGIAS, default='anillo')
+    parser.add_argument('--motor', choices=['python', 'numpy'], default='python')
+    parser.add_argument('--width', type=int, default=30)
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--serpientes', type=int, default=5)
+    parser.add_argument('--comida', type=int, default=10)
+    parser.add_argument('--mutation-rate', type=float, default=0.1)
+    parser.add_argument('--semilla-base', type=int, default=0)
+    parser.add_argument('--salida', help='Escribir el resumen de cada época como una línea JSON en este fichero')
+    parser.add_argument('--log', default='ERROR', help='Nivel de logging de las islas')
+    args = parser.parse_args()
+
+    mundo = (args.width, args.height, args.serpientes, args.comida)
+    fichero = open(args.salida, 'w') if args.salida else None
+    total_serpiente_pasos = 0
+    inicio = time.perf_counter()
+    try:
+        with Archipielago(args.islas, args.motor, mundo, {'mutation_rate': args.mutation_rate}, args.semilla_base,
+                          args.topologia, args.migrantes, args.criterio, args.log.upper()) as archipielago:
+            while archipielago.paso < args.pasos:
+                resumenes, serpiente_pasos = archipielago.epoca(min(args.cada, args.pasos - archipielago.paso))
+                total_serpiente_pasos += serpiente_pasos
+                poblaciones = [r['serpientes'] for r in resumenes]
+                print(f"Paso {archipielago.paso}: poblaciones {poblaciones}", file=sys.stderr)
+                if fichero:
+                    fichero.write(json.dumps({'paso': archipielago.paso, 'islas': resumenes}) + '\n')
+                    fichero.flush()
+    finally:
+        if fichero:
+            fichero.close()
+    segundos = time.perf_counter() - inicio
+    print(f"{args.islas} islas x {args.pasos} pasos en {segundos:.1f} s: "
+          f"{total_serpiente_pasos / segundos:.0f} serpiente-pasos/s en total", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""Métricas de rendimiento por fase de SimulationManager.step.
+
+Cada paso, la simulación mide (con time.perf_counter_ns) cuánto dura cada una de
+sus fases y cuenta algunas operaciones, y lo entrega de una vez a MetricasPaso.
+Este guarda una ventana deslizante de los últimos `ventana` pasos por fase, de la
+que saca percentiles e histograma, y puede capturar una ventana de pasos para
+exportarla como traza de Chrome (chrome://tracing o https://ui.perfetto.dev).
+
+Con `activo = False` la simulación no mide nada: solo paga la comprobación del flag.
+
+LockMedido es un threading.Lock que además mide cuánto espera cada rol (el hilo de
+simulación, las peticiones) para tomarlo.
+"""
+import json
+import threading
+import time
+from array import array
+from collections import deque
+
+# Límites (en µs) de las cubetas del histograma: 1, 2, 4, ... ~33 s
+LIMITES_HISTOGRAMA_US = [2 ** k for k in range(26)]
+
+
+def _percentil(ordenados, q):
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))]
+
+
+class MetricasPaso:
+    """Tiempos por fase y contadores de los últimos `ventana` pasos.
+
+    `fases` y `contadores` son las listas de nombres, en el mismo orden en que el
+    motor pasa los valores a registrar(). Las fases de `acumuladas` no son tramos
+    continuos sino la suma de muchos trozos (p. ej. lo que cada serpiente gasta en
+    decidir), y en la traza se dibujan seguidas y marcadas como tales.
+    """
+    def __init__(self, fases, contadores, acumuladas=(), ventana=1000, activo=False):
+        self.activo = activo
+        self.fases = tuple(fases)
+        self.contadores = tuple(contadores)
+        self.acumuladas = frozenset(acumuladas)
+        self.ventana = ventana
+        self._traza = []
+        self._traza_pendiente = 0
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Borra lo acumulado (no cambia `activo` ni la traza en curso)."""
+        self.pasos = 0 # Pasos registrados desde el inicio
+        self._total = array('d', [0.0] * self.ventana) # ms del paso completo
+        self._tiempos = [array('d', [0.0] * self.ventana) for _ in self.fases] # ms por fase
+        self._cuentas = [array('q', [0] * self.ventana) for _ in self.contadores]
+        self._suma_fases = [0.0] * len(self.fases)
+        self._suma_contadores = [0] * len(self.contadores)
+
+    def registrar(self, paso, inicio_ns, fin_ns, duraciones_ns, contadores):
+        """Guarda las medidas de un paso (duraciones en ns, en el orden de self.fases)."""
+        i = self.pasos % self.ventana
+        self._total[i] = (fin_ns - inicio_ns) / 1e6
+        for f, d in enumerate(duraciones_ns):
+            ms = d / 1e6
+            self._tiempos[f][i] = ms
+            self._suma_fases[f] += ms
+        for c, valor in enumerate(contadores):
+            self._cuentas[c][i] = valor
+            self._suma_contadores[c] += valor
+        self.pasos += 1
+        if self._traza_pendiente:
+            self._traza.append((paso, inicio_ns, fin_ns, tuple(duraciones_ns), tuple(contadores)))
+            self._traza_pendiente -= 1
+
+    def _en_ventana(self, valores):
+        n = min(self.pasos, self.ventana)
+        return list(valores[:n])
+
+    def _estadisticas(self, valores_ms):
+        ordenados = sorted(valores_ms)
+        n = len(ordenados)
+        cuentas = [0] * len(LIMITES_HISTOGRAMA_US)
+        for ms in ordenados:
+            us = ms * 1000
+            cubeta = 0
+            while cubeta < len(LIMITES_HISTOGRAMA_US) - 1 and us >= LIMITES_HISTOGRAMA_US[cubeta]:
+                cubeta += 1
+            cuentas[cubeta] += 1
+        return {
+            'media_ms': sum(ordenados) / n if n else 0.0,
+            'p50_ms': _percentil(ordenados, 0.50),
+            'p90_ms': _percentil(ordenados, 0.90),
+            'p99_ms': _percentil(ordenados, 0.99),
+            'max_ms': ordenados[-1] if n else 0.0,
+            'histograma': cuentas,
+        }
+
+    def resumen(self):
+        """Estadísticas de la ventana actual, listas para JSON."""
+        total = self._en_ventana(self._total)
+        suma_total = sum(total)
+        fases = {}
+        for f, nombre in enumerate(self.fases):
+            tiempos = self._en_ventana(self._tiempos[f])
+            datos = self._estadisticas(tiempos)
+            datos['fraccion'] = sum(tiempos) / suma_total if suma_total else 0.0
+            datos['total_ms'] = self._suma_fases[f]
+            fases[nombre] = datos
+        contadores = {}
+        for c, nombre in enumerate(self.contadores):
+            cuentas = self._en_ventana(self._cuentas[c])
+            contadores[nombre] = {
+                'ultimo': cuentas[(self.pasos - 1) % self.ventana] if cuentas else 0,
+                'media': sum(cuentas) / len(cuentas) if cuentas else 0.0,
+                'total': self._suma_contadores[c],
+            }
+        return {
+            'activo': self.activo,
+            'pasos': self.pasos,
+            'ventana': min(self.pasos, self.ventana),
+            'limites_histograma_us': LIMITES_HISTOGRAMA_US,
+            'paso': self._estadisticas(total),
+            'fases': fases,
+            'contadores': contadores,
+            'traza': self.estado_traza(),
+        }
+
+    # --- Traza de Chrome ---
+    def capturar_traza(self, pasos):
+        """Empieza a capturar los próximos `pasos` pasos (descarta la captura anterior)."""
+        self._traza = []
+        self._traza_pendiente = max(0, int(pasos))
+
+    def estado_traza(self):
+        return {'capturados': len(self._traza), 'pendientes': self._traza_pendiente}
+
+    def traza_chrome(self):
+        """Pasos capturados en formato Trace Event de Chrome (dict listo para json.dump)."""
+        eventos = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': 'simulacion'}},
+                   {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 1, 'args': {'name': 'step'}}]
+        if not self._traza:
+            return {'traceEvents': eventos, 'displayTimeUnit': 'ms'}
+        origen = self._traza[0][1]
+        for paso, inicio_ns, fin_ns, duraciones, contadores in self._traza:
+            ts = (inicio_ns - origen) / 1000
+            eventos.append({'name': f'paso {paso}', 'cat': 'paso', 'ph': 'X', 'pid': 1, 'tid': 1,
+                            'ts': ts, 'dur': (fin_ns - inicio_ns) / 1000, 'args': {'paso': paso}})
+            # Las fases se dibujan una tras otra dentro del paso
+            cursor = ts
+            for nombre, d in zip(self.fases, duraciones):
+                dur = d / 1000
+                eventos.append({'name': nombre, 'cat': 'fase', 'ph': 'X', 'pid': 1, 'tid': 1, 'ts': cursor, 'dur': dur,
+                                'args': {'acumulada': nombre in self.acumuladas}})
+                cursor += dur
+            eventos.append({'name': 'contadores', 'ph': 'C', 'pid': 1, 'ts': ts,
+                            'args': dict(zip(self.contadores, contadores))})
+        return {'traceEvents': eventos, 'displayTimeUnit': 'ms'}
+
+    def exportar_traza(self, ruta):
+        with open(ruta, 'w') as f:
+            json.dump(self.traza_chrome(), f)
+
+
+class LockMedido:
+    """threading.Lock que guarda el tiempo de espera de las últimas `ventana` tomas de
+    cada rol. `with lock:` cuenta como `rol_defecto`; `with lock.medir('simulacion'):`
+    como el rol indicado."""
+    def __init__(self, rol_defecto='peticiones', ventana=1000):
+        self._lock = threading.Lock()
+        self._mutex = threading.Lock() # Solo protege las medidas (se retiene microsegundos)
+        self.rol_defecto = rol_defecto
+        self.ventana = ventana
+        self._esperas = {} # rol -> deque de µs
+        self._totales = {} # rol -> [tomas, µs en total, máximo en µs]
+
+    def acquire(self, blocking=True, timeout=-1, rol=None):
+        inicio = time.perf_counter_ns()
+        tomado = self._lock.acquire(blocking, timeout)
+        if tomado:
+            self._anotar(rol or self.rol_defecto, (time.perf_counter_ns() - inicio) / 1000)
+        return tomado
+
+    def release(self):
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *excepcion):
+        self.release()
+
+    def medir(self, rol):
+        return _TomaMedida(self, rol)
+
+    def _anotar(self, rol, espera_us):
+        with self._mutex:
+            if rol not in self._esperas:
+                self._esperas[rol] = deque(maxlen=self.ventana)
+                self._totales[rol] = [0, 0.0, 0.0]
+            self._esperas[rol].append(espera_us)
+            totales = self._totales[rol]
+            totales[0] += 1
+            totales[1] += espera_us
+            totales[2] = max(totales[2], espera_us)
+
+    def resumen(self):
+        """Espera para tomar el lock por rol: percentiles de la ventana y totales."""
+        with self._mutex:
+            copia = {rol: (sorted(esperas), list(self._totales[rol])) for rol, esperas in self._esperas.items()}
+        resultado = {}
+        for rol, (ordenadas, (tomas, total_us, maximo_us)) in copia.items():
+            resultado[rol] = {
+                'tomas': tomas,
+                'media_us': total_us / tomas if tomas else 0.0,
+                'p50_us': _percentil(ordenadas, 0.50),
+                'p99_us': _percentil(ordenadas, 0.99),
+                'max_ventana_us': ordenadas[-1] if ordenadas else 0.0,
+                'max_us': maximo_us,
+                'total_ms': total_us / 1000,
+            }
+        return resultado
+
+
+class _TomaMedida:
+    def __init__(self, lock, rol):
+        self._lock = lock
+        self._rol = rol
+
+    def __enter__(self):
+        self._lock.acquire(rol=self._rol)
+        return self._lock
+
+    def __exit__(self, *excepcion):
+        self._lock.release()
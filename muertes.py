@@ -0,0 +1,217 @@
+"""Archivo columnar de las serpientes muertas.
+
+Al morir, cada serpiente deja un registro de su vida (id, tick de nacimiento y de
+muerte, causa, edad, energía, comida, hijos, longitud, color y genes) en columnas de
+solo añadir. Los registros se acumulan en bloques de array.array (sin NumPy ni objetos
+por serpiente); al llenarse, un bloque queda sellado y no se vuelve a tocar, o se
+añade a los ficheros <ruta>/<columna>.bin (little-endian) si se da una ruta. Las
+consultas trabajan sobre una instantánea: NumPy ve los bloques sellados sin copiarlos
+(o mapea los ficheros) y solo copia el bloque en curso.
+
+    instantanea = sim.archivo.instantanea() # Con el lock de la simulación
+    instantanea.vida_por_gen(0, cubetas=10) # Ya sin el lock
+"""
+import os
+import sys
+from array import array
+
+try:
+    import numpy as np
+except ImportError: # Solo lo necesitan las consultas
+    np = None
+
+from eventos import NOMBRES_CAUSA
+
+COLUMNAS = (('id', 'q'), ('nacimiento', 'q'), ('muerte', 'q'), ('edad', 'q'), ('energia', 'q'),
+            ('comida', 'I'), ('hijos', 'I'), ('longitud', 'I'), ('color', 'I'), ('causa', 'B'))
+_CODIGO_GENES = 'f' # float32: sobra precisión para agrupar y la mitad de memoria
+
+
+class ArchivoMuertes:
+    def __init__(self, num_genes, ruta=None, bloque=65536):
+        self.num_genes = num_genes # Los del motor (NUM_GENES); si un genoma trae otros, se rellenan con NaN o se recortan
+        self.ruta = ruta
+        self.bloque = bloque
+        self.activo = True
+        self._sellados = [] # Bloques en memoria que ya no cambian
+        self._en_disco = 0 # Registros escritos en los ficheros de ruta
+        self._relleno = [float('nan')] * num_genes
+        if ruta:
+            os.makedirs(ruta, exist_ok=True)
+            for nombre in self._nombres():
+                open(self._fichero(nombre), 'wb').close() # Cada archivo empieza vacío
+        self._nuevo_bloque()
+
+    def _nombres(self):
+        return [nombre for nombre, _ in COLUMNAS] + ['genes']
+
+    def _fichero(self, nombre):
+        return os.path.join(self.ruta, nombre + '.bin')
+
+    def _nuevo_bloque(self):
+        self._actual = {nombre: array(codigo) for nombre, codigo in COLUMNAS}
+        self._actual['genes'] = array(_CODIGO_GENES)
+
+    def __len__(self):
+        return self._en_disco + sum(len(b['id']) for b in self._sellados) + len(self._actual['id'])
+
+    def añadir(self, serpiente, causa, tick):
+        """Registra una serpiente de SimulationManager muerta en el paso que lleva a `tick`."""
+        a = self._actual
+        a['id'].append(serpiente.id)
+        a['nacimiento'].append(serpiente.nacimiento)
+        a['muerte'].append(tick)
+        a['edad'].append(serpiente.edad)
+        a['energia'].append(serpiente.energia)
+        a['comida'].append(serpiente.comida_comida)
+        a['hijos'].append(serpiente.hijos_generados)
+        a['longitud'].append(len(serpiente.cuerpo))
+        a['color'].append(serpiente.color_rgb)
+        a['causa'].append(causa)
+        genes = serpiente.genes.tolist()
+        if len(genes) != self.num_genes:
+            genes = (genes + self._relleno)[:self.num_genes]
+        a['genes'].fromlist(genes)
+        if len(a['id']) >= self.bloque:
+            self._sellar()
+
+    def añadir_lote(self, columnas, genes):
+        """Registra varias muertes a la vez: `columnas` da una secuencia por cada nombre de
+        COLUMNAS y `genes` una matriz (n, num_genes) (lo usa el motor NumPy)."""
+        a = self._actual
+        for nombre, _ in COLUMNAS:
+            a[nombre].extend(columnas[nombre])
+        for fila in genes:
+            fila = list(fila)
+            if len(fila) != self.num_genes:
+                fila = (fila + self._relleno)[:self.num_genes]
+            a['genes'].fromlist(fila)
+        if len(a['id']) >= self.bloque:
+            self._sellar()
+
+    def _sellar(self):
+        if not len(self._actual['id']):
+            return
+        if self.ruta:
+            for nombre, datos in self._actual.items():
+                if sys.byteorder == 'big':
+                    datos.byteswap()
+                with open(self._fichero(nombre), 'ab') as f:
+                    datos.tofile(f)
+            self._en_disco += len(self._actual['id'])
+        else:
+            self._sellados.append(self._actual)
+        self._nuevo_bloque()
+
+    def volcar(self):
+        """Con ruta, escribe también el bloque en curso (p. ej. al cerrar la aplicación)."""
+        if self.ruta:
+            self._sellar()
+
+    def instantanea(self):
+        """Vista de los registros actuales para consultar sin bloquear la simulación.
+        Debe llamarse con la simulación parada (su lock tomado); es barata."""
+        if np is None:
+            raise ImportError("Las consultas del archivo de muertes necesitan NumPy")
+        partes = []
+        if self._en_disco:
+            parte = {nombre: np.memmap(self._fichero(nombre), dtype='<' + codigo, mode='r', shape=(self._en_disco,))
+                     for nombre, codigo in COLUMNAS}
+            parte['genes'] = np.memmap(self._fichero('genes'), dtype='<' + _CODIGO_GENES, mode='r',
+                                       shape=(self._en_disco, self.num_genes))
+            partes.append(parte)
+        for bloque in self._sellados:
+            partes.append(self._a_numpy(bloque, copiar=False))
+        partes.append(self._a_numpy(self._actual, copiar=True))
+        return ConsultaMuertes(partes, self.num_genes)
+
+    def _a_numpy(self, bloque, copiar):
+        parte = {}
+        for nombre, codigo in COLUMNAS + (('genes', _CODIGO_GENES),):
+            datos = np.frombuffer(bloque[nombre], dtype=codigo) if len(bloque[nombre]) else np.zeros(0, dtype=codigo)
+            parte[nombre] = datos.copy() if copiar else datos
+        parte['genes'] = parte['genes'].reshape(-1, self.num_genes)
+        return parte
+
+
+class ConsultaMuertes:
+    """Consultas vectorizadas sobre una instantánea del archivo."""
+    def __init__(self, partes, num_genes):
+        self._partes = partes
+        self.num_genes = num_genes
+
+    def __len__(self):
+        return sum(len(p['id']) for p in self._partes)
+
+    def columna(self, nombre):
+        """Columna completa como array de NumPy ('vida' es muerte - nacimiento)."""
+        if nombre == 'vida':
+            return self.columna('muerte') - self.columna('nacimiento')
+        return np.concatenate([p[nombre] for p in self._partes])
+
+    def gen(self, indice):
+        return np.concatenate([p['genes'][:, indice] for p in self._partes])
+
+    def _filtro(self, causa=None, desde=None):
+        """Máscara de los registros de una causa (nombre) y/o muertos desde un tick."""
+        mascara = np.ones(len(self), dtype=bool)
+        if causa is not None:
+            codigos = {nombre: codigo for codigo, nombre in NOMBRES_CAUSA.items()}
+            if causa not in codigos:
+                raise ValueError(f"Causa desconocida: {causa}")
+            mascara &= self.columna('causa') == codigos[causa]
+        if desde is not None:
+            mascara &= self.columna('muerte') >= desde
+        return mascara
+
+    def resumen(self, desde=None):
+        """Muertes por causa con vida media y percentiles de vida del total."""
+        mascara = self._filtro(desde=desde)
+        vida = self.columna('vida')[mascara]
+        causas = self.columna('causa')[mascara]
+        por_causa = {}
+        for codigo, nombre in NOMBRES_CAUSA.items():
+            de_causa = vida[causas == codigo]
+            por_causa[nombre] = {'muertes': int(len(de_causa)),
+                                 'vida_media': float(de_causa.mean()) if len(de_causa) else None}
+        return {
+            'muertes': int(len(vida)),
+            'vida_media': float(vida.mean()) if len(vida) else None,
+            'vida_percentiles': dict(zip(('p50', 'p90', 'p99'), np.percentile(vida, [50, 90, 99]).tolist())) if len(vida) else None,
+            'comida_media': float(self.columna('comida')[mascara].mean()) if len(vida) else None,
+            'hijos_medios': float(self.columna('hijos')[mascara].mean()) if len(vida) else None,
+            'por_causa': por_causa,
+        }
+
+    def vida_por_gen(self, gen, cubetas=10, causa=None, desde=None, bins_vida=20):
+        """Distribución de la vida por cubetas del valor del gen `gen` (genes en [0, 1)):
+        muertes, vida media y percentiles por cubeta, y un histograma cubetas x bins_vida."""
+        if not 0 <= gen < self.num_genes:
+            raise ValueError(f"Gen fuera de rango: {gen}")
+        mascara = self._filtro(causa, desde)
+        valores = self.gen(gen)[mascara]
+        vida = self.columna('vida')[mascara]
+        validos = ~np.isnan(valores)
+        valores, vida = valores[validos], vida[validos]
+        cubeta = np.clip((valores * cubetas).astype(np.int64), 0, cubetas - 1)
+        cuenta = np.bincount(cubeta, minlength=cubetas)
+        suma = np.bincount(cubeta, weights=vida, minlength=cubetas)
+        bordes_vida = np.linspace(0, int(vida.max()) + 1 if len(vida) else 1, bins_vida + 1)
+        histograma, _, _ = np.histogram2d(cubeta, vida, bins=(np.arange(cubetas + 1), bordes_vida))
+        # Percentiles por cubeta: ordenar una vez por (cubeta, vida) y leer cada tramo
+        orden = np.lexsort((vida, cubeta))
+        vida_ordenada = vida[orden]
+        inicio = np.concatenate(([0], np.cumsum(cuenta)))
+        resultado = []
+        for k in range(cubetas):
+            tramo = vida_ordenada[inicio[k]:inicio[k + 1]]
+            resultado.append({
+                'desde': k / cubetas,
+                'hasta': (k + 1) / cubetas,
+                'muertes': int(cuenta[k]),
+                'vida_media': float(suma[k] / cuenta[k]) if cuenta[k] else None,
+                'p50': float(np.percentile(tramo, 50)) if len(tramo) else None,
+                'p90': float(np.percentile(tramo, 90)) if len(tramo) else None,
+            })
+        return {'gen': gen, 'causa': causa, 'muertes': int(len(vida)), 'cubetas': resultado,
+                'bordes_vida': bordes_vida.tolist(), 'histograma': histograma.astype(np.int64).tolist()}
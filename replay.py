@@ -0,0 +1,82 @@
+"""Replay por re-simulación.
+
+Cada simulación lleva su propio generador con semilla, así que la semilla, la
+configuración y los comandos externos (reinicios, migrantes insertados) bastan para regenerar cualquier
+paso: en vez de guardar volcados de estado, se guarda registro_replay() (unos
+cientos de bytes) y se vuelve a simular hasta el tick pedido.
+
+Uso:
+    python replay.py registro.json --tick 5000 [--estado estado.json]
+"""
+import argparse
+import json
+import logging
+import sys
+
+from simulation import VERSION_REPLAY
+
+
+def guardar(registro, ruta):
+    with open(ruta, 'w') as f:
+        json.dump(registro, f, separators=(',', ':'))
+
+
+def cargar(ruta):
+    with open(ruta) as f:
+        return json.load(f)
+
+
+def _aplicar(sim, nombre, *datos):
+    if nombre == 'reset':
+        sim.reset()
+    elif nombre == 'migrantes':
+        sim.insertar_migrantes(datos[0])
+    else:
+        raise ValueError(f"Comando de replay desconocido: {nombre}")
+
+
+def resimular(registro, tick=None):
+    """Crea la simulación del registro y la avanza hasta `tick` (por defecto, el último
+    del registro) aplicando los comandos externos en su tick. Un reset cuenta como un
+    tick más, igual que en la ejecución original. Devuelve la simulación."""
+    if registro.get('version') != VERSION_REPLAY:
+        raise ValueError(f"Versión de replay no soportada: {registro.get('version')}")
+    if tick is None:
+        tick = registro['tick']
+    config = registro['config']
+    if registro['motor'] == 'numpy':
+        from simulation_numpy import SimulationManagerNumpy as Motor
+    else:
+        from simulation import SimulationManager as Motor
+    sim = Motor(seed=registro['semilla'], **config)
+    comandos = sorted(registro['comandos'], key=lambda c: c[0]) # Orden estable: respeta el de registro
+    siguiente = 0
+    while True:
+        # Los comandos de un tick se aplicaron tras dar ese número de pasos
+        while siguiente < len(comandos) and comandos[siguiente][0] <= sim.tick:
+            if comandos[siguiente][1] == 'reset' and sim.tick >= tick:
+                return sim # El reinicio lleva al tick siguiente: el estado de `tick` es el de antes
+            _aplicar(sim, *comandos[siguiente][1:])
+            siguiente += 1
+        if sim.tick >= tick:
+            return sim
+        sim.step()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('registro', help='JSON con el registro de replay')
+    parser.add_argument('--tick', type=int, help='Tick a regenerar (por defecto, el último registrado)')
+    parser.add_argument('--estado', help='Guardar el estado (get_state) del tick en este JSON')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    sim = resimular(cargar(args.registro), args.tick)
+    print(json.dumps(sim.resumen()), file=sys.stderr)
+    if args.estado:
+        with open(args.estado, 'w') as f:
+            json.dump(sim.get_state(), f)
+
+
+if __name__ == '__main__':
+    main()
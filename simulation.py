@@ -1,26 +1,162 @@
 import random
 import copy # Necesario si pasas objetos complejos
+import heapq
 import logging
 import math # Para distancia
+import time
+from array import array
+
+from eventos import (RegistroEventos, EVENTO_MUERTE, EVENTO_NACIMIENTO, EVENTO_COMIDA, EVENTO_ATRAPADA,
+                     EVENTO_CHOQUE_PROPIO, CAUSA_PARED, CAUSA_ENERGIA, CAUSA_EDAD)
+from metricas import MetricasPaso
+from muertes import ArchivoMuertes
+from estadisticas import EstadisticasPoblacion
+from especies import EspeciesEnLinea
+
+COSTE_MOVIMIENTO = 5 # Energía que gasta cada movimiento
+
+# Rango de visión máximo (en casillas) que puede dar el gen de visión
+VISION_MAXIMA = 10
+
+# Genes de cada serpiente (el motor NumPy y las franjas usan el mismo número)
+NUM_GENES = 10
+
+# Versión del formato de registro_replay()
+VERSION_REPLAY = 1
+
+# Colores de las serpientes iniciales
+COLORES_INICIALES = [0x0000FF, 0x800080, 0xFFA500, 0xFFC0CB, 0x008000]
+
+# Atributos de Serpiente por los que se pueden elegir migrantes (modo islas)
+CRITERIOS_MIGRACION = ('comida_comida', 'hijos_generados', 'energia')
+
+# Fases y contadores que mide step() cuando las métricas están activas. Las cuatro
+# primeras ocurren dentro del bucle de serpientes y son la suma de todas ellas.
+FASES_PASO = ('decidir_mover', 'comer', 'cola', 'muertes_turno', 'reproduccion', 'eliminacion', 'hijos', 'reposicion_comida')
+FASES_POR_SERPIENTE = FASES_PASO[:4]
+CONTADORES_PASO = ('serpientes', 'busquedas_comida', 'comida_examinada', 'pares_comparados', 'nacimientos', 'comidas', 'muertes')
 
 # --- Clases Base (Añadir aquí tus clases Serpiente y Entorno) ---
+class Cuerpo:
+    """Segmentos de una serpiente, de la cabeza a la cola.
+
+    Los segmentos viven en un buffer circular sobre una lista (altas por la cabeza y
+    bajas por la cola en O(1), sin el bloque fijo de ~600 bytes de un deque), y un
+    multiconjunto (dict posición -> nº de segmentos) responde en O(1) si la cabeza
+    pisa el cuerpo. Se puede indexar, iterar y pasar a lista como el antiguo cuerpo.
+    """
+    __slots__ = ('_buffer', '_inicio', '_longitud', '_cuenta')
+
+    def __init__(self, segmentos=()):
+        self._buffer = list(segmentos) or [None]
+        self._inicio = 0
+        self._longitud = len(segmentos)
+        self._cuenta = {}
+        for pos in segmentos:
+            self._cuenta[pos] = self._cuenta.get(pos, 0) + 1
+
+    def empujar_cabeza(self, pos):
+        capacidad = len(self._buffer)
+        if self._longitud == capacidad:
+            # Lleno: desenrollar en una lista del doble de tamaño
+            self._buffer = list(self) + [None] * capacidad
+            self._inicio = 0
+            capacidad *= 2
+        self._inicio = (self._inicio - 1) % capacidad
+        self._buffer[self._inicio] = pos
+        self._longitud += 1
+        self._cuenta[pos] = self._cuenta.get(pos, 0) + 1
+
+    def quitar_cola(self):
+        """Quita y devuelve el último segmento."""
+        idx = (self._inicio + self._longitud - 1) % len(self._buffer)
+        pos = self._buffer[idx]
+        self._buffer[idx] = None
+        self._longitud -= 1
+        n = self._cuenta[pos] - 1
+        if n:
+            self._cuenta[pos] = n
+        else:
+            del self._cuenta[pos]
+        return pos
+
+    def cabeza_solapada(self):
+        """True si la cabeza coincide con algún otro segmento del cuerpo."""
+        return self._cuenta[self._buffer[self._inicio]] > 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._longitud
+        if not 0 <= i < self._longitud:
+            raise IndexError("índice de segmento fuera de rango")
+        return self._buffer[(self._inicio + i) % len(self._buffer)]
+
+    def __len__(self):
+        return self._longitud
+
+    def __iter__(self):
+        buffer, inicio, capacidad = self._buffer, self._inicio, len(self._buffer)
+        for i in range(self._longitud):
+            yield buffer[(inicio + i) % capacidad]
+
+    def __contains__(self, pos):
+        return pos in self._cuenta
+
+    def __repr__(self):
+        return f"Cuerpo({list(self)})"
+
+
+# Nombres de color CSS admitidos por Serpiente(color=...) (los básicos de HTML y los de COLORES_INICIALES)
+COLORES_CON_NOMBRE = {
+    'black': 0x000000, 'silver': 0xC0C0C0, 'gray': 0x808080, 'grey': 0x808080, 'white': 0xFFFFFF,
+    'maroon': 0x800000, 'red': 0xFF0000, 'purple': 0x800080, 'fuchsia': 0xFF00FF, 'magenta': 0xFF00FF,
+    'green': 0x008000, 'lime': 0x00FF00, 'olive': 0x808000, 'yellow': 0xFFFF00, 'navy': 0x000080,
+    'blue': 0x0000FF, 'teal': 0x008080, 'aqua': 0x00FFFF, 'cyan': 0x00FFFF, 'orange': 0xFFA500,
+    'pink': 0xFFC0CB, 'brown': 0xA52A2A,
+}
+
+
+def color_a_entero(color):
+    """Convierte '#rrggbb', '#rgb', un nombre de COLORES_CON_NOMBRE (p. ej. 'green') o un
+    entero ya empaquetado a 0xRRGGBB. Otros valores lanzan ValueError."""
+    if isinstance(color, int):
+        return color
+    texto = color.strip().lower()
+    if texto in COLORES_CON_NOMBRE:
+        return COLORES_CON_NOMBRE[texto]
+    digitos = texto[1:] if texto.startswith('#') else texto
+    if len(digitos) == 3:
+        digitos = ''.join(c * 2 for c in digitos)
+    if len(digitos) != 6 or digitos.strip('0123456789abcdef'):
+        raise ValueError(f"Color no válido: {color!r} (se admite '#rrggbb', '#rgb' o un nombre de "
+                         f"{', '.join(sorted(COLORES_CON_NOMBRE))})")
+    return int(digitos, 16)
+
+
 # Ejemplo de placeholder para la clase Serpiente
 class Serpiente:
-    def __init__(self, id, x, y, color="green", genes=None):
+    # Sin __dict__: con cientos de miles de serpientes vivas la memoria es el límite
+    __slots__ = ('id', 'cuerpo', 'color_rgb', 'energia', 'edad', 'comida_comida', 'hijos_generados', 'genes', 'nacimiento')
+
+    def __init__(self, id, x, y, color=0x008000, genes=None, rng=random, nacimiento=0):
         self.id = id
-        self.cuerpo = [(x, y)] # Lista de coordenadas [(x,y), ...]
-        self.color = color
+        self.nacimiento = nacimiento # Primer tick en el que existe (para el archivo de muertes)
+        self.cuerpo = Cuerpo([(x, y)]) # Coordenadas [(x,y), ...], cabeza primero
+        self.color_rgb = color_a_entero(color) # Color empaquetado 0xRRGGBB
         self.energia = 100 # Ejemplo
         self.edad = 0
         self.comida_comida = 0 # <-- NUEVO: Contador de comida
         self.hijos_generados = 0
-        # <<< Log de confirmación >>>
-        logging.debug(f"Serpiente {self.id} __init__: hijos_generados inicializado a {self.hijos_generados}")
-        # Genes: Placeholder como una lista de 10 números aleatorios si no se proporcionan
+        # Genes: 10 números aleatorios en un array('d') compacto si no se proporcionan
         if genes is None:
-            self.genes = [random.random() for _ in range(10)]
+            self.genes = array('d', [rng.random() for _ in range(NUM_GENES)])
         else:
-            self.genes = genes # Permitir heredar genes
+            self.genes = array('d', genes) # Permitir heredar genes
+
+    @property
+    def color(self):
+        """Color como '#rrggbb'; solo se formatea al serializar."""
+        return f'#{self.color_rgb:06x}'
 
     def mover(self, direccion, width, height):
         """Intenta mover la serpiente en la dirección dada.
@@ -37,14 +173,14 @@ class Serpiente:
 
         # Movimiento válido: Actualizar cuerpo
         nueva_cabeza = (nueva_cabeza_x, nueva_cabeza_y)
-        self.cuerpo.insert(0, nueva_cabeza)
+        self.cuerpo.empujar_cabeza(nueva_cabeza)
         # La lógica de acortar la cola se manejará en 'step' después de verificar si comió
 
-        self.energia -= 5 # <-- CAMBIO: Coste de energía por movimiento aumentado
+        self.energia -= COSTE_MOVIMIENTO # <-- CAMBIO: Coste de energía por movimiento aumentado
         self.edad += 1
         return True # Movimiento válido
 
-    def decidir_movimiento(self, simulation_manager, all_food, all_snakes):
+    def decidir_movimiento(self, simulation_manager):
         """Toma decisiones basadas en genes, energía y visión."""
         # 1. Obtener estado y parámetros genéticos
         cabeza = self.cuerpo[0]
@@ -52,11 +188,11 @@ class Serpiente:
         low_energy_threshold = self._get_low_energy_threshold()
         high_energy_threshold = self._get_high_energy_threshold()
 
-        # 2. Percibir el entorno
-        visible_food = self._get_visible_targets(cabeza, all_food, vision_range)
+        # 2. Percibir el entorno a través de los índices espaciales del gestor
+        # (solo se miran las cubetas cercanas, no toda la población)
+        visible_food = simulation_manager.comida.en_radio(cabeza, vision_range)
         # Excluirse a sí mismo de las serpientes visibles
-        other_snakes = [s for s in all_snakes if s.id != self.id]
-        visible_snakes = self._get_visible_targets(cabeza, other_snakes, vision_range, target_is_snake=True)
+        visible_snakes = [s for s in simulation_manager.indice_cabezas.en_radio(cabeza, vision_range) if s.id != self.id]
 
         # 3. Determinar el objetivo prioritario
         target_pos = None
@@ -65,21 +201,19 @@ class Serpiente:
         if self.energia < low_energy_threshold and visible_food:
             target_pos = self._find_closest_target(cabeza, visible_food)
             target_type = 'food'
-            logging.debug(f"Serpiente {self.id} (E:{self.energia:.0f}<{low_energy_threshold:.0f}): Busca comida -> {target_pos}")
         elif self.energia > high_energy_threshold and visible_snakes:
             # Buscar pareja potencial (con suficiente energía también?)
             potential_mates = [s for s in visible_snakes if s.energia >= simulation_manager.reproduction_energy_cost]
             if potential_mates:
                 target_pos = self._find_closest_target(cabeza, potential_mates, target_is_snake=True)
                 target_type = 'mate'
-                logging.debug(f"Serpiente {self.id} (E:{self.energia:.0f}>{high_energy_threshold:.0f}): Busca pareja -> {target_pos}")
 
         # 4. Elegir dirección hacia el objetivo o moverse aleatoriamente
         direcciones_posibles = [(0, -1), (0, 1), (-1, 0), (1, 0)]
         mejor_direccion = None
 
         if target_pos:
-            mejor_direccion = self._get_direction_towards(cabeza, target_pos)
+            mejor_direccion = self._get_direction_towards(cabeza, target_pos, simulation_manager.rng)
 
         # 5. Validar direcciones (evitar cuello y paredes)
         direcciones_validas_final = []
@@ -104,21 +238,21 @@ class Serpiente:
         # 6. Seleccionar la mejor dirección válida
         if not direcciones_validas_final:
             # Atrapado! Moverse a cualquier sitio (incluso cuello/pared, step lo manejará)
-            logging.warning(f"Serpiente {self.id} está atrapada! Eligiendo movimiento al azar (podría ser fatal).")
-            return random.choice(direcciones_posibles)
+            eventos = simulation_manager.eventos
+            if eventos.activo:
+                eventos.registrar(EVENTO_ATRAPADA, simulation_manager.paso_actual, self.id, cabeza[0], cabeza[1])
+            return simulation_manager.rng.choice(direcciones_posibles)
 
         # Si el objetivo calculado es válido, usarlo
         if mejor_direccion and mejor_direccion in direcciones_validas_final:
-            logging.debug(f"Serpiente {self.id} moviendo hacia {target_type if target_type else 'objetivo'}: {mejor_direccion}")
             return mejor_direccion
         else:
             # Si el objetivo no es válido (ej. bloqueado por cuello/pared) o no hay objetivo,
             # elegir una dirección válida al azar.
-            logging.debug(f"Serpiente {self.id} sin objetivo claro o dirección bloqueada. Moviendo al azar entre válidas.")
-            return random.choice(direcciones_validas_final)
+            return simulation_manager.rng.choice(direcciones_validas_final)
 
     # --- NUEVOS MÉTODOS AUXILIARES ---
-    def _get_vision_range(self, max_range=10):
+    def _get_vision_range(self, max_range=VISION_MAXIMA):
         # Escalar gen[0] (0.0-1.0) a un rango de casillas (ej. 1 a max_range)
         # Usamos una escala no lineal (ej. cuadrática) para que pequeños cambios
         # en el gen tengan más impacto en rangos bajos.
@@ -171,7 +305,7 @@ class Serpiente:
             return closest_target if not target_is_snake else closest_target.cuerpo[0]
         return None
 
-    def _get_direction_towards(self, start_pos, end_pos):
+    def _get_direction_towards(self, start_pos, end_pos, rng=random):
         dx = end_pos[0] - start_pos[0]
         dy = end_pos[1] - start_pos[1]
 
@@ -185,7 +319,7 @@ class Serpiente:
         else: # Empate (movimiento diagonal)
             # Elegir al azar entre moverse horizontal o verticalmente hacia el objetivo
             if dx != 0 and dy != 0:
-                return random.choice([(dx // abs(dx), 0), (0, dy // abs(dy))])
+                return rng.choice([(dx // abs(dx), 0), (0, dy // abs(dy))])
             elif dx != 0: # Solo movimiento horizontal posible
                 return (dx // abs(dx), 0)
             elif dy != 0: # Solo movimiento vertical posible
@@ -193,21 +327,399 @@ class Serpiente:
             else: # start_pos == end_pos
                 return (0,0) # O elegir una dirección aleatoria? (0,0) indica que ya está allí
 
-# Ejemplo de placeholder para la clase Entorno
+# Códigos de celda de la rejilla de ocupación
+CELDA_VACIA = 0
+CELDA_COMIDA = -1
+
 class Entorno:
-    def __init__(self, width, height):
+    """Rejilla de ocupación del tablero, guardada como lista plana de width*height celdas.
+
+    Cada celda vale CELDA_VACIA, CELDA_COMIDA o el número de segmentos de serpiente
+    que hay en ella (las serpientes pueden solaparse, así que se cuentan en vez de
+    guardar un único id). Todas las consultas y actualizaciones son O(1).
+
+    Además mantiene el conjunto de celdas vacías como array indexado con borrado por
+    intercambio (swap-remove) y un mapa celda -> hueco, de modo que elegir una celda
+    libre al azar también es O(1) sea cual sea el tamaño o lo lleno que esté el tablero.
+    """
+    def __init__(self, width, height, rng=random):
         self.width = width
         self.height = height
-        # Podría contener información sobre obstáculos, etc.
+        self.rng = rng # Generador para elegir celdas libres (el de la simulación)
+        total = width * height
+        self.celdas = [CELDA_VACIA] * total
+        self._libres = array('i', range(total)) # Índices planos de las celdas vacías
+        self._hueco = array('i', range(total)) # Posición de cada celda en _libres (-1 si no está libre)
+
+    def esta_libre(self, pos):
+        return self.celdas[pos[1] * self.width + pos[0]] == CELDA_VACIA
+
+    def hay_comida(self, pos):
+        return self.celdas[pos[1] * self.width + pos[0]] == CELDA_COMIDA
+
+    def ocupar(self, pos):
+        """Añade un segmento de serpiente en pos (la celda no debe tener comida)."""
+        idx = pos[1] * self.width + pos[0]
+        if self.celdas[idx] == CELDA_VACIA:
+            self._quitar_libre(idx)
+        self.celdas[idx] += 1
+
+    def liberar(self, pos):
+        """Quita un segmento de serpiente de pos."""
+        idx = pos[1] * self.width + pos[0]
+        self.celdas[idx] -= 1
+        if self.celdas[idx] == CELDA_VACIA:
+            self._añadir_libre(idx)
+
+    def poner_comida(self, pos):
+        idx = pos[1] * self.width + pos[0]
+        self._quitar_libre(idx)
+        self.celdas[idx] = CELDA_COMIDA
+
+    def quitar_comida(self, pos):
+        idx = pos[1] * self.width + pos[0]
+        self.celdas[idx] = CELDA_VACIA
+        self._añadir_libre(idx)
+
+    def num_libres(self):
+        return len(self._libres)
+
+    def celda_libre_aleatoria(self):
+        """Devuelve una posición vacía elegida uniformemente al azar, o None si no queda ninguna."""
+        if not self._libres:
+            return None
+        idx = self._libres[self.rng.randrange(len(self._libres))]
+        return (idx % self.width, idx // self.width)
+
+    def libres_en_orden(self):
+        """Celdas libres (índices planos) en el orden interno del muestreador."""
+        return self._libres
+
+    def restaurar_orden_libres(self, libres):
+        """Impone el orden del muestreador guardado en un checkpoint. Las celdas deben ser
+        exactamente las libres de la rejilla actual."""
+        if len(libres) != len(self._libres):
+            raise ValueError("Las celdas libres guardadas no coinciden con la rejilla")
+        self._libres = array('i', libres)
+        self._hueco = array('i', [-1]) * len(self.celdas)
+        for hueco, idx in enumerate(self._libres):
+            if self.celdas[idx] != CELDA_VACIA:
+                raise ValueError("Las celdas libres guardadas no coinciden con la rejilla")
+            self._hueco[idx] = hueco
+
+    def _añadir_libre(self, idx):
+        self._hueco[idx] = len(self._libres)
+        self._libres.append(idx)
+
+    def _quitar_libre(self, idx):
+        # Mover el último elemento al hueco que deja idx y recortar
+        hueco = self._hueco[idx]
+        ultimo = self._libres.pop()
+        if ultimo != idx:
+            self._libres[hueco] = ultimo
+            self._hueco[ultimo] = hueco
+        self._hueco[idx] = -1
+
+# Tableros de más celdas que esto usan EntornoDisperso (la rejilla densa ocupa unos 16 bytes por celda)
+LIMITE_DENSO = 1_000_000
+TAM_TESELA = 16 # Lado de las teselas de EntornoDisperso
+INTENTOS_MUESTREO = 32 # Intentos al azar antes de buscar celda libre tesela a tesela
+
+class EntornoDisperso:
+    """Rejilla de ocupación por teselas para tableros enormes y poco poblados.
+
+    Misma interfaz y códigos de celda que Entorno, pero el tablero se parte en teselas
+    de tam x tam celdas que solo existen mientras tienen algún segmento o comida: se
+    crean al ocupar su primera celda y se liberan al quedar vacías. La memoria depende
+    del contenido, no del área, y ninguna operación recorre el tablero.
+
+    Para elegir una celda libre se prueban celdas al azar (casi siempre acierta a la
+    primera en un tablero disperso). Si fallan INTENTOS_MUESTREO seguidos, se cuenta
+    tesela a tesela: las libres de las teselas existentes y, aparte, las de las que no
+    existen (libres por completo). El resultado es uniforme en los dos casos.
+    """
+    def __init__(self, width, height, rng=random, tam=TAM_TESELA):
+        self.width = width
+        self.height = height
+        self.rng = rng
+        self.tam = tam
+        self._teselas = {} # (tx, ty) -> array de tam*tam celdas
+        self._no_vacias = {} # (tx, ty) -> celdas no vacías de esa tesela
+        self._ocupadas = 0 # Celdas no vacías en todo el tablero
+
+    def esta_libre(self, pos):
+        x, y = pos
+        tam = self.tam
+        tesela = self._teselas.get((x // tam, y // tam))
+        return tesela is None or tesela[(y % tam) * tam + x % tam] == CELDA_VACIA
+
+    def hay_comida(self, pos):
+        x, y = pos
+        tam = self.tam
+        tesela = self._teselas.get((x // tam, y // tam))
+        return tesela is not None and tesela[(y % tam) * tam + x % tam] == CELDA_COMIDA
+
+    def _tesela(self, clave):
+        tesela = self._teselas.get(clave)
+        if tesela is None:
+            tesela = self._teselas[clave] = array('i', [CELDA_VACIA]) * (self.tam * self.tam)
+            self._no_vacias[clave] = 0
+        return tesela
+
+    def _marcar_vacia(self, clave):
+        self._ocupadas -= 1
+        restantes = self._no_vacias[clave] - 1
+        if restantes:
+            self._no_vacias[clave] = restantes
+        else: # Tesela vacía: se libera
+            del self._no_vacias[clave]
+            del self._teselas[clave]
+
+    def ocupar(self, pos):
+        x, y = pos
+        tam = self.tam
+        clave = (x // tam, y // tam)
+        tesela = self._tesela(clave)
+        i = (y % tam) * tam + x % tam
+        if tesela[i] == CELDA_VACIA:
+            self._no_vacias[clave] += 1
+            self._ocupadas += 1
+        tesela[i] += 1
+
+    def liberar(self, pos):
+        x, y = pos
+        tam = self.tam
+        clave = (x // tam, y // tam)
+        tesela = self._teselas[clave]
+        i = (y % tam) * tam + x % tam
+        tesela[i] -= 1
+        if tesela[i] == CELDA_VACIA:
+            self._marcar_vacia(clave)
+
+    def poner_comida(self, pos):
+        x, y = pos
+        tam = self.tam
+        clave = (x // tam, y // tam)
+        tesela = self._tesela(clave)
+        self._no_vacias[clave] += 1
+        self._ocupadas += 1
+        tesela[(y % tam) * tam + x % tam] = CELDA_COMIDA
+
+    def quitar_comida(self, pos):
+        x, y = pos
+        tam = self.tam
+        clave = (x // tam, y // tam)
+        self._teselas[clave][(y % tam) * tam + x % tam] = CELDA_VACIA
+        self._marcar_vacia(clave)
+
+    def num_libres(self):
+        return self.width * self.height - self._ocupadas
+
+    def num_teselas(self):
+        return len(self._teselas)
+
+    def celda_libre_aleatoria(self):
+        """Devuelve una posición vacía elegida uniformemente al azar, o None si no queda ninguna."""
+        libres = self.num_libres()
+        if libres <= 0:
+            return None
+        rng = self.rng
+        for _ in range(INTENTOS_MUESTREO):
+            pos = (rng.randrange(self.width), rng.randrange(self.height))
+            if self.esta_libre(pos):
+                return pos
+        return self._libre_por_teselas(libres)
+
+    def _area(self, clave):
+        tam = self.tam
+        return min(tam, self.width - clave[0] * tam) * min(tam, self.height - clave[1] * tam)
+
+    def _libre_por_teselas(self, libres):
+        # Orden fijo de teselas para que el resultado no dependa de cuándo se crearon
+        claves = sorted(self._no_vacias)
+        r = self.rng.randrange(libres)
+        for clave in claves:
+            en_tesela = self._area(clave) - self._no_vacias[clave]
+            if r < en_tesela:
+                tam = self.tam
+                tesela = self._teselas[clave]
+                x0, y0 = clave[0] * tam, clave[1] * tam
+                for y in range(y0, min(y0 + tam, self.height)):
+                    for x in range(x0, min(x0 + tam, self.width)):
+                        if tesela[(y - y0) * tam + x - x0] == CELDA_VACIA:
+                            if not r:
+                                return (x, y)
+                            r -= 1
+            r -= en_tesela
+        # La celda cae en una tesela que no existe: cualquiera de sus celdas vale igual
+        tam = self.tam
+        while True:
+            pos = (self.rng.randrange(self.width), self.rng.randrange(self.height))
+            if (pos[0] // tam, pos[1] // tam) not in self._teselas:
+                return pos
+
+    def libres_en_orden(self):
+        """El muestreador no guarda orden interno: no hay nada que llevar al checkpoint."""
+        return array('i')
+
+    def restaurar_orden_libres(self, libres):
+        if len(libres):
+            raise ValueError("El checkpoint es de un tablero denso")
+
+def crear_entorno(width, height, rng=random, disperso=None):
+    """Entorno denso o por teselas; con disperso=None, según el área del tablero."""
+    if disperso is None:
+        disperso = width * height > LIMITE_DENSO
+    return EntornoDisperso(width, height, rng) if disperso else Entorno(width, height, rng)
+
+class IndiceEspacial:
+    """Índice espacial por cubetas cuadradas de tam x tam casillas.
+
+    Guarda claves (posiciones de comida, serpientes...) junto a su posición y permite
+    pedir las que están a distancia Manhattan <= radio mirando solo las cubetas
+    cercanas. Con tam igual al rango de visión máximo, una consulta toca como mucho
+    3x3 cubetas. Las cubetas vacías se eliminan, así que la memoria depende solo
+    del número de claves.
+    """
+    def __init__(self, tam=VISION_MAXIMA):
+        self.tam = tam
+        self._cubetas = {} # (bx, by) -> {clave: posición}
+        self.consultas = 0 # Llamadas a en_radio (para las métricas)
+        self.examinadas = 0 # Claves comparadas en esas llamadas
+
+    def añadir(self, clave, pos):
+        cubeta_id = (pos[0] // self.tam, pos[1] // self.tam)
+        cubeta = self._cubetas.get(cubeta_id)
+        if cubeta is None:
+            cubeta = self._cubetas[cubeta_id] = {}
+        cubeta[clave] = pos
+
+    def quitar(self, clave, pos):
+        cubeta_id = (pos[0] // self.tam, pos[1] // self.tam)
+        cubeta = self._cubetas[cubeta_id]
+        del cubeta[clave]
+        if not cubeta:
+            del self._cubetas[cubeta_id]
+
+    def mover(self, clave, pos_anterior, pos_nueva):
+        if (pos_anterior[0] // self.tam, pos_anterior[1] // self.tam) != (pos_nueva[0] // self.tam, pos_nueva[1] // self.tam):
+            self.quitar(clave, pos_anterior)
+            self.añadir(clave, pos_nueva)
+        else:
+            self._cubetas[(pos_nueva[0] // self.tam, pos_nueva[1] // self.tam)][clave] = pos_nueva
+
+    def en_radio(self, pos, radio):
+        """Devuelve las claves a distancia Manhattan <= radio de pos."""
+        x, y = pos
+        tam = self.tam
+        encontradas = []
+        self.consultas += 1
+        for bx in range((x - radio) // tam, (x + radio) // tam + 1):
+            for by in range((y - radio) // tam, (y + radio) // tam + 1):
+                cubeta = self._cubetas.get((bx, by))
+                if cubeta:
+                    self.examinadas += len(cubeta)
+                    for clave, (cx, cy) in cubeta.items():
+                        if abs(cx - x) + abs(cy - y) <= radio:
+                            encontradas.append(clave)
+        return encontradas
+
+    def __iter__(self):
+        """Pares (clave, posición) en el orden interno (cubeta a cubeta); añadirlos en este
+        orden a un índice vacío lo deja idéntico, también en el orden de en_radio."""
+        for cubeta in self._cubetas.values():
+            yield from cubeta.items()
+
+
+class AlmacenComida:
+    """Conjunto de posiciones de comida con pertenencia, alta y baja en O(1).
+
+    Las posiciones viven en una lista compacta (para iterar y serializar) y un dict
+    posición -> hueco permite quitar cualquiera moviendo la última a su lugar.
+    Un IndiceEspacial acompaña a la lista para las consultas de visión.
+    """
+    def __init__(self):
+        self._posiciones = []
+        self._hueco = {}
+        self._indice = IndiceEspacial()
+
+    def añadir(self, pos):
+        self._hueco[pos] = len(self._posiciones)
+        self._posiciones.append(pos)
+        self._indice.añadir(pos, pos)
+
+    def quitar(self, pos):
+        self._indice.quitar(pos, pos)
+        hueco = self._hueco.pop(pos)
+        ultima = self._posiciones.pop()
+        if ultima != pos:
+            self._posiciones[hueco] = ultima
+            self._hueco[ultima] = hueco
+
+    def en_radio(self, pos, radio):
+        """Posiciones de comida a distancia Manhattan <= radio de pos."""
+        return self._indice.en_radio(pos, radio)
+
+    @property
+    def indice(self):
+        return self._indice
+
+    def como_lista(self):
+        """Copia de las posiciones como lista de pares, lista para JSON."""
+        return list(self._posiciones)
+
+    def cargar(self, posiciones, orden_indice=None):
+        """Rellena un almacén vacío con `posiciones` (en ese orden) y mete en el índice
+        espacial las de `orden_indice` (por defecto, las mismas) en ese otro orden."""
+        for pos in posiciones:
+            self._hueco[pos] = len(self._posiciones)
+            self._posiciones.append(pos)
+        for pos in (posiciones if orden_indice is None else orden_indice):
+            self._indice.añadir(pos, pos)
+
+    def __contains__(self, pos):
+        return pos in self._hueco
+
+    def __len__(self):
+        return len(self._posiciones)
+
+    def __iter__(self):
+        return iter(self._posiciones)
+
+def cruzar(s1, s2, mutation_rate, rng):
+    """Genes y color del hijo de s1 y s2 (objetos con genes y color_rgb)."""
+    # 1. Crossover de Genes
+    punto_cruce = len(s1.genes) // 2
+    genes_hijo = s1.genes[:punto_cruce] + s2.genes[punto_cruce:]
+
+    # 2. Mutación
+    for i in range(len(genes_hijo)):
+        if rng.random() < mutation_rate:
+            genes_hijo[i] = rng.random()
+
+    # 3. Color del hijo: media de los padres por canal con una ligera mutación
+    color_hijo = 0
+    for desplazamiento in (16, 8, 0):
+        canal = (((s1.color_rgb >> desplazamiento) & 0xFF) + ((s2.color_rgb >> desplazamiento) & 0xFF)) // 2
+        canal = max(0, min(255, canal + rng.randint(-10, 10)))
+        color_hijo |= canal << desplazamiento
+    return genes_hijo, color_hijo
 
 # --- Gestor de la Simulación ---
 class SimulationManager:
-    def __init__(self, width, height, initial_snakes=5, initial_food=10, mutation_rate=0.1, reproduction_energy_cost=25, max_age=10000, food_energy=50, snake_initial_energy=1000):
+    def __init__(self, width, height, initial_snakes=5, initial_food=10, mutation_rate=0.1, reproduction_energy_cost=25, max_age=10000, food_energy=50, snake_initial_energy=1000, seed=None, disperso=None):
         self.width = width
         self.height = height
-        self.entorno = Entorno(width, height)
+        # Generador propio: toda la aleatoriedad de la simulación sale de aquí, así que la
+        # misma semilla y configuración dan siempre la misma ejecución
+        self.seed = seed if seed is not None else random.getrandbits(63)
+        self.rng = random.Random(self.seed)
+        # Rejilla densa o por teselas (disperso=None: por teselas si el tablero pasa de LIMITE_DENSO celdas)
+        self.entorno = crear_entorno(width, height, self.rng, disperso)
+        self.disperso = isinstance(self.entorno, EntornoDisperso)
         self.serpientes = []
-        self.comida = []
+        self.comida = AlmacenComida()
+        self.indice_cabezas = IndiceEspacial() # Cabeza de cada serpiente, para la visión
         self.paso_actual = 0
         self._next_snake_id = 0
         self.mutation_rate = mutation_rate
@@ -215,31 +727,54 @@ class SimulationManager:
         self.max_age = max_age
         self.food_energy = food_energy
         self.snake_initial_energy = snake_initial_energy
+        self._initial_snakes = initial_snakes
+        self._initial_food = initial_food
+        self._config = {'width': width, 'height': height, 'initial_snakes': initial_snakes, 'initial_food': initial_food,
+                        'mutation_rate': mutation_rate, 'reproduction_energy_cost': reproduction_energy_cost,
+                        'max_age': max_age, 'food_energy': food_energy, 'snake_initial_energy': snake_initial_energy,
+                        'disperso': self.disperso}
+        self.tick = 0 # Pasos dados desde la creación, más uno por reset (no vuelve a 0, a diferencia de paso_actual)
+        self._comandos = [] # Comandos externos [tick, nombre] para el registro de replay
+        self.eventos = RegistroEventos() # Trazado de eventos, desactivado por defecto
+        self.metricas = MetricasPaso(FASES_PASO, CONTADORES_PASO, acumuladas=FASES_POR_SERPIENTE) # Desactivadas por defecto
+        self.archivo = ArchivoMuertes(NUM_GENES) # Registro de vida de cada serpiente muerta (ver muertes.py)
+        self.grabador = None # GrabadorTrayectoria enganchado (ver trayectoria.py)
+        self.estadisticas = EstadisticasPoblacion() # Agregados de la población, al día en cada paso
+        self.especies = EspeciesEnLinea() # Especies y diversidad genética, desactivadas por defecto
         self._inicializar_simulacion(initial_snakes, initial_food, self.snake_initial_energy)
 
     def _get_new_snake_id(self):
         self._next_snake_id += 1
         return self._next_snake_id
 
-    def _posicion_aleatoria(self):
-        return (random.randint(0, self.width - 1), random.randint(0, self.height - 1))
-
     def _inicializar_simulacion(self, num_serpientes, num_comida, initial_energy):
         self.serpientes = [] # Asegurar que la lista esté vacía al inicializar
-        self.comida = []
+        self.comida = AlmacenComida()
+        self.indice_cabezas = IndiceEspacial()
+        self.entorno = crear_entorno(self.width, self.height, self.rng, self.disperso) # Rejilla de ocupación vacía
+        self.estadisticas.reiniciar()
+        if self.especies.activo:
+            self.especies.olvidar_poblacion()
         self._next_snake_id = 0
         # Crear serpientes iniciales
         for i in range(num_serpientes):
-            x, y = self._posicion_aleatoria()
-            # Asegurar que las posiciones iniciales no se solapen (simple check)
-            while any( (x,y) in s.cuerpo for s in self.serpientes ):
-                 x, y = self._posicion_aleatoria()
+            # Posición libre al azar para que las posiciones iniciales no se solapen
+            pos = self.entorno.celda_libre_aleatoria()
+            if pos is None:
+                logging.warning("No queda espacio para más serpientes iniciales.")
+                break
+            x, y = pos
             # Color aleatorio y ID único
-            color = random.choice(['#0000FF', '#800080', '#FFA500', '#FFC0CB', '#008000'])
-            nueva_serpiente = Serpiente(self._get_new_snake_id(), x, y, color=color)
+            color = self.rng.choice(COLORES_INICIALES)
+            nueva_serpiente = Serpiente(self._get_new_snake_id(), x, y, color=color, rng=self.rng, nacimiento=self.tick)
             nueva_serpiente.energia = initial_energy
             self.serpientes.append(nueva_serpiente)
-            logging.info(f"Serpiente inicial {nueva_serpiente.id} creada en {(x,y)} con color {color} y energía {initial_energy}")
+            self.estadisticas.alta(nueva_serpiente)
+            if self.especies.activo:
+                self.especies.alta(nueva_serpiente.id, nueva_serpiente.genes)
+            self.entorno.ocupar((x, y))
+            self.indice_cabezas.añadir(nueva_serpiente, (x, y))
+            logging.debug("Serpiente inicial %s creada en %s con color %s y energía %s", nueva_serpiente.id, (x, y), nueva_serpiente.color, initial_energy)
 
         # Colocar comida inicial
         for _ in range(num_comida):
@@ -249,100 +784,73 @@ class SimulationManager:
 
     def _añadir_comida(self, cantidad=1):
         for _ in range(cantidad):
-             pos = self._posicion_aleatoria()
-             # Evitar poner comida donde ya hay comida o serpientes
-             intentos = 0
-             max_intentos = self.width * self.height # Evitar bucle infinito si todo está lleno
-             while (pos in self.comida or any(pos in s.cuerpo for s in self.serpientes)) and intentos < max_intentos:
-                 pos = self._posicion_aleatoria()
-                 intentos += 1
-             if intentos < max_intentos:
-                  self.comida.append(pos)
+             # Solo se elige entre celdas sin comida ni serpientes
+             pos = self.entorno.celda_libre_aleatoria()
+             if pos is not None:
+                  self.comida.añadir(pos)
+                  self.entorno.poner_comida(pos)
+                  if self.grabador is not None:
+                       self.grabador.comida_añadida(pos)
              else:
                   logging.warning("No se pudo encontrar espacio para añadir comida.")
 
     def reproducir(self, s1, s2):
         """Intenta reproducir dos serpientes, devolviendo la nueva serpiente o None."""
-        # <<< DEBUG LOGGING INICIAL >>>
-        logging.info(f"Intentando reproducir S{s1.id} (E:{s1.energia}) con S{s2.id} (E:{s2.energia})")
-        # <<< FIN DEBUG LOGGING >>>
-
         # Requisito de energía para reproducirse
-        # <<< DEBUG LOGGING PRE-CHECK >>>
-        logging.debug(f"Check Energía: S1={s1.energia}>={self.reproduction_energy_cost}? {s1.energia >= self.reproduction_energy_cost}. S2={s2.energia}>={self.reproduction_energy_cost}? {s2.energia >= self.reproduction_energy_cost}")
-        # <<< FIN DEBUG LOGGING >>>
         if s1.energia < self.reproduction_energy_cost or s2.energia < self.reproduction_energy_cost:
-            logging.debug(f"Reproducción fallida entre {s1.id} y {s2.id}: Energía insuficiente.")
             return None
 
         # Coste de energía
         s1.energia -= self.reproduction_energy_cost
         s2.energia -= self.reproduction_energy_cost
-        # <<< DEBUG LOGGING >>>
-        logging.debug(f"Energía post-reproducción - S1 ({s1.id}): {s1.energia}, S2 ({s2.id}): {s2.energia}")
-        # <<< FIN DEBUG LOGGING >>>
+        self.estadisticas.ajustar(energia=-2 * self.reproduction_energy_cost)
 
-        # 1. Crossover de Genes
-        punto_cruce = len(s1.genes) // 2
-        genes_hijo = s1.genes[:punto_cruce] + s2.genes[punto_cruce:]
+        # 1-3. Genes (cruce y mutación) y color del hijo
+        genes_hijo, color_hijo = cruzar(s1, s2, self.mutation_rate, self.rng)
 
-        # 2. Mutación
-        for i in range(len(genes_hijo)):
-            if random.random() < self.mutation_rate:
-                genes_hijo[i] = random.random()
+        # 4. Buscar Posición del hijo (aleatoria y vacía), O(1) con el muestreador de celdas libres
+        pos_hijo = self.entorno.celda_libre_aleatoria()
 
-        # 3. Color del hijo
-        try:
-             c1 = tuple(int(s1.color.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
-             c2 = tuple(int(s2.color.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
-             cr = (c1[0] + c2[0]) // 2
-             cg = (c1[1] + c2[1]) // 2
-             cb = (c1[2] + c2[2]) // 2
-             # Mutación ligera de color
-             cr = max(0, min(255, cr + random.randint(-10, 10)))
-             cg = max(0, min(255, cg + random.randint(-10, 10)))
-             cb = max(0, min(255, cb + random.randint(-10, 10)))
-             color_hijo = f'#{cr:02x}{cg:02x}{cb:02x}'
-        except ValueError: # Si los colores no son hex válidos
-             color_hijo = random.choice([s1.color, s2.color]) # Elegir uno al azar
-
-        # <<< 4. NUEVA LÓGICA: Buscar Posición del hijo (ALEATORIA y vacía) >>>
-        pos_hijo = None
-        empty_spots = []
-
-        # Crear conjuntos de todas las coordenadas y las ocupadas
-        all_coords = set((x, y) for x in range(self.width) for y in range(self.height))
-        occupied_food = set(self.comida)
-        occupied_snakes = set()
-        for s in self.serpientes:
-            for segment in s.cuerpo:
-                occupied_snakes.add(segment)
-
-        # Calcular coordenadas vacías
-        available_coords = all_coords - occupied_food - occupied_snakes
-
-        if not available_coords:
-             logging.warning(f"Reproducción entre {s1.id} y {s2.id}: No hay espacio vacío en el tablero para nacer. No nace hijo.")
+        if pos_hijo is None:
+             logging.warning("Reproducción entre %s y %s: No hay espacio vacío en el tablero para nacer. No nace hijo.", s1.id, s2.id)
              return None # Falló el nacimiento por falta de espacio
-        else:
-             pos_hijo = random.choice(list(available_coords))
-             logging.debug(f"Posición de nacimiento aleatoria elegida para hijo de {s1.id} y {s2.id}: {pos_hijo}")
 
         # Incrementar contador de hijos de los padres
         s1.hijos_generados += 1
         s2.hijos_generados += 1
         
         # 5. Crear la nueva serpiente
-        hijo = Serpiente(self._get_new_snake_id(), pos_hijo[0], pos_hijo[1], color=color_hijo, genes=genes_hijo)
+        hijo = Serpiente(self._get_new_snake_id(), pos_hijo[0], pos_hijo[1], color=color_hijo, genes=genes_hijo, rng=self.rng,
+                         nacimiento=self.tick + 1) # Aparece al terminar este paso
         hijo.energia = self.reproduction_energy_cost * 2
-        logging.info(f"¡Reproducción! Serpientes {s1.id} y {s2.id} crean hijo {hijo.id} en {pos_hijo}. Energía hijo: {hijo.energia}")
+        self.estadisticas.alta(hijo)
+        self.estadisticas.nacimientos += 1
+        if self.especies.activo:
+            self.especies.alta(hijo.id, hijo.genes)
+        self.entorno.ocupar(pos_hijo) # Reservar la celda aunque el hijo se añada al final del paso
+        self.indice_cabezas.añadir(hijo, pos_hijo)
+        if self.eventos.activo:
+            self.eventos.registrar(EVENTO_NACIMIENTO, self.paso_actual, hijo.id, pos_hijo[0], pos_hijo[1], s1.id, s2.id)
         return hijo
 
     def step(self):
         """Avanza un paso en la simulación."""
-        serpientes_a_eliminar = set() # Usar un set para evitar duplicados
+        serpientes_a_eliminar = {} # id -> causa de la muerte (CAUSA_*)
         nuevas_serpientes = []
         serpientes_procesadas_ids = set()
+        eventos = self.eventos
+        # Métricas por fase: con medir == False solo se comprueba el flag
+        medir = self.metricas.activo
+        if medir:
+            reloj = time.perf_counter_ns
+            t_inicio = reloj()
+            t_decidir = t_comer = t_cola = t_muertes = 0
+            indice_comida = self.comida.indice
+            consultas_antes, examinadas_antes = indice_comida.consultas, indice_comida.examinadas
+            num_serpientes = len(self.serpientes)
+        comidas = 0
+        movidas = 0
+        pares_comparados = 0
 
         # Iterar sobre una copia de la lista para poder modificarla durante la iteración (al añadir hijos)
         # Aunque añadimos hijos a 'nuevas_serpientes', es más seguro iterar sobre índices o copia
@@ -358,111 +866,137 @@ class SimulationManager:
 
             # 0. Verificar si debe morir antes de moverse (por si acaso)
             if serpiente.energia <= 0:
-                logging.warning(f"Serpiente {serpiente.id} eliminada (pre-movimiento): Sin energía ({serpiente.energia}).")
-                serpientes_a_eliminar.add(serpiente.id)
+                if eventos.activo:
+                    eventos.registrar(EVENTO_MUERTE, self.paso_actual, serpiente.id, *serpiente.cuerpo[0], CAUSA_ENERGIA)
+                serpientes_a_eliminar[serpiente.id] = CAUSA_ENERGIA
                 continue
             if serpiente.edad > self.max_age:
-                logging.warning(f"Serpiente {serpiente.id} eliminada (pre-movimiento): Edad límite ({serpiente.edad}/{self.max_age}).")
-                serpientes_a_eliminar.add(serpiente.id)
+                if eventos.activo:
+                    eventos.registrar(EVENTO_MUERTE, self.paso_actual, serpiente.id, *serpiente.cuerpo[0], CAUSA_EDAD)
+                serpientes_a_eliminar[serpiente.id] = CAUSA_EDAD
                 continue
 
             # 1. Decidir y intentar mover
-            direccion = serpiente.decidir_movimiento(self, self.comida, self.serpientes)
+            if medir:
+                t0 = reloj()
+            direccion = serpiente.decidir_movimiento(self)
             movimiento_valido = serpiente.mover(direccion, self.width, self.height)
+            if medir:
+                t1 = reloj()
+                t_decidir += t1 - t0
 
             # 2. Comprobar muerte por pared
             if not movimiento_valido:
-                logging.warning(f"Serpiente {serpiente.id} marcada para eliminar: Colisión con pared.")
-                serpientes_a_eliminar.add(serpiente.id)
+                if eventos.activo:
+                    eventos.registrar(EVENTO_MUERTE, self.paso_actual, serpiente.id, *serpiente.cuerpo[0], CAUSA_PARED)
+                serpientes_a_eliminar[serpiente.id] = CAUSA_PARED
                 continue # Pasar a la siguiente serpiente
+            movidas += 1
 
             # Si el movimiento fue válido, obtener la nueva cabeza
             cabeza_actual = serpiente.cuerpo[0]
-
-            # 3. Comprobar colisión con comida
-            comio_comida = False
-            comida_comida_idx = -1
-            for food_idx, pos_comida in enumerate(self.comida):
-                if cabeza_actual == pos_comida:
-                    serpiente.energia += self.food_energy
-                    serpiente.comida_comida += 1 # <-- Incrementar contador
-                    # La serpiente crece: no quitamos la cola
-                    comida_comida_idx = food_idx
-                    self._añadir_comida(1)
-                    comio_comida = True
-                    logging.debug(f"Serpiente {serpiente.id} comió comida #{serpiente.comida_comida} en {pos_comida}. Energía: {serpiente.energia}")
-                    break
-
-            if comida_comida_idx != -1:
-                del self.comida[comida_comida_idx]
+            self.indice_cabezas.mover(serpiente, serpiente.cuerpo[1], cabeza_actual)
+
+            # 3. Comprobar colisión con comida (búsqueda O(1) en el almacén)
+            comio_comida = cabeza_actual in self.comida
+            if comio_comida:
+                serpiente.energia += self.food_energy
+                serpiente.comida_comida += 1 # <-- Incrementar contador
+                comidas += 1
+                # La serpiente crece: no quitamos la cola
+                self._añadir_comida(1)
+                self.comida.quitar(cabeza_actual)
+                self.entorno.quitar_comida(cabeza_actual)
+                if self.grabador is not None:
+                    self.grabador.comida_quitada(cabeza_actual)
+                if eventos.activo:
+                    eventos.registrar(EVENTO_COMIDA, self.paso_actual, serpiente.id, *cabeza_actual, serpiente.energia)
+            self.entorno.ocupar(cabeza_actual)
+            if medir:
+                t2 = reloj()
+                t_comer += t2 - t1
 
             # 4. Acortar cola SI NO COMIÓ
             if not comio_comida:
                 if len(serpiente.cuerpo) > 1:
-                     serpiente.cuerpo.pop()
+                     self.entorno.liberar(serpiente.cuerpo.quitar_cola())
                 else:
                      # Si solo tiene cabeza y no comió, muere por inanición implícita?
                      # O simplemente no se acorta. Por ahora, no hacemos nada.
                      pass
-                if cabeza_actual in serpiente.cuerpo[1:]:
-                      logging.warning(f"Serpiente {serpiente.id} detectó colisión consigo misma (tras acortar) en {cabeza_actual} (no fatal).")
-                      # No hacer nada, ya que la auto-colisión no es fatal
 
-            # 5. Comprobar auto-colisión (ya no fatal)
-            elif cabeza_actual in serpiente.cuerpo[1:]: # Se comprueba aquí si comió (cola no se acortó)
-                logging.warning(f"Serpiente {serpiente.id} detectó colisión consigo misma (tras comer) en {cabeza_actual} (no fatal).")
-                # No hacer nada
+            # 5. Comprobar auto-colisión (no fatal, solo se registra), tras acortar o tras comer
+            if eventos.activo and serpiente.cuerpo.cabeza_solapada():
+                eventos.registrar(EVENTO_CHOQUE_PROPIO, self.paso_actual, serpiente.id, *cabeza_actual)
+            if medir:
+                t3 = reloj()
+                t_cola += t3 - t2
 
             # 7. Chequear muerte por energía o edad (final del turno de la serpiente)
             # Si ya está marcada por colisión de pared, no volver a marcar
             if serpiente.id not in serpientes_a_eliminar:
                  if serpiente.energia <= 0:
-                     logging.warning(f"Serpiente {serpiente.id} marcada para eliminar: Sin energía ({serpiente.energia}) al final del turno.")
-                     serpientes_a_eliminar.add(serpiente.id)
+                     if eventos.activo:
+                         eventos.registrar(EVENTO_MUERTE, self.paso_actual, serpiente.id, *cabeza_actual, CAUSA_ENERGIA)
+                     serpientes_a_eliminar[serpiente.id] = CAUSA_ENERGIA
                  elif serpiente.edad > self.max_age:
-                     logging.warning(f"Serpiente {serpiente.id} marcada para eliminar: Edad límite ({serpiente.edad}/{self.max_age}) al final del turno.")
-                     serpientes_a_eliminar.add(serpiente.id)
+                     if eventos.activo:
+                         eventos.registrar(EVENTO_MUERTE, self.paso_actual, serpiente.id, *cabeza_actual, CAUSA_EDAD)
+                     serpientes_a_eliminar[serpiente.id] = CAUSA_EDAD
+            if medir:
+                t_muertes += reloj() - t3
 
             serpientes_procesadas_ids.add(serpiente.id)
 
         # --- Fin del bucle principal de serpientes --- 
+        # Cada movimiento cuesta energía y suma un año; cada comida da energía
+        self.estadisticas.ajustar(energia=comidas * self.food_energy - movidas * COSTE_MOVIMIENTO, edad=movidas)
 
         # <<< NUEVA SECCIÓN 8: Comprobar Reproducción por Adyacencia >>>
+        if medir:
+            t_fase = reloj()
         reproduced_ids = set() # Para evitar que una serpiente se reproduzca varias veces
         potential_parents = [s for s in self.serpientes if s.id not in serpientes_a_eliminar]
-        logging.debug(f"Paso {self.paso_actual}: Comprobando adyacencia para reproducción entre {len(potential_parents)} padres potenciales.")
 
-        for idx1 in range(len(potential_parents)):
-            s1 = potential_parents[idx1]
+        # Mapa posición de cabeza -> índices de los padres potenciales con esa cabeza (en orden)
+        cabezas = {}
+        for idx, s in enumerate(potential_parents):
+            cabezas.setdefault(s.cuerpo[0], []).append(idx)
+
+        for idx1, s1 in enumerate(potential_parents):
             # Si ya se reprodujo en este paso, saltar
             if s1.id in reproduced_ids:
                 continue
 
-            for idx2 in range(idx1 + 1, len(potential_parents)):
+            # Candidatas: cabezas en las 4 celdas vecinas (distancia Manhattan == 1) que van
+            # después de s1 en la lista, probadas en el mismo orden que el antiguo doble bucle
+            x, y = s1.cuerpo[0]
+            candidatos = []
+            for vecina in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)):
+                for idx2 in cabezas.get(vecina, ()):
+                    if idx2 > idx1:
+                        candidatos.append(idx2)
+            candidatos.sort()
+            pares_comparados += len(candidatos)
+
+            for idx2 in candidatos:
                 s2 = potential_parents[idx2]
                 # Si la segunda ya se reprodujo, saltar
                 if s2.id in reproduced_ids:
                     continue
 
-                # Comprobar adyacencia de cabezas (Manhattan distance == 1)
-                head1 = s1.cuerpo[0]
-                head2 = s2.cuerpo[0]
-                distance = abs(head1[0] - head2[0]) + abs(head1[1] - head2[1])
-
-                if distance == 1:
-                    logging.debug(f"Adyacencia detectada entre S{s1.id} en {head1} y S{s2.id} en {head2}. Intentando reproducción.")
-                    # <<< Pasar serpientes_a_eliminar a reproducir para la comprobación de espacio >>>
-                    # Esto es complicado. Modifiquemos reproducir para que reciba la lista de vivos.
-                    # O simplifiquemos la comprobación de espacio en reproducir (riesgo menor)
-                    # Vamos a simplificar en reproducir por ahora.
-                    hijo = self.reproducir(s1, s2)
-                    if hijo:
-                        nuevas_serpientes.append(hijo)
-                        # Marcar ambos padres como reproducidos en este paso
-                        reproduced_ids.add(s1.id)
-                        reproduced_ids.add(s2.id)
-                        # Salir del bucle interno (s1 ya se reprodujo)
-                        break
+                hijo = self.reproducir(s1, s2)
+                if hijo:
+                    nuevas_serpientes.append(hijo)
+                    # Marcar ambos padres como reproducidos en este paso
+                    reproduced_ids.add(s1.id)
+                    reproduced_ids.add(s2.id)
+                    # Salir del bucle interno (s1 ya se reprodujo)
+                    break
+
+        if medir:
+            t_reproduccion = reloj() - t_fase
+            t_fase += t_reproduccion
 
         # 9. Eliminar serpientes marcadas
         num_eliminadas = 0
@@ -472,35 +1006,65 @@ class SimulationManager:
                 supervivientes.append(serpiente)
             else:
                  num_eliminadas += 1
+                 self.estadisticas.baja(serpiente)
+                 if self.especies.activo:
+                     self.especies.baja(serpiente.id)
+                 if self.archivo.activo:
+                     self.archivo.añadir(serpiente, serpientes_a_eliminar[serpiente.id], self.tick + 1)
+                 self.indice_cabezas.quitar(serpiente, serpiente.cuerpo[0])
+                 for segmento in serpiente.cuerpo:
+                     self.entorno.liberar(segmento)
         if num_eliminadas > 0:
-             logging.info(f"Paso {self.paso_actual}: Eliminando {num_eliminadas} serpientes (IDs: {[sid for sid in serpientes_a_eliminar]}). Quedan {len(supervivientes)}.")
+             logging.debug("Paso %d: Eliminando %d serpientes. Quedan %d.", self.paso_actual, num_eliminadas, len(supervivientes))
         self.serpientes = supervivientes
+        if medir:
+            t_eliminacion = reloj() - t_fase
+            t_fase += t_eliminacion
 
         # 10. Añadir nuevas serpientes (hijos)
         if nuevas_serpientes:
-             logging.info(f"Paso {self.paso_actual}: Añadiendo {len(nuevas_serpientes)} nuevos hijos.")
+             logging.debug("Paso %d: Añadiendo %d nuevos hijos.", self.paso_actual, len(nuevas_serpientes))
              self.serpientes.extend(nuevas_serpientes)
+        if medir:
+            t_hijos = reloj() - t_fase
+            t_fase += t_hijos
 
         # 11. Incrementar paso
         self.paso_actual += 1
+        self.tick += 1
 
         # 12. Asegurar que haya algo de comida siempre (ejemplo)
         if not self.comida and self.serpientes: # Solo añadir si quedan serpientes
             num_nueva_comida = min(5, len(self.serpientes)) # Añadir proporcionalmente? O fijo?
-            logging.debug(f"No queda comida. Añadiendo {num_nueva_comida} items.")
+            logging.debug("No queda comida. Añadiendo %d items.", num_nueva_comida)
             self._añadir_comida(num_nueva_comida)
         elif len(self.comida) < 5 and self.serpientes: # Mantener un mínimo de comida
              self._añadir_comida(1)
+        self.estadisticas.muertes = num_eliminadas
+        self.estadisticas.cerrar_paso(self.tick, self.paso_actual, len(self.comida))
+        if self.especies.activo:
+            self.especies.actualizar(self.tick, len(self.serpientes), self._genomas)
+
+        if medir:
+            t_fin = reloj()
+            self.metricas.registrar(
+                self.paso_actual - 1, t_inicio, t_fin,
+                (t_decidir, t_comer, t_cola, t_muertes, t_reproduccion, t_eliminacion, t_hijos, t_fin - t_fase),
+                (num_serpientes, indice_comida.consultas - consultas_antes, indice_comida.examinadas - examinadas_antes,
+                 pares_comparados, len(nuevas_serpientes), comidas, num_eliminadas))
+        if self.grabador is not None:
+            self.grabador.registrar_paso(self)
 
     def get_state(self):
         """Devuelve el estado actual para serializar a JSON."""
         # Se asume que se llama dentro de un lock
         state = {
             'paso': self.paso_actual,
+            'tick': self.tick,
             'serpientes': [
                 {
                     'id': s.id,
-                    'cuerpo': s.cuerpo,
+                    'cuerpo': list(s.cuerpo),
                     'color': s.color,
                     'energia': s.energia,
                     'edad': s.edad,
@@ -511,24 +1075,115 @@ class SimulationManager:
                     'genes_display': [round(g, 2) for g in s.genes[:3]] if s.genes else []
                 } for s in self.serpientes
             ],
-            'comida': self.comida,
+            'comida': self.comida.como_lista(),
             'dimensiones': {
                  'width': self.width,
                  'height': self.height
-            }
-            # Podríamos añadir estadísticas aquí
-            # 'stats': {
-            #     'num_serpientes': len(self.serpientes),
-            #     'num_comida': len(self.comida),
-            #     'avg_energia': sum(s.energia for s in self.serpientes) / len(self.serpientes) if self.serpientes else 0,
-            #     'avg_edad': sum(s.edad for s in self.serpientes) / len(self.serpientes) if self.serpientes else 0
-            # }
+            },
+            # Agregados mantenidos en cada paso: O(1), sin recorrer las serpientes
+            'stats': self.estadisticas.como_dict(len(self.comida)),
         }
+        if self.especies.activo:
+            etiquetas = self.especies.etiquetas
+            for datos in state['serpientes']:
+                datos['especie'] = etiquetas.get(datos['id'])
         return state
 
+    def _genomas(self, indices):
+        """ids y genes de las serpientes en esas posiciones (para EspeciesEnLinea)."""
+        seleccion = [self.serpientes[i] for i in indices]
+        return [s.id for s in seleccion], [s.genes for s in seleccion]
+
+    def activar_especies(self, activo=True):
+        """Activa (etiquetando a la población actual) o desactiva el seguimiento de especies."""
+        if activo:
+            self.especies.activar(len(self.serpientes), self._genomas)
+        else:
+            self.especies.desactivar()
+
+    def num_serpientes(self):
+        return len(self.serpientes)
+
+    def resumen(self):
+        """Resumen numérico de la población (O(1): sale de los agregados incrementales)."""
+        estadisticas = self.estadisticas
+        n = estadisticas.n
+        return {
+            'paso': self.paso_actual,
+            'serpientes': n,
+            'comida': len(self.comida),
+            'energia_media': estadisticas.energia_total / n if n else 0,
+            'edad_media': estadisticas.edad_total / n if n else 0,
+            'genes_medios': estadisticas.medias() if n else [],
+        }
+
+    # --- Migración entre islas ---
+    def extraer_migrantes(self, cantidad, criterio='comida_comida'):
+        """Copia compacta (genes, energía, color) de las `cantidad` mejores serpientes según
+        `criterio`. Las originales se quedan: la isla de origen no pierde población."""
+        if criterio not in CRITERIOS_MIGRACION:
+            raise ValueError(f"Criterio de migración desconocido: {criterio}")
+        mejores = heapq.nlargest(cantidad, self.serpientes, key=lambda s: getattr(s, criterio))
+        return [(tuple(s.genes), s.energia, s.color_rgb) for s in mejores]
+
+    def insertar_migrantes(self, migrantes):
+        """Crea una serpiente nueva en una celda libre al azar por cada registro
+        (genes, energía, color). Devuelve cuántas se pudieron colocar."""
+        if not migrantes:
+            return 0
+        migrantes = [(list(genes), energia, color) for genes, energia, color in migrantes]
+        self._comandos.append((self.tick, 'migrantes', migrantes)) # Cambia el estado: va al replay
+        colocadas = 0
+        for genes, energia, color in migrantes:
+            pos = self.entorno.celda_libre_aleatoria()
+            if pos is None:
+                logging.warning("No hay espacio para más migrantes.")
+                break
+            serpiente = Serpiente(self._get_new_snake_id(), pos[0], pos[1], color=color, genes=genes, rng=self.rng,
+                                  nacimiento=self.tick)
+            serpiente.energia = energia
+            self.serpientes.append(serpiente)
+            self.estadisticas.alta(serpiente)
+            if self.especies.activo:
+                self.especies.alta(serpiente.id, serpiente.genes)
+            self.entorno.ocupar(pos)
+            self.indice_cabezas.añadir(serpiente, pos)
+            colocadas += 1
+        return colocadas
+
+    def _reconstruir_indices(self, comida, orden_comida=None, orden_cabezas=None, libres=None):
+        """Rehace la rejilla, el almacén de comida y el índice de cabezas a partir de
+        self.serpientes y las posiciones de comida (al restaurar un checkpoint).
+
+        orden_comida y orden_cabezas (índices en self.serpientes) fijan el orden de los
+        índices espaciales y libres el del muestreador de celdas libres: con ellos la
+        ejecución sigue exactamente igual que si no se hubiera interrumpido."""
+        self.entorno = crear_entorno(self.width, self.height, self.rng, self.disperso)
+        self.comida = AlmacenComida()
+        self.indice_cabezas = IndiceEspacial()
+        for serpiente in self.serpientes:
+            for segmento in serpiente.cuerpo:
+                self.entorno.ocupar(segmento)
+        for pos in comida:
+            self.entorno.poner_comida(pos)
+        self.comida.cargar(comida, orden_comida)
+        for idx in (range(len(self.serpientes)) if orden_cabezas is None else orden_cabezas):
+            serpiente = self.serpientes[idx]
+            self.indice_cabezas.añadir(serpiente, serpiente.cuerpo[0])
+        if libres is not None:
+            self.entorno.restaurar_orden_libres(libres)
+        self.estadisticas.recalcular(self.serpientes)
+
+    def registro_replay(self):
+        """Registro compacto (semilla, configuración y comandos externos) con el que
+        replay.resimular() regenera cualquier paso de esta ejecución."""
+        return {'version': VERSION_REPLAY, 'motor': 'python', 'semilla': self.seed, 'config': dict(self._config),
+                'comandos': [list(c) for c in self._comandos], 'tick': self.tick}
+
     # <<< NUEVO MÉTODO RESET >>>
     def reset(self):
         logging.info("Llamando a SimulationManager.reset()...")
+        self._comandos.append((self.tick, 'reset'))
         # Guardar los parámetros iniciales si no se guardaron antes
         # (Aunque ya están como atributos gracias al __init__ mejorado)
         initial_snakes = len([s for s in self.serpientes if s.edad == 0 and s.energia == self.snake_initial_energy]) # Una forma de estimar, o mejor guardarlos
@@ -543,6 +1198,10 @@ class SimulationManager:
             food_to_create = getattr(self, '_initial_food', 10)
             self._inicializar_simulacion(snakes_to_create, food_to_create, self.snake_initial_energy)
             self.paso_actual = 0 # Resetear contador de pasos
+            # El reinicio ocupa un tick propio: el estado de antes y el de después no comparten tick
+            self.tick += 1
+            if self.grabador is not None:
+                self.grabador.registrar_reinicio(self)
             logging.info("Simulación reseteada por SimulationManager.reset().")
             return True
         except Exception as e:
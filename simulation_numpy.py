@@ -0,0 +1,662 @@
+"""Motor alternativo de la simulación con la población en arrays de NumPy.
+
+Cada serpiente ocupa un hueco (slot) de arrays contiguos: energía, edad, cabeza x/y,
+cuello, longitud, matriz de genes, contadores de comida e hijos y color empaquetado.
+Un asignador de huecos reutiliza los de las serpientes muertas. El paso se calcula
+vectorizado para toda la población a la vez: muertes, umbrales genéticos, búsqueda
+del objetivo más cercano dentro del rango de visión, elección de dirección,
+movimiento, comida y reproducción por adyacencia.
+
+Expone la misma API que SimulationManager (step, get_state, reset) para que app.py
+pueda usar cualquiera de los dos. Diferencias con el motor de simulation.py:
+- Todas las serpientes deciden y se mueven a la vez a partir del estado al inicio
+  del paso (en el motor Python cada serpiente ve los movimientos de las anteriores).
+- Si varias cabezas llegan a la misma comida, solo come la del hueco más bajo.
+- Si no hay sitio para el hijo, los padres no pierden energía.
+"""
+import logging
+import random
+import time
+from collections import deque
+
+import numpy as np
+
+from simulation import (NUM_GENES, VISION_MAXIMA, VERSION_REPLAY, CRITERIOS_MIGRACION, COSTE_MOVIMIENTO,
+                        COLORES_INICIALES)
+from eventos import (RegistroEventos, EVENTO_MUERTE, EVENTO_NACIMIENTO, EVENTO_COMIDA, EVENTO_ATRAPADA,
+                     CAUSA_PARED, CAUSA_ENERGIA, CAUSA_EDAD)
+from metricas import MetricasPaso
+from muertes import ArchivoMuertes
+from estadisticas import EstadisticasPoblacion
+from especies import EspeciesEnLinea
+
+MAX_ENERGIA_GEN = 200 # Escala de los genes de umbral de energía
+DIRECCIONES = np.array([(0, -1), (0, 1), (-1, 0), (1, 0)], dtype=np.int64)
+MARGEN = VISION_MAXIMA # Borde de relleno de las rejillas para no comprobar límites al mirar alrededor
+TAM_BLOQUE = 4096 # Serpientes por bloque en las consultas de visión (limita la memoria temporal)
+# Fases (consecutivas) y contadores que mide step() cuando las métricas están activas
+FASES_PASO = ('decidir', 'mover', 'comer', 'cuerpos', 'muertes_turno', 'reproduccion', 'eliminacion', 'reposicion_comida')
+CONTADORES_PASO = ('serpientes', 'busquedas_comida', 'busquedas_pareja', 'pares_comparados', 'nacimientos', 'comidas', 'muertes')
+
+
+def _sumar_en(plano, celdas, cantidad):
+    """plano[celdas] += cantidad contando repeticiones (más rápido que np.add.at)."""
+    celdas, repeticiones = np.unique(celdas, return_counts=True)
+    plano[celdas] += repeticiones * cantidad
+
+
+def _desplazamientos_por_distancia(radio):
+    """Desplazamientos (dx, dy) con distancia Manhattan <= radio, ordenados de cerca a lejos."""
+    d = np.arange(-radio, radio + 1)
+    dx, dy = np.meshgrid(d, d)
+    dx, dy = dx.ravel(), dy.ravel()
+    dist = np.abs(dx) + np.abs(dy)
+    dentro = dist <= radio
+    dx, dy, dist = dx[dentro], dy[dentro], dist[dentro]
+    orden = np.argsort(dist, kind='stable')
+    return dx[orden], dy[orden]
+
+
+class SimulationManagerNumpy:
+    def __init__(self, width, height, initial_snakes=5, initial_food=10, mutation_rate=0.1, reproduction_energy_cost=25, max_age=10000, food_energy=50, snake_initial_energy=1000, seed=None):
+        self.width = width
+        self.height = height
+        self.mutation_rate = mutation_rate
+        self.reproduction_energy_cost = reproduction_energy_cost
+        self.max_age = max_age
+        self.food_energy = food_energy
+        self.snake_initial_energy = snake_initial_energy
+        self._initial_snakes = initial_snakes
+        self._initial_food = initial_food
+        # Generador propio con semilla (los aleatorios de cada paso ya se sacan en bloque)
+        self.seed = seed if seed is not None else random.getrandbits(63)
+        self.rng = np.random.default_rng(self.seed)
+        self._config = {'width': width, 'height': height, 'initial_snakes': initial_snakes, 'initial_food': initial_food,
+                        'mutation_rate': mutation_rate, 'reproduction_energy_cost': reproduction_energy_cost,
+                        'max_age': max_age, 'food_energy': food_energy, 'snake_initial_energy': snake_initial_energy}
+        self.tick = 0 # Pasos dados desde la creación (no vuelve a 0 con reset)
+        self._comandos = [] # Comandos externos [tick, nombre] para el registro de replay
+        self.eventos = RegistroEventos() # Trazado de eventos, desactivado por defecto
+        self.metricas = MetricasPaso(FASES_PASO, CONTADORES_PASO) # Desactivadas por defecto
+        self.archivo = ArchivoMuertes(NUM_GENES) # Registro de vida de cada serpiente muerta (ver muertes.py)
+        self.estadisticas = EstadisticasPoblacion(NUM_GENES) # Agregados de la población, al día en cada paso
+        self.especies = EspeciesEnLinea(num_genes=NUM_GENES) # Especies y diversidad genética, desactivadas por defecto
+        self._pares_comparados = 0
+
+        # Desplazamientos de visión para cada radio posible, como índices planos sobre la rejilla con margen
+        self._ancho_pad = width + 2 * MARGEN
+        self._vision_dx = {}
+        self._vision_dy = {}
+        self._vision_plano = {}
+        for radio in range(1, VISION_MAXIMA + 1):
+            dx, dy = _desplazamientos_por_distancia(radio)
+            self._vision_dx[radio] = dx
+            self._vision_dy[radio] = dy
+            self._vision_plano[radio] = dy * self._ancho_pad + dx
+
+        self._inicializar_simulacion(initial_snakes, initial_food)
+
+    # --- Almacenamiento por huecos ---
+    def _reservar_arrays(self, capacidad):
+        self._capacidad = capacidad
+        self.vivo = np.zeros(capacidad, dtype=bool)
+        self.ids = np.zeros(capacidad, dtype=np.int64)
+        self.energia = np.zeros(capacidad, dtype=np.int64)
+        self.edad = np.zeros(capacidad, dtype=np.int64)
+        self.nacimiento = np.zeros(capacidad, dtype=np.int64) # Primer tick en el que existe
+        self.cabeza_x = np.zeros(capacidad, dtype=np.int64)
+        self.cabeza_y = np.zeros(capacidad, dtype=np.int64)
+        self.cuello_x = np.zeros(capacidad, dtype=np.int64)
+        self.cuello_y = np.zeros(capacidad, dtype=np.int64)
+        self.longitud = np.zeros(capacidad, dtype=np.int64)
+        self.genes = np.zeros((capacidad, NUM_GENES), dtype=np.float64)
+        self.comida_comida = np.zeros(capacidad, dtype=np.int64)
+        self.hijos = np.zeros(capacidad, dtype=np.int64)
+        self.color = np.zeros(capacidad, dtype=np.int64) # 0xRRGGBB
+        self.cuerpos = [None] * capacidad # deque de índices planos de celda, cabeza primero
+        self._huecos_libres = list(range(capacidad - 1, -1, -1))
+
+    def _crecer(self, minimo):
+        nueva = max(minimo, self._capacidad * 2)
+        extra = nueva - self._capacidad
+        for nombre in ('vivo', 'ids', 'energia', 'edad', 'nacimiento', 'cabeza_x', 'cabeza_y', 'cuello_x', 'cuello_y',
+                       'longitud', 'comida_comida', 'hijos', 'color'):
+            viejo = getattr(self, nombre)
+            setattr(self, nombre, np.concatenate([viejo, np.zeros(extra, dtype=viejo.dtype)]))
+        self.genes = np.concatenate([self.genes, np.zeros((extra, NUM_GENES))])
+        self.cuerpos.extend([None] * extra)
+        self._huecos_libres = list(range(nueva - 1, self._capacidad - 1, -1)) + self._huecos_libres
+        self._capacidad = nueva
+
+    def _asignar_huecos(self, cantidad):
+        if cantidad > len(self._huecos_libres):
+            self._crecer(self._capacidad + cantidad)
+        huecos = [self._huecos_libres.pop() for _ in range(cantidad)]
+        return np.array(huecos, dtype=np.int64)
+
+    def _crear_serpientes(self, celdas, energia, genes, color, nacimiento=None):
+        """Da de alta serpientes de longitud 1 en las celdas (índices planos) dadas.
+        `nacimiento` es su primer tick (por defecto, el actual)."""
+        huecos = self._asignar_huecos(len(celdas))
+        if not len(huecos):
+            return huecos
+        self.vivo[huecos] = True
+        self.ids[huecos] = np.arange(self._next_snake_id + 1, self._next_snake_id + 1 + len(huecos))
+        self._next_snake_id += len(huecos)
+        self.energia[huecos] = energia
+        self.edad[huecos] = 0
+        self.nacimiento[huecos] = self.tick if nacimiento is None else nacimiento
+        self.cabeza_x[huecos] = celdas % self.width
+        self.cabeza_y[huecos] = celdas // self.width
+        self.longitud[huecos] = 1
+        self.genes[huecos] = genes
+        self.comida_comida[huecos] = 0
+        self.hijos[huecos] = 0
+        self.color[huecos] = color
+        for hueco, celda in zip(huecos.tolist(), celdas.tolist()):
+            self.cuerpos[hueco] = deque([celda])
+        _sumar_en(self.ocupacion, celdas, 1)
+        if self.especies.activo:
+            self.especies.alta_lote(self.ids[huecos].tolist(), self.genes[huecos])
+        return huecos
+
+    # --- Rejillas ---
+    def _celdas_libres_aleatorias(self, cantidad):
+        """Hasta `cantidad` celdas vacías distintas elegidas al azar (índices planos)."""
+        if cantidad <= 0:
+            return np.zeros(0, dtype=np.int64)
+        total = self.width * self.height
+        for _ in range(4):
+            candidatas = self.rng.integers(0, total, size=cantidad * 2 + 8)
+            candidatas = candidatas[(self.ocupacion[candidatas] == 0) & ~self._hay_comida(candidatas)]
+            _, primeras = np.unique(candidatas, return_index=True)
+            candidatas = candidatas[np.sort(primeras)]
+            if len(candidatas) >= cantidad:
+                return candidatas[:cantidad]
+        # Tablero muy lleno: elegir entre todas las celdas libres
+        libres = np.flatnonzero((self.ocupacion == 0) & ~self.comida_mapa.reshape(-1))
+        if len(libres) <= cantidad:
+            return self.rng.permutation(libres)
+        return self.rng.choice(libres, size=cantidad, replace=False)
+
+    def _hay_comida(self, celdas):
+        return self.comida_mapa[celdas // self.width, celdas % self.width]
+
+    def _poner_comida(self, celdas, valor):
+        self.comida_mapa[celdas // self.width, celdas % self.width] = valor
+
+    def _añadir_comida(self, cantidad=1):
+        celdas = self._celdas_libres_aleatorias(cantidad)
+        if len(celdas) < cantidad:
+            logging.warning("No se pudo encontrar espacio para añadir comida.")
+        self._poner_comida(celdas, True)
+
+    def _inicializar_simulacion(self, num_serpientes, num_comida):
+        total = self.width * self.height
+        self.paso_actual = 0
+        self._next_snake_id = 0
+        if self.especies.activo:
+            self.especies.olvidar_poblacion()
+        self.ocupacion = np.zeros(total, dtype=np.int32) # Segmentos de serpiente por celda
+        # Comida en una rejilla con margen; comida_mapa es la vista (height, width) sin margen
+        self._comida_pad = np.zeros((self.height + 2 * MARGEN, self._ancho_pad), dtype=bool)
+        self.comida_mapa = self._comida_pad[MARGEN:MARGEN + self.height, MARGEN:MARGEN + self.width]
+        self._reservar_arrays(max(64, num_serpientes * 2))
+
+        celdas = self._celdas_libres_aleatorias(num_serpientes)
+        if len(celdas) < num_serpientes:
+            logging.warning("No queda espacio para más serpientes iniciales.")
+        colores = self.rng.choice(COLORES_INICIALES, size=len(celdas))
+        self._crear_serpientes(celdas, self.snake_initial_energy, self.rng.random((len(celdas), NUM_GENES)), colores)
+        self._añadir_comida(num_comida)
+        self._actualizar_estadisticas()
+        logging.info(f"Simulación (NumPy) inicializada con {int(self.vivo.sum())} serpientes y {int(self.comida_mapa.sum())} comidas.")
+
+    # --- Percepción ---
+    def _objetivos_cercanos(self, huecos, vision, rejilla_pad, descontar_propia=None):
+        """Desplazamiento al objetivo más cercano de cada serpiente dentro de su visión.
+
+        rejilla_pad es una rejilla con margen cuyas celdas > 0 son objetivos. Si se da
+        descontar_propia, se resta a la celda propia (distancia 0) para no verse a sí misma.
+        Devuelve (encontrado, dx, dy).
+        """
+        n = len(huecos)
+        encontrado = np.zeros(n, dtype=bool)
+        obj_dx = np.zeros(n, dtype=np.int64)
+        obj_dy = np.zeros(n, dtype=np.int64)
+        plano = rejilla_pad.reshape(-1)
+        base = (self.cabeza_y[huecos] + MARGEN) * self._ancho_pad + (self.cabeza_x[huecos] + MARGEN)
+        # Agrupar por radio para mirar solo el rombo de visión de cada serpiente
+        for radio in np.unique(vision).tolist():
+            grupo = np.flatnonzero(vision == radio)
+            desplaz = self._vision_plano[radio]
+            for inicio in range(0, len(grupo), TAM_BLOQUE):
+                bloque = grupo[inicio:inicio + TAM_BLOQUE]
+                valores = plano[base[bloque, None] + desplaz[None, :]]
+                if descontar_propia is not None:
+                    valores = valores.astype(np.int64)
+                    valores[:, 0] -= descontar_propia[bloque] # El desplazamiento 0 es la celda propia
+                acierto = valores > 0
+                primero = acierto.argmax(axis=1)
+                hay = acierto[np.arange(len(bloque)), primero]
+                encontrado[bloque] = hay
+                obj_dx[bloque] = self._vision_dx[radio][primero]
+                obj_dy[bloque] = self._vision_dy[radio][primero]
+        return encontrado, obj_dx, obj_dy
+
+    def _direccion_hacia(self, dx, dy):
+        """Índice en DIRECCIONES hacia (dx, dy) por el eje dominante (-1 si ya está allí)."""
+        horizontal = np.where(dx > 0, 3, 2)
+        vertical = np.where(dy > 0, 1, 0)
+        empate_al_azar = self.rng.random(len(dx)) < 0.5
+        elegir_horizontal = (np.abs(dx) > np.abs(dy)) | ((np.abs(dx) == np.abs(dy)) & (dx != 0) & empate_al_azar)
+        direccion = np.where(elegir_horizontal, horizontal, vertical)
+        return np.where((dx == 0) & (dy == 0), -1, direccion)
+
+    # --- Paso ---
+    def step(self):
+        """Avanza un paso en la simulación (vectorizado)."""
+        # Métricas por fase: marcas de tiempo en cada frontera entre fases
+        medir = self.metricas.activo
+        if medir:
+            reloj = time.perf_counter_ns
+            marcas = [reloj()]
+            busquedas_comida = busquedas_pareja = num_comen = 0
+        vivos = np.flatnonzero(self.vivo)
+        muertas = np.zeros(self._capacidad, dtype=bool)
+
+        # 0. Muertes antes de moverse
+        muertas[vivos] = (self.energia[vivos] <= 0) | (self.edad[vivos] > self.max_age)
+        if self.eventos.activo:
+            self._registrar_muertes(vivos[muertas[vivos]])
+        moviendo = vivos[~muertas[vivos]]
+        n = len(moviendo)
+        a_la_pared = moviendo[:0] # Huecos que chocan con la pared, para la causa en el archivo
+
+        if n:
+            # 1. Parámetros genéticos (mismas escalas que Serpiente)
+            g = self.genes[moviendo]
+            vision = np.maximum(1, (np.sqrt(g[:, 0]) * VISION_MAXIMA).astype(np.int64))
+            umbral_bajo = g[:, 1] * MAX_ENERGIA_GEN
+            umbral_alto = np.maximum(umbral_bajo, g[:, 2] * MAX_ENERGIA_GEN)
+            energia = self.energia[moviendo]
+
+            # 2. Objetivo: comida si tiene poca energía, pareja si tiene mucha
+            objetivo = np.zeros(n, dtype=bool)
+            obj_dx = np.zeros(n, dtype=np.int64)
+            obj_dy = np.zeros(n, dtype=np.int64)
+            busca_comida = np.flatnonzero(energia < umbral_bajo)
+            if len(busca_comida):
+                hay, dx, dy = self._objetivos_cercanos(moviendo[busca_comida], vision[busca_comida], self._comida_pad)
+                objetivo[busca_comida], obj_dx[busca_comida], obj_dy[busca_comida] = hay, dx, dy
+            busca_pareja = np.flatnonzero(energia > umbral_alto)
+            if len(busca_pareja):
+                elegible = self.energia[vivos] >= self.reproduction_energy_cost
+                elegibles = np.zeros((self.height + 2 * MARGEN, self._ancho_pad), dtype=np.int32)
+                _sumar_en(elegibles.reshape(-1), (self.cabeza_y[vivos[elegible]] + MARGEN) * self._ancho_pad + self.cabeza_x[vivos[elegible]] + MARGEN, 1)
+                propia = (energia[busca_pareja] >= self.reproduction_energy_cost).astype(np.int64)
+                hay, dx, dy = self._objetivos_cercanos(moviendo[busca_pareja], vision[busca_pareja], elegibles, descontar_propia=propia)
+                objetivo[busca_pareja], obj_dx[busca_pareja], obj_dy[busca_pareja] = hay, dx, dy
+
+            deseada = np.where(objetivo, self._direccion_hacia(obj_dx, obj_dy), -1)
+            if medir:
+                busquedas_comida, busquedas_pareja = len(busca_comida), len(busca_pareja)
+
+            # 3. Direcciones válidas: dentro del tablero y sin volver sobre el cuello
+            hx, hy = self.cabeza_x[moviendo], self.cabeza_y[moviendo]
+            sig_x = hx[:, None] + DIRECCIONES[None, :, 0]
+            sig_y = hy[:, None] + DIRECCIONES[None, :, 1]
+            validas = (sig_x >= 0) & (sig_x < self.width) & (sig_y >= 0) & (sig_y < self.height)
+            tiene_cuello = (self.longitud[moviendo] > 1)[:, None]
+            validas &= ~(tiene_cuello & (sig_x == self.cuello_x[moviendo][:, None]) & (sig_y == self.cuello_y[moviendo][:, None]))
+
+            # 4. Elegir: la deseada si es válida, si no una válida al azar (o cualquiera si está atrapada)
+            azar = self.rng.random((n, 4))
+            atrapada = ~validas.any(axis=1)
+            al_azar = np.where(atrapada[:, None], azar, np.where(validas, azar, -1.0)).argmax(axis=1)
+            deseada_valida = (deseada >= 0) & validas[np.arange(n), np.maximum(deseada, 0)]
+            direccion = np.where(deseada_valida, deseada, al_azar)
+
+            if medir:
+                marcas.append(reloj())
+
+            # 5. Mover; chocar con la pared mata sin mover
+            nx = hx + DIRECCIONES[direccion, 0]
+            ny = hy + DIRECCIONES[direccion, 1]
+            en_tablero = (nx >= 0) & (nx < self.width) & (ny >= 0) & (ny < self.height)
+            muertas[moviendo[~en_tablero]] = True
+            a_la_pared = moviendo[~en_tablero]
+            if self.eventos.activo:
+                self._registrar_eventos(EVENTO_ATRAPADA, moviendo[atrapada])
+                self._registrar_muertes(moviendo[~en_tablero], CAUSA_PARED)
+            movidas = moviendo[en_tablero]
+            nx, ny = nx[en_tablero], ny[en_tablero]
+            self.energia[movidas] -= COSTE_MOVIMIENTO
+            self.edad[movidas] += 1
+            self.cuello_x[movidas] = self.cabeza_x[movidas]
+            self.cuello_y[movidas] = self.cabeza_y[movidas]
+            self.cabeza_x[movidas] = nx
+            self.cabeza_y[movidas] = ny
+            celdas = ny * self.width + nx
+            if medir:
+                marcas.append(reloj())
+
+            # 6. Comer: si varias cabezas llegan a la misma comida, come la primera
+            sobre_comida = np.flatnonzero(self._hay_comida(celdas))
+            _, primeras = np.unique(celdas[sobre_comida], return_index=True)
+            comen = sobre_comida[primeras]
+            comio = np.zeros(len(movidas), dtype=bool)
+            comio[comen] = True
+            self.energia[movidas[comen]] += self.food_energy
+            self.comida_comida[movidas[comen]] += 1
+            self.longitud[movidas[comen]] += 1
+            self._poner_comida(celdas[comen], False)
+            if self.eventos.activo:
+                self._registrar_eventos(EVENTO_COMIDA, movidas[comen], self.energia[movidas[comen]])
+            if medir:
+                num_comen = len(comen)
+                marcas.append(reloj())
+
+            # 7. Cuerpos: nueva cabeza y, si no comió, fuera la cola
+            colas = []
+            cuerpos = self.cuerpos
+            for hueco, celda, crece in zip(movidas.tolist(), celdas.tolist(), comio.tolist()):
+                cuerpo = cuerpos[hueco]
+                cuerpo.appendleft(celda)
+                if not crece:
+                    colas.append(cuerpo.pop())
+            _sumar_en(self.ocupacion, celdas, 1)
+            if colas:
+                _sumar_en(self.ocupacion, np.array(colas, dtype=np.int64), -1)
+            self._añadir_comida(len(comen))
+            if medir:
+                marcas.append(reloj())
+
+            # 8. Muertes al final del turno
+            muertas[movidas] = (self.energia[movidas] <= 0) | (self.edad[movidas] > self.max_age)
+            if self.eventos.activo:
+                self._registrar_muertes(movidas[muertas[movidas]])
+        if medir:
+            # Sin serpientes que mover, las fases de movimiento duran 0
+            marcas.extend([reloj()] * (6 - len(marcas)))
+
+        # 9. Reproducción por adyacencia de cabezas
+        nacimientos = self._reproducir(vivos[~muertas[vivos]])
+        if medir:
+            marcas.append(reloj())
+
+        # 10. Eliminar serpientes muertas
+        eliminadas = vivos[muertas[vivos]]
+        if len(eliminadas) and self.archivo.activo:
+            self._archivar_muertes(eliminadas, a_la_pared)
+        if len(eliminadas) and self.especies.activo:
+            for id_serpiente in self.ids[eliminadas].tolist():
+                self.especies.baja(id_serpiente)
+        if len(eliminadas):
+            segmentos = []
+            for hueco in eliminadas.tolist():
+                segmentos.extend(self.cuerpos[hueco])
+                self.cuerpos[hueco] = None
+            _sumar_en(self.ocupacion, np.array(segmentos, dtype=np.int64), -1)
+            self.vivo[eliminadas] = False
+            self._huecos_libres.extend(eliminadas.tolist())
+            logging.debug("Paso %d: %d serpientes eliminadas, %d nacimientos.", self.paso_actual, len(eliminadas), nacimientos)
+        if medir:
+            marcas.append(reloj())
+
+        # 11. Incrementar paso y mantener un mínimo de comida
+        self.paso_actual += 1
+        self.tick += 1
+        num_serpientes = int(self.vivo.sum())
+        num_comida = int(self.comida_mapa.sum())
+        if num_comida == 0 and num_serpientes:
+            self._añadir_comida(min(5, num_serpientes))
+        elif num_comida < 5 and num_serpientes:
+            self._añadir_comida(1)
+        self._actualizar_estadisticas(nacimientos, len(eliminadas))
+        self.estadisticas.cerrar_paso(self.tick, self.paso_actual, int(self.comida_mapa.sum()))
+        if self.especies.activo:
+            self.especies.actualizar(self.tick, int(self.vivo.sum()), self._genomas)
+
+        if medir:
+            marcas.append(reloj())
+            self.metricas.registrar(
+                self.paso_actual - 1, marcas[0], marcas[-1], [b - a for a, b in zip(marcas, marcas[1:])],
+                (len(vivos), busquedas_comida, busquedas_pareja, self._pares_comparados, nacimientos, num_comen, len(eliminadas)))
+
+    def _reproducir(self, padres):
+        """Empareja cabezas adyacentes (cada serpiente una vez por paso) y crea los hijos."""
+        self._pares_comparados = 0
+        if len(padres) < 2:
+            return 0
+        claves = self.cabeza_y[padres] * self.width + self.cabeza_x[padres]
+        orden = np.argsort(claves, kind='stable')
+        # Tabla por celda: cuántas cabezas hay y dónde empiezan en `orden`
+        por_celda = np.bincount(claves, minlength=self.width * self.height)
+        inicio_celda = np.cumsum(por_celda) - por_celda
+
+        # Parejas (i, j) con i < j en el orden de `padres` y cabezas a distancia 1
+        pares_i, pares_j = [], []
+        hx, hy = self.cabeza_x[padres], self.cabeza_y[padres]
+        for dx, dy in DIRECCIONES.tolist():
+            vx, vy = hx + dx, hy + dy
+            dentro = np.flatnonzero((vx >= 0) & (vx < self.width) & (vy >= 0) & (vy < self.height))
+            vecinas = vy[dentro] * self.width + vx[dentro]
+            cuantas = por_celda[vecinas]
+            total = int(cuantas.sum())
+            if not total:
+                continue
+            i = np.repeat(dentro, cuantas)
+            desplazamiento = np.arange(total) - np.repeat(np.cumsum(cuantas) - cuantas, cuantas)
+            j = orden[np.repeat(inicio_celda[vecinas], cuantas) + desplazamiento]
+            pares_i.append(i)
+            pares_j.append(j)
+        if not pares_i:
+            return 0
+        i = np.concatenate(pares_i)
+        j = np.concatenate(pares_j)
+        self._pares_comparados = len(i)
+        coste = self.reproduction_energy_cost
+        aptos = (i < j) & (self.energia[padres[i]] >= coste) & (self.energia[padres[j]] >= coste)
+        i, j = i[aptos], j[aptos]
+        if not len(i):
+            return 0
+        orden_pares = np.lexsort((j, i))
+        i, j = i[orden_pares], j[orden_pares]
+
+        # Emparejamiento voraz en orden: cada serpiente se reproduce como mucho una vez.
+        # Las parejas que no comparten serpiente con ninguna otra se aceptan directamente;
+        # solo las que compiten pasan por el bucle.
+        apariciones = np.bincount(np.concatenate([i, j]), minlength=len(padres))
+        sin_conflicto = (apariciones[i] == 1) & (apariciones[j] == 1)
+        p1 = i[sin_conflicto].tolist()
+        p2 = j[sin_conflicto].tolist()
+        usadas = set()
+        for a, b in zip(i[~sin_conflicto].tolist(), j[~sin_conflicto].tolist()):
+            if a in usadas or b in usadas:
+                continue
+            usadas.add(a)
+            usadas.add(b)
+            p1.append(a)
+            p2.append(b)
+
+        celdas = self._celdas_libres_aleatorias(len(p1))
+        if len(celdas) < len(p1):
+            logging.warning("No hay espacio vacío en el tablero para todos los nacimientos.")
+        k = len(celdas)
+        if not k:
+            return 0
+        s1 = padres[np.array(p1[:k])]
+        s2 = padres[np.array(p2[:k])]
+        self.energia[s1] -= coste
+        self.energia[s2] -= coste
+        self.hijos[s1] += 1
+        self.hijos[s2] += 1
+
+        # Genes: cruce por la mitad y mutación
+        cruce = NUM_GENES // 2
+        genes = np.concatenate([self.genes[s1, :cruce], self.genes[s2, cruce:]], axis=1)
+        muta = self.rng.random(genes.shape) < self.mutation_rate
+        genes[muta] = self.rng.random(int(muta.sum()))
+
+        # Color: media de los padres con una ligera mutación por canal
+        canales = []
+        for desplazamiento in (16, 8, 0):
+            c = ((self.color[s1] >> desplazamiento) & 0xFF) + ((self.color[s2] >> desplazamiento) & 0xFF)
+            c = np.clip(c // 2 + self.rng.integers(-10, 11, size=k), 0, 255)
+            canales.append(c << desplazamiento)
+        color = canales[0] | canales[1] | canales[2]
+
+        hijos = self._crear_serpientes(celdas, coste * 2, genes, color, nacimiento=self.tick + 1) # Aparecen al terminar el paso
+        if self.eventos.activo:
+            self._registrar_eventos(EVENTO_NACIMIENTO, hijos, self.ids[s1], self.ids[s2])
+        return k
+
+    def _registrar_eventos(self, tipo, huecos, datos=None, datos2=None):
+        """Registra un evento por hueco en su posición de cabeza actual."""
+        self.eventos.registrar_lote(tipo, self.paso_actual, self.ids[huecos].tolist(),
+                                    self.cabeza_x[huecos].tolist(), self.cabeza_y[huecos].tolist(),
+                                    None if datos is None else datos.tolist(),
+                                    None if datos2 is None else datos2.tolist())
+
+    def _archivar_muertes(self, huecos, a_la_pared):
+        """Pasa al archivo las serpientes muertas en este paso (antes de liberar sus huecos)."""
+        causas = np.where(self.energia[huecos] <= 0, CAUSA_ENERGIA, CAUSA_EDAD)
+        causas[np.isin(huecos, a_la_pared)] = CAUSA_PARED
+        self.archivo.añadir_lote({
+            'id': self.ids[huecos].tolist(),
+            'nacimiento': self.nacimiento[huecos].tolist(),
+            'muerte': [self.tick + 1] * len(huecos),
+            'edad': self.edad[huecos].tolist(),
+            'energia': self.energia[huecos].tolist(),
+            'comida': self.comida_comida[huecos].tolist(),
+            'hijos': self.hijos[huecos].tolist(),
+            'longitud': self.longitud[huecos].tolist(),
+            'color': self.color[huecos].tolist(),
+            'causa': causas.tolist(),
+        }, self.genes[huecos].tolist())
+
+    def _actualizar_estadisticas(self, nacimientos=0, muertes=0):
+        """Agregados de la población, vectorizados una vez por paso para que consultarlos sea O(1)."""
+        vivos = np.flatnonzero(self.vivo)
+        n = len(vivos)
+        genes = self.genes[vivos]
+        self.estadisticas.fijar(n, int(self.energia[vivos].sum()), int(self.edad[vivos].sum()),
+                                genes.mean(axis=0).tolist() if n else [0.0] * NUM_GENES,
+                                genes.var(axis=0, ddof=1).tolist() if n > 1 else [0.0] * NUM_GENES,
+                                nacimientos, muertes)
+
+    def _registrar_muertes(self, huecos, causa=None):
+        if causa is None:
+            causas = np.where(self.energia[huecos] <= 0, CAUSA_ENERGIA, CAUSA_EDAD)
+        else:
+            causas = np.full(len(huecos), causa)
+        self._registrar_eventos(EVENTO_MUERTE, huecos, causas)
+
+    # --- Estado ---
+    def get_state(self):
+        """Devuelve el estado actual para serializar a JSON (mismo formato que SimulationManager)."""
+        vivos = np.flatnonzero(self.vivo)
+        ancho = self.width
+        genes = np.round(self.genes[vivos, :3], 2).tolist()
+        serpientes = []
+        for k, (hueco, id_, color, energia, edad, comida, hijos) in enumerate(zip(
+                vivos.tolist(), self.ids[vivos].tolist(), self.color[vivos].tolist(), self.energia[vivos].tolist(),
+                self.edad[vivos].tolist(), self.comida_comida[vivos].tolist(), self.hijos[vivos].tolist())):
+            serpientes.append({
+                'id': id_,
+                'cuerpo': [(c % ancho, c // ancho) for c in self.cuerpos[hueco]],
+                'color': f'#{color:06x}',
+                'energia': energia,
+                'edad': edad,
+                'comida_comida': comida,
+                'hijos': hijos,
+                'genes_display': genes[k],
+            })
+        if self.especies.activo:
+            etiquetas = self.especies.etiquetas
+            for datos in serpientes:
+                datos['especie'] = etiquetas.get(datos['id'])
+        comida = np.flatnonzero(self.comida_mapa)
+        return {
+            'paso': self.paso_actual,
+            'tick': self.tick,
+            'serpientes': serpientes,
+            'comida': list(zip((comida % ancho).tolist(), (comida // ancho).tolist())),
+            'dimensiones': {
+                'width': self.width,
+                'height': self.height
+            },
+            'stats': self.estadisticas.como_dict(len(comida)),
+        }
+
+    def _genomas(self, indices):
+        """ids y genes de las serpientes vivas en esas posiciones (para EspeciesEnLinea)."""
+        huecos = np.flatnonzero(self.vivo)[np.asarray(indices, dtype=np.int64)]
+        return self.ids[huecos].tolist(), self.genes[huecos]
+
+    def activar_especies(self, activo=True):
+        """Activa (etiquetando a la población actual) o desactiva el seguimiento de especies."""
+        if activo:
+            self.especies.activar(int(self.vivo.sum()), self._genomas)
+        else:
+            self.especies.desactivar()
+
+    def num_serpientes(self):
+        return int(self.vivo.sum())
+
+    def resumen(self):
+        """Resumen numérico de la población (mismo formato que SimulationManager.resumen)."""
+        vivos = np.flatnonzero(self.vivo)
+        n = len(vivos)
+        return {
+            'paso': self.paso_actual,
+            'serpientes': n,
+            'comida': int(self.comida_mapa.sum()),
+            'energia_media': float(self.energia[vivos].mean()) if n else 0,
+            'edad_media': float(self.edad[vivos].mean()) if n else 0,
+            'genes_medios': self.genes[vivos].mean(axis=0).tolist() if n else [],
+        }
+
+    # --- Migración entre islas ---
+    def extraer_migrantes(self, cantidad, criterio='comida_comida'):
+        """Copia (genes, energía, color) de las `cantidad` mejores serpientes según `criterio`."""
+        if criterio not in CRITERIOS_MIGRACION:
+            raise ValueError(f"Criterio de migración desconocido: {criterio}")
+        valores = {'comida_comida': self.comida_comida, 'hijos_generados': self.hijos, 'energia': self.energia}[criterio]
+        vivos = np.flatnonzero(self.vivo)
+        mejores = vivos[np.argsort(-valores[vivos], kind='stable')[:cantidad]]
+        return [(tuple(self.genes[h].tolist()), int(self.energia[h]), int(self.color[h])) for h in mejores.tolist()]
+
+    def insertar_migrantes(self, migrantes):
+        """Crea una serpiente por registro (genes, energía, color) en celdas libres al azar."""
+        if not migrantes:
+            return 0
+        migrantes = [(list(genes), energia, color) for genes, energia, color in migrantes]
+        self._comandos.append((self.tick, 'migrantes', migrantes))
+        celdas = self._celdas_libres_aleatorias(len(migrantes))
+        if len(celdas) < len(migrantes):
+            logging.warning("No hay espacio para más migrantes.")
+        k = len(celdas)
+        if k:
+            self._crear_serpientes(celdas, np.array([m[1] for m in migrantes[:k]]),
+                                   np.array([m[0] for m in migrantes[:k]], dtype=np.float64),
+                                   np.array([m[2] for m in migrantes[:k]]))
+            self._actualizar_estadisticas()
+        return k
+
+    def registro_replay(self):
+        """Semilla, configuración y comandos externos; ver replay.resimular()."""
+        return {'version': VERSION_REPLAY, 'motor': 'numpy', 'semilla': self.seed, 'config': dict(self._config),
+                'comandos': [list(c) for c in self._comandos], 'tick': self.tick}
+
+    def reset(self):
+        logging.info("Llamando a SimulationManagerNumpy.reset()...")
+        self._comandos.append((self.tick, 'reset'))
+        try:
+            self._inicializar_simulacion(self._initial_snakes, self._initial_food)
+            self.tick += 1 # El reinicio ocupa un tick propio, como en SimulationManager
+            return True
+        except Exception as e:
+            logging.error(f"Error durante SimulationManagerNumpy.reset(): {e}", exc_info=True)
+            return False
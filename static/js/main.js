@@ -1,6 +1,8 @@
 const canvas = document.getElementById('gameCanvas');
 const ctx = canvas.getContext('2d');
 const statsDiv = document.getElementById('stats');
+const historyRange = document.getElementById('historyRange');
+let pasoHistorico = null; // Tick que se está mirando con el deslizador; null: en vivo
 
 // --- Configuración Inicial --- 
 // Leer dimensiones desde los atributos de datos del canvas
@@ -141,7 +143,8 @@ function updateSnakeStats(snakes) {
 
 async function fetchAndUpdate() {
     try {
-        const response = await fetch('/game_state');
+        const url = pasoHistorico === null ? '/game_state' : `/game_state?paso=${pasoHistorico}`;
+        const response = await fetch(url);
         if (!response.ok) {
             console.error("Error al obtener estado:", response.status, response.statusText);
             try {
@@ -206,6 +209,16 @@ async function fetchAndUpdate() {
 
         // Actualizar Estadísticas
         updateStats(gameState.paso, gameState.serpientes?.length || 0, gameState.comida?.length || 0);
+        if (gameState.stats) {
+            statsDiv.textContent += ` | Energía media: ${gameState.stats.energia_media.toFixed(1)} | Edad media: ${gameState.stats.edad_media.toFixed(1)}`;
+        }
+        if (gameState.historico) {
+            statsDiv.textContent += ` | Histórico (tick ${gameState.tick})`;
+        } else if (gameState.tick !== undefined) {
+            // En vivo, el deslizador sigue al último paso
+            historyRange.max = gameState.tick;
+            historyRange.value = gameState.tick;
+        }
 
     } catch (error) {
         console.error("Error en fetchAndUpdate:", error);
@@ -241,7 +254,9 @@ function darkenColor(color, amount) {
 // --- Iniciar el Bucle de Actualización ---
 const updateInterval = 150; // Milisegundos (más lento que simulación para dar tiempo a renderizar)
 console.log(`Iniciando actualización del juego cada ${updateInterval} ms`);
-let intervalId = setInterval(fetchAndUpdate, updateInterval);
+let intervalId = setInterval(() => {
+    if (pasoHistorico === null) fetchAndUpdate(); // Un paso pasado no cambia: no hace falta refrescarlo
+}, updateInterval);
 
 // Llamada inicial para no esperar el primer intervalo
 console.log("Realizando primera llamada a fetchAndUpdate...");
@@ -273,4 +288,71 @@ document.getElementById('resetButton').addEventListener('click', async function(
         console.error("Error de conexión al reiniciar:", error);
         alert("Error de conexión al intentar reiniciar la simulación");
     }
-}); 
\ No newline at end of file
+}); 
+
+// --- Historial: mover el deslizador muestra pasos pasados de la grabación ---
+fetch('/trayectoria').then(response => {
+    if (!response.ok) return; // Sin grabación: el deslizador queda oculto
+    return response.json().then(limites => {
+        historyRange.min = limites.desde;
+        document.getElementById('historial').style.display = '';
+    });
+}).catch(error => console.error("Error consultando la grabación:", error));
+
+historyRange.addEventListener('input', function() {
+    pasoHistorico = parseInt(historyRange.value);
+    fetchAndUpdate();
+});
+
+document.getElementById('liveButton').addEventListener('click', function() {
+    pasoHistorico = null;
+    fetchAndUpdate();
+});
+
+// --- Velocidad: pausa, paso a paso, ritmo y turbo ---
+const pauseButton = document.getElementById('pauseButton');
+const stepButton = document.getElementById('stepButton');
+const speedSelect = document.getElementById('speedSelect');
+const turboInput = document.getElementById('turboInput');
+const speedInfo = document.getElementById('speedInfo');
+
+function mostrarVelocidad(estado) {
+    pauseButton.textContent = estado.pausado ? 'Reanudar' : 'Pausa';
+    stepButton.disabled = !estado.pausado;
+    if (document.activeElement !== turboInput) turboInput.value = estado.turbo;
+    speedInfo.textContent = estado.pausado ? 'En pausa' : `${estado.pasos_por_segundo.toFixed(1)} pasos/s`;
+}
+
+async function enviarVelocidad(ruta, datos) {
+    try {
+        const response = await fetch(ruta, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify(datos)
+        });
+        const estado = await response.json();
+        if (!response.ok) {
+            alert("Error de velocidad: " + estado.message);
+            return;
+        }
+        mostrarVelocidad(estado);
+        if (ruta === '/velocidad/avanzar') setTimeout(fetchAndUpdate, 50);
+    } catch (error) {
+        console.error("Error de conexión al cambiar la velocidad:", error);
+    }
+}
+
+pauseButton.addEventListener('click', () => enviarVelocidad('/velocidad/config', {pausado: pauseButton.textContent === 'Pausa'}));
+stepButton.addEventListener('click', () => enviarVelocidad('/velocidad/avanzar', {pasos: 1}));
+speedSelect.addEventListener('change', () => enviarVelocidad('/velocidad/config', {intervalo_ms: parseFloat(speedSelect.value)}));
+turboInput.addEventListener('change', () => enviarVelocidad('/velocidad/config', {turbo: parseInt(turboInput.value) || 1}));
+
+function actualizarVelocidad() {
+    fetch('/velocidad').then(response => response.json()).then(estado => {
+        mostrarVelocidad(estado);
+        const opcion = [...speedSelect.options].find(o => parseFloat(o.value) === estado.intervalo_ms);
+        if (opcion && document.activeElement !== speedSelect) speedSelect.value = opcion.value;
+    }).catch(error => console.error("Error consultando la velocidad:", error));
+}
+actualizarVelocidad();
+setInterval(actualizarVelocidad, 1000);
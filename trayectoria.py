@@ -0,0 +1,596 @@
+"""Grabación de trayectorias largas: keyframes, deltas por paso e índice mapeable.
+
+Una grabación son dos ficheros:
+
+    <base>.tray   cabecera (MAGIA, versión, ancho, alto) y un registro por paso:
+                  [tipo uint8][longitud uint32][datos]
+                  - keyframe: estado completo (ids, colores, energía, edad, comida
+                    comida, hijos, genes, cuerpos y comida del tablero)
+                  - delta: índices de las muertas, un byte por superviviente
+                    (dirección 0-3 | comió y creció << 2 | tuvo un hijo << 3),
+                    serpientes nuevas (nacimientos y migrantes, con su cuerpo,
+                    genes y contadores) y comida añadida y quitada
+    <base>.idx    cabecera (MAGIA, tick inicial) y una entrada de 16 bytes por paso:
+                  offset del registro en .tray (uint64) y número del registro
+                  keyframe del que parte (uint64)
+
+Las direcciones son las de DIRECCIONES: 0 arriba, 1 abajo, 2 izquierda, 3 derecha.
+Todo es little-endian. Con el índice de ancho fijo, ir a cualquier paso de una
+grabación de millones de pasos es O(1): una entrada del índice, el keyframe y como
+mucho `cada_keyframe` deltas. La edad y los contadores de comida e hijos se
+siguen exactamente con los deltas; la energía solo se conoce en los keyframes.
+
+GrabadorTrayectoria se engancha al final de SimulationManager.step y calcula los
+deltas de las serpientes comparando con el paso anterior (solo guarda cabeza, longitud
+e hijos de cada una, nunca la historia). La comida añadida y quitada se la notifica la
+simulación donde cambia el almacén, así que no recorre la comida en cada paso. LectorTrayectoria mapea los dos ficheros y devuelve arrays de NumPy;
+HistorialTrayectoria sirve fotogramas en el formato de get_state() con caché LRU.
+"""
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections import OrderedDict, deque
+
+try:
+    import numpy as np
+except ImportError: # Solo lo necesita el lector
+    np = None
+
+MAGIA_DATOS = b'EVSNTR'
+MAGIA_INDICE = b'EVSNIX'
+VERSION = 1
+REGISTRO_KEYFRAME = 1
+REGISTRO_DELTA = 2
+DIRECCIONES = ((0, -1), (0, 1), (-1, 0), (1, 0))
+_CODIGO_DIRECCION = {d: i for i, d in enumerate(DIRECCIONES)}
+CRECE = 4
+HIJO = 8
+
+_CABECERA_DATOS = struct.Struct('<6sHII')
+_CABECERA_INDICE = struct.Struct('<6sHq')
+_ENTRADA_INDICE = struct.Struct('<QQ')
+_REGISTRO = struct.Struct('<BI')
+_KEYFRAME = struct.Struct('<III') # paso, serpientes, comida
+_DELTA = struct.Struct('<6I') # paso, muertas, supervivientes, nuevas, comida añadida, comida quitada
+_NUEVA = struct.Struct('<IqIBIqII') # índice en la lista, id, color, nº de genes, longitud, edad, comida, hijos
+
+
+def _a_bytes(codigo, valores):
+    datos = array(codigo, valores)
+    if sys.byteorder == 'big':
+        datos.byteswap()
+    return datos.tobytes()
+
+
+def _pares(posiciones):
+    plano = array('i')
+    for x, y in posiciones:
+        plano.append(x)
+        plano.append(y)
+    if sys.byteorder == 'big':
+        plano.byteswap()
+    return plano.tobytes()
+
+
+class GrabadorTrayectoria:
+    """Graba cada paso de `sim` en <ruta_base>.tray / .idx.
+
+    Si ya hay una grabación en ruta_base que llega hasta sim.tick (p. ej. al retomar un
+    checkpoint), la continúa: conserva los registros anteriores a sim.tick y descarta los
+    posteriores, que la ejecución retomada vuelve a dar. Si no encaja (otro tamaño de
+    tablero, empieza en sim.tick o acaba antes), la aparta a <ruta_base>.<n>.tray/.idx.
+    Al crearse escribe un keyframe del estado actual y se engancha a sim (sim.grabador);
+    a partir de ahí cada step() añade un registro. Cada `cada_keyframe` registros se escribe
+    un keyframe en vez de un delta; un reset (que avanza el tick) escribe el suyo al momento.
+    """
+    def __init__(self, sim, ruta_base, cada_keyframe=1000):
+        self.sim = sim
+        self.cada_keyframe = cada_keyframe
+        os.makedirs(os.path.dirname(os.path.abspath(ruta_base)), exist_ok=True)
+        self.registros = 0
+        self._ultimo_keyframe = 0
+        if not self._continuar(ruta_base, sim):
+            self._datos = open(ruta_base + '.tray', 'wb')
+            self._indice = open(ruta_base + '.idx', 'wb')
+            self._datos.write(_CABECERA_DATOS.pack(MAGIA_DATOS, VERSION, sim.width, sim.height))
+            self._indice.write(_CABECERA_INDICE.pack(MAGIA_INDICE, VERSION, sim.tick))
+            self._offset = _CABECERA_DATOS.size
+        self._keyframe(sim)
+        sim.grabador = self
+
+    def _continuar(self, ruta_base, sim):
+        """Abre para añadir una grabación existente que llega hasta sim.tick, cortada justo
+        antes del registro de sim.tick. False si no hay ninguna (o se ha apartado)."""
+        ruta_datos, ruta_indice = ruta_base + '.tray', ruta_base + '.idx'
+        if not (os.path.exists(ruta_datos) and os.path.exists(ruta_indice)):
+            return False
+        try:
+            with open(ruta_datos, 'rb') as datos, open(ruta_indice, 'rb') as indice:
+                magia, version, width, height = _CABECERA_DATOS.unpack(datos.read(_CABECERA_DATOS.size))
+                magia_indice, version_indice, tick_inicial = _CABECERA_INDICE.unpack(indice.read(_CABECERA_INDICE.size))
+                if (magia, version, magia_indice, version_indice) != (MAGIA_DATOS, VERSION, MAGIA_INDICE, VERSION):
+                    raise ValueError("cabecera no válida")
+                if (width, height) != (sim.width, sim.height):
+                    raise ValueError(f"tablero de {width}x{height}")
+                # Una entrada a medio escribir (corte) no cuenta
+                registros = (os.path.getsize(ruta_indice) - _CABECERA_INDICE.size) // _ENTRADA_INDICE.size
+                conservar = sim.tick - tick_inicial
+                if not 0 < conservar <= registros:
+                    raise ValueError(f"cubre los ticks {tick_inicial}..{tick_inicial + registros - 1} "
+                                     f"y la simulación está en el {sim.tick}")
+                # Fin del último registro conservado
+                indice.seek(_CABECERA_INDICE.size + (conservar - 1) * _ENTRADA_INDICE.size)
+                offset, _ = _ENTRADA_INDICE.unpack(indice.read(_ENTRADA_INDICE.size))
+                datos.seek(offset)
+                _, longitud = _REGISTRO.unpack(datos.read(_REGISTRO.size))
+                fin = offset + _REGISTRO.size + longitud
+                if fin > os.path.getsize(ruta_datos):
+                    raise ValueError("registros incompletos")
+        except (OSError, struct.error, ValueError) as e:
+            self._apartar(ruta_base, e)
+            return False
+        if conservar + 1 < registros: # El de sim.tick se reescribe igual; los siguientes se vuelven a dar
+            logging.warning(f"{ruta_base}: se descartan los {registros - conservar - 1} registros posteriores al tick {sim.tick}.")
+        self._datos = open(ruta_datos, 'r+b')
+        self._indice = open(ruta_indice, 'r+b')
+        self._datos.truncate(fin)
+        self._indice.truncate(_CABECERA_INDICE.size + conservar * _ENTRADA_INDICE.size)
+        self._datos.seek(fin)
+        self._indice.seek(0, os.SEEK_END)
+        self._offset = fin
+        self.registros = conservar
+        logging.info(f"{ruta_base}: se continúa la grabación desde el tick {tick_inicial}.")
+        return True
+
+    @staticmethod
+    def _apartar(ruta_base, motivo):
+        """Renombra una grabación que no se puede continuar a <ruta_base>.<n>.tray/.idx."""
+        n = 1
+        while os.path.exists(f"{ruta_base}.{n}.tray") or os.path.exists(f"{ruta_base}.{n}.idx"):
+            n += 1
+        for extension in ('.tray', '.idx'):
+            os.replace(ruta_base + extension, f"{ruta_base}.{n}{extension}")
+        logging.warning(f"{ruta_base} no se puede continuar ({motivo}); se guarda como {ruta_base}.{n}.")
+
+    def _escribir(self, tipo, partes):
+        longitud = sum(len(p) for p in partes)
+        self._datos.write(_REGISTRO.pack(tipo, longitud))
+        for parte in partes:
+            self._datos.write(parte)
+        if tipo == REGISTRO_KEYFRAME:
+            self._ultimo_keyframe = self.registros
+        self._indice.write(_ENTRADA_INDICE.pack(self._offset, self._ultimo_keyframe))
+        self._offset += _REGISTRO.size + longitud
+        self.registros += 1
+
+    def _recordar(self, sim):
+        """Estado mínimo del paso anterior: cabeza y longitud de cada serpiente, su posición por id y la comida."""
+        self._previas = [(s.cuerpo[0], len(s.cuerpo), s.hijos_generados) for s in sim.serpientes]
+        self._posicion = {s.id: i for i, s in enumerate(sim.serpientes)}
+        self._comida_añadida = set() # Cambios de la comida desde el último registro
+        self._comida_quitada = set()
+
+    def _keyframe(self, sim):
+        serpientes = sim.serpientes
+        genes = array('d')
+        for s in serpientes:
+            genes.extend(s.genes)
+        if sys.byteorder == 'big':
+            genes.byteswap()
+        segmentos = []
+        for s in serpientes:
+            segmentos.extend(s.cuerpo)
+        self._escribir(REGISTRO_KEYFRAME, [
+            _KEYFRAME.pack(sim.paso_actual, len(serpientes), len(sim.comida)),
+            _a_bytes('q', [s.id for s in serpientes]),
+            _a_bytes('I', [s.color_rgb for s in serpientes]),
+            _a_bytes('q', [s.energia for s in serpientes]),
+            _a_bytes('q', [s.edad for s in serpientes]),
+            _a_bytes('I', [s.comida_comida for s in serpientes]),
+            _a_bytes('I', [s.hijos_generados for s in serpientes]),
+            _a_bytes('B', [len(s.genes) for s in serpientes]),
+            genes.tobytes(),
+            _a_bytes('I', [len(s.cuerpo) for s in serpientes]),
+            _pares(segmentos),
+            _pares(sim.comida),
+        ])
+        self._recordar(sim)
+
+    def comida_añadida(self, pos):
+        """Llamado por la simulación al poner comida en pos."""
+        if pos in self._comida_quitada:
+            self._comida_quitada.discard(pos) # Quitada y vuelta a poner en el mismo paso
+        else:
+            self._comida_añadida.add(pos)
+
+    def comida_quitada(self, pos):
+        """Llamado por la simulación al quitar la comida de pos."""
+        if pos in self._comida_añadida:
+            self._comida_añadida.discard(pos) # Puesta y comida en el mismo paso
+        else:
+            self._comida_quitada.add(pos)
+
+    def registrar_reinicio(self, sim):
+        """Llamado por reset(), que ya avanzó el tick: keyframe del estado inicial nuevo."""
+        self._keyframe(sim)
+
+    def registrar_paso(self, sim):
+        """Llamado por step() al terminar cada paso."""
+        if self.registros - self._ultimo_keyframe >= self.cada_keyframe:
+            self._keyframe(sim)
+            return
+        previas = self._previas
+        posicion = self._posicion
+        vivas = [False] * len(previas)
+        movimientos = bytearray()
+        nuevas = []
+        siguientes = []
+        siguiente_posicion = {}
+        ultima = -1
+        for i, s in enumerate(sim.serpientes):
+            cuerpo = s.cuerpo
+            cabeza = cuerpo[0]
+            longitud = len(cuerpo)
+            hijos = s.hijos_generados
+            siguientes.append((cabeza, longitud, hijos))
+            siguiente_posicion[s.id] = i
+            j = posicion.get(s.id)
+            if j is None:
+                nuevas.append((i, s))
+                continue
+            if j < ultima:
+                raise RuntimeError("El orden de las serpientes supervivientes cambió; no se puede grabar como delta")
+            ultima = j
+            vivas[j] = True
+            (hx, hy), longitud_previa, hijos_previos = previas[j]
+            codigo = _CODIGO_DIRECCION[(cabeza[0] - hx, cabeza[1] - hy)]
+            if longitud > longitud_previa:
+                codigo |= CRECE
+            if hijos > hijos_previos: # Como mucho un hijo por paso
+                codigo |= HIJO
+            movimientos.append(codigo)
+        muertas = [j for j, viva in enumerate(vivas) if not viva] if len(movimientos) < len(previas) else []
+        añadida, quitada = self._comida_añadida, self._comida_quitada
+        partes = [_DELTA.pack(sim.paso_actual, len(muertas), len(movimientos), len(nuevas), len(añadida), len(quitada)),
+                  _a_bytes('I', muertas), bytes(movimientos), _pares(añadida), _pares(quitada)]
+        for i, s in nuevas:
+            partes.append(_NUEVA.pack(i, s.id, s.color_rgb, len(s.genes), len(s.cuerpo), s.edad, s.comida_comida,
+                                      s.hijos_generados))
+            partes.append(_a_bytes('d', s.genes))
+            partes.append(_pares(s.cuerpo))
+        self._escribir(REGISTRO_DELTA, partes)
+        self._previas = siguientes
+        self._posicion = siguiente_posicion
+        self._comida_añadida = set()
+        self._comida_quitada = set()
+
+    def volcar(self):
+        """Escribe a disco lo pendiente para que un lector vea los últimos pasos."""
+        self._datos.flush()
+        self._indice.flush()
+
+    def cerrar(self):
+        if self.sim.grabador is self:
+            self.sim.grabador = None
+        self._datos.close()
+        self._indice.close()
+
+
+class LectorTrayectoria:
+    """Lee una grabación con mmap; estado(tick) reconstruye cualquier paso en O(cada_keyframe)."""
+    def __init__(self, ruta_base):
+        if np is None:
+            raise ImportError("LectorTrayectoria necesita NumPy")
+        with open(ruta_base + '.idx', 'rb') as f:
+            magia, version, self.tick_inicial = _CABECERA_INDICE.unpack(f.read(_CABECERA_INDICE.size))
+        if magia != MAGIA_INDICE or version != VERSION:
+            raise ValueError(f"{ruta_base}.idx no es un índice de trayectoria válido")
+        self._indice = np.memmap(ruta_base + '.idx', dtype=[('offset', '<u8'), ('keyframe', '<u8')], mode='r',
+                                 offset=_CABECERA_INDICE.size)
+        self._fichero = open(ruta_base + '.tray', 'rb')
+        self._datos = mmap.mmap(self._fichero.fileno(), 0, access=mmap.ACCESS_READ)
+        magia, version, self.width, self.height = _CABECERA_DATOS.unpack_from(self._datos, 0)
+        if magia != MAGIA_DATOS or version != VERSION:
+            raise ValueError(f"{ruta_base}.tray no es una trayectoria válida")
+
+    def __len__(self):
+        return len(self._indice)
+
+    @property
+    def tick_final(self):
+        return self.tick_inicial + len(self) - 1
+
+    def cerrar(self):
+        # El índice también es un mmap: si queda abierto, en Windows el .idx no se puede sobrescribir ni borrar
+        mapa = getattr(self._indice, '_mmap', None)
+        self._indice = None
+        if mapa is not None:
+            mapa.close()
+        self._datos.close()
+        self._fichero.close()
+
+    def _registro(self, numero):
+        offset = int(self._indice[numero]['offset'])
+        tipo, longitud = _REGISTRO.unpack_from(self._datos, offset)
+        return tipo, offset + _REGISTRO.size
+
+    def _numero(self, tick):
+        numero = tick - self.tick_inicial
+        if not 0 <= numero < len(self._indice):
+            raise IndexError(f"Tick {tick} fuera de la grabación ({self.tick_inicial}..{self.tick_final})")
+        return numero
+
+    # --- Decodificación a un estado de trabajo ---
+    # Cada serpiente es [id, color, genes, cuerpo (deque de pares), edad, comida, hijos, energía]
+    def _leer(self, dtype, pos, n):
+        datos = np.frombuffer(self._datos, dtype=dtype, count=n, offset=pos)
+        return datos, pos + datos.nbytes
+
+    def _decodificar_keyframe(self, inicio):
+        paso, n, num_comida = _KEYFRAME.unpack_from(self._datos, inicio)
+        pos = inicio + _KEYFRAME.size
+        ids, pos = self._leer('<i8', pos, n)
+        colores, pos = self._leer('<u4', pos, n)
+        energias, pos = self._leer('<i8', pos, n)
+        edades, pos = self._leer('<i8', pos, n)
+        comidas, pos = self._leer('<u4', pos, n)
+        hijos, pos = self._leer('<u4', pos, n)
+        num_genes, pos = self._leer('<u1', pos, n)
+        genes, pos = self._leer('<f8', pos, int(num_genes.sum()))
+        longitudes, pos = self._leer('<u4', pos, n)
+        segmentos, pos = self._leer('<i4', pos, 2 * int(longitudes.sum()))
+        comida, pos = self._leer('<i4', pos, 2 * num_comida)
+        corte_genes = np.concatenate(([0], np.cumsum(num_genes, dtype=np.int64))).tolist()
+        corte = np.concatenate(([0], np.cumsum(longitudes, dtype=np.int64))).tolist()
+        genes = genes.tolist()
+        pares = list(map(tuple, segmentos.reshape(-1, 2).tolist()))
+        serpientes = [[i, c, genes[corte_genes[k]:corte_genes[k + 1]], deque(pares[corte[k]:corte[k + 1]]), e, co, h, en]
+                      for k, (i, c, en, e, co, h) in enumerate(zip(ids.tolist(), colores.tolist(), energias.tolist(),
+                                                                   edades.tolist(), comidas.tolist(), hijos.tolist()))]
+        comida = set(map(tuple, comida.reshape(-1, 2).tolist()))
+        return {'paso': paso, 'serpientes': serpientes, 'comida': comida, 'keyframe': True}
+
+    def _leer_delta(self, inicio):
+        paso, n_muertas, n_sup, n_nuevas, n_añadida, n_quitada = _DELTA.unpack_from(self._datos, inicio)
+        pos = inicio + _DELTA.size
+        muertas, pos = self._leer('<u4', pos, n_muertas)
+        movimientos, pos = self._leer('<u1', pos, n_sup)
+        añadida, pos = self._leer('<i4', pos, 2 * n_añadida)
+        quitada, pos = self._leer('<i4', pos, 2 * n_quitada)
+        nuevas = []
+        for _ in range(n_nuevas):
+            indice, id_serpiente, color, num_genes, longitud, edad, comida, hijos = _NUEVA.unpack_from(self._datos, pos)
+            pos += _NUEVA.size
+            genes, pos = self._leer('<f8', pos, num_genes)
+            cuerpo, pos = self._leer('<i4', pos, 2 * longitud)
+            nuevas.append((indice, id_serpiente, color, genes, cuerpo.reshape(-1, 2), edad, comida, hijos))
+        return paso, muertas, movimientos, añadida.reshape(-1, 2), quitada.reshape(-1, 2), nuevas
+
+    def _aplicar_delta(self, estado, inicio):
+        paso, muertas, movimientos, añadida, quitada, nuevas = self._leer_delta(inicio)
+        serpientes = estado['serpientes']
+        if len(muertas):
+            quitar = set(muertas.tolist())
+            serpientes = [s for j, s in enumerate(serpientes) if j not in quitar]
+        for s, codigo in zip(serpientes, movimientos.tolist()):
+            cuerpo = s[3]
+            x, y = cuerpo[0]
+            dx, dy = DIRECCIONES[codigo & 3]
+            cuerpo.appendleft((x + dx, y + dy))
+            s[4] += 1
+            if codigo & CRECE:
+                s[5] += 1
+            else:
+                cuerpo.pop()
+            if codigo & HIJO:
+                s[6] += 1
+        for indice, id_serpiente, color, genes, cuerpo, edad, comida, hijos in nuevas:
+            serpientes.insert(indice, [id_serpiente, color, genes.tolist(), deque(map(tuple, cuerpo.tolist())),
+                                       edad, comida, hijos, None])
+        comida = estado['comida']
+        comida.difference_update(map(tuple, quitada.tolist()))
+        comida.update(map(tuple, añadida.tolist()))
+        estado['serpientes'] = serpientes
+        estado['paso'] = paso
+        estado['keyframe'] = False # La energía solo se conoce en los keyframes
+
+    def _estados(self, desde, hasta, previos=False):
+        """Genera (tick, estado de trabajo) de desde a hasta; con previos=True, también los
+        del keyframe de partida en adelante (se decodifican igualmente). El estado se
+        modifica en el sitio de un paso al siguiente."""
+        numero = self._numero(desde)
+        primero = int(self._indice[numero]['keyframe'])
+        estado = None
+        for actual in range(primero, self._numero(hasta) + 1):
+            tipo, inicio = self._registro(actual)
+            if tipo == REGISTRO_KEYFRAME:
+                estado = self._decodificar_keyframe(inicio)
+            else:
+                self._aplicar_delta(estado, inicio)
+            if previos or actual >= numero:
+                yield self.tick_inicial + actual, estado
+
+    # --- API pública ---
+    def iterar(self, desde=None, hasta=None):
+        """Genera (tick, estado) de desde a hasta (incluido), decodificando cada registro una vez."""
+        desde = self.tick_inicial if desde is None else desde
+        hasta = self.tick_final if hasta is None else hasta
+        for tick, estado in self._estados(desde, hasta):
+            yield tick, self._a_numpy(estado)
+
+    def estado(self, tick):
+        """Estado del tick como arrays de NumPy (ver _a_numpy)."""
+        return next(self.iterar(tick, tick))[1]
+
+    def delta(self, tick):
+        """Cambios del paso `tick` en bruto: None si ese registro es un keyframe."""
+        tipo, inicio = self._registro(self._numero(tick))
+        if tipo == REGISTRO_KEYFRAME:
+            return None
+        paso, muertas, movimientos, añadida, quitada, nuevas = self._leer_delta(inicio)
+        return {'paso': paso, 'muertas_indices': muertas, 'direcciones': movimientos & 3,
+                'crece': (movimientos & CRECE) != 0, 'hijo': (movimientos & HIJO) != 0,
+                'comida_añadida': añadida, 'comida_quitada': quitada,
+                'nuevas_ids': np.array([n[1] for n in nuevas], dtype=np.int64)}
+
+    def _a_numpy(self, estado):
+        """ids, colores, edades, comidas, hijos, longitudes, inicio (offset de cada cuerpo en
+        segmentos), segmentos (M, 2), cabezas (N, 2), genes (N, G; NaN si hay menos genes) y
+        comida (F, 2). energias solo viene en los pasos que son keyframe (si no, None)."""
+        serpientes = estado['serpientes']
+        n = len(serpientes)
+        longitudes = np.array([len(s[3]) for s in serpientes], dtype=np.int64)
+        inicio = np.concatenate(([0], np.cumsum(longitudes)[:-1])).astype(np.int64) if n else np.zeros(0, dtype=np.int64)
+        segmentos = np.array([seg for s in serpientes for seg in s[3]], dtype=np.int32).reshape(-1, 2)
+        max_genes = max((len(s[2]) for s in serpientes), default=0)
+        genes = np.full((n, max_genes), np.nan)
+        for k, s in enumerate(serpientes):
+            genes[k, :len(s[2])] = s[2]
+        return {
+            'paso': estado['paso'],
+            'ids': np.array([s[0] for s in serpientes], dtype=np.int64),
+            'colores': np.array([s[1] for s in serpientes], dtype=np.uint32),
+            'edades': np.array([s[4] for s in serpientes], dtype=np.int64),
+            'comidas': np.array([s[5] for s in serpientes], dtype=np.int64),
+            'hijos': np.array([s[6] for s in serpientes], dtype=np.int64),
+            'energias': np.array([s[7] for s in serpientes], dtype=np.int64) if estado['keyframe'] else None,
+            'longitudes': longitudes,
+            'inicio': inicio,
+            'segmentos': segmentos,
+            'cabezas': segmentos[inicio] if n else np.zeros((0, 2), dtype=np.int32),
+            'genes': genes,
+            'comida': np.array(sorted(estado['comida']), dtype=np.int32).reshape(-1, 2),
+        }
+
+
+def _fotograma(tick, estado, width, height):
+    """Estado de trabajo en el formato de SimulationManager.get_state()."""
+    keyframe = estado['keyframe']
+    return {
+        'paso': estado['paso'],
+        'tick': tick,
+        'historico': True,
+        'serpientes': [
+            {
+                'id': s[0],
+                'cuerpo': list(s[3]),
+                'color': f'#{s[1]:06x}',
+                'energia': s[7] if keyframe else None,
+                'edad': s[4],
+                'comida_comida': s[5],
+                'hijos': s[6],
+                'genes_display': [round(g, 2) for g in s[2][:3]],
+            } for s in estado['serpientes']
+        ],
+        'comida': sorted(estado['comida']),
+        'dimensiones': {'width': width, 'height': height},
+    }
+
+
+class HistorialTrayectoria:
+    """Fotogramas pasados de una grabación, en el formato de get_state(), con caché LRU.
+
+    Si se da el `grabador` de la ejecución en curso y ha escrito registros que el lector no
+    ve, antes de leerlos vuelca sus buffers (con `bloqueo`, el lock de la simulación) y
+    reabre el lector; el anterior se cierra cuando no lo usa ningún rango en curso.
+    Un fallo de caché decodifica desde el keyframe y guarda todos los fotogramas del
+    camino, así que moverse adelante y atrás cerca de un paso ya visto es inmediato.
+    """
+    def __init__(self, ruta_base, grabador=None, bloqueo=None, capacidad=2000):
+        self.ruta_base = ruta_base
+        self.grabador = grabador
+        self.bloqueo = bloqueo
+        self.capacidad = capacidad
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._lector = None
+        self._usos = {} # Lector -> lecturas en curso (fotogramas que se decodifican, rangos abiertos)
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _tomar_lector(self, tick=None):
+        """Lector que cubre `tick` (None: hasta el último paso grabado), apuntado como en uso;
+        devolverlo con _soltar_lector. Solo se reabre si el grabador ha escrito registros que
+        el lector actual no ve (y entonces se vuelcan sus buffers con el lock de la simulación)."""
+        with self._lock:
+            lector = self._lector
+            if lector is None or (self.grabador is not None and (tick is None or tick > lector.tick_final)
+                                  and self.grabador.registros > len(lector)):
+                anterior = lector
+                if self.grabador is not None and self.bloqueo is not None:
+                    # Abrir antes de soltar el lock: índice y datos quedan volcados hasta el mismo registro
+                    with self.bloqueo:
+                        self.grabador.volcar()
+                        lector = LectorTrayectoria(self.ruta_base)
+                else:
+                    if self.grabador is not None:
+                        self.grabador.volcar()
+                    lector = LectorTrayectoria(self.ruta_base)
+                self._lector = lector
+                if anterior is not None and not self._usos.get(anterior):
+                    self._usos.pop(anterior, None)
+                    anterior.cerrar() # Si hay un rango en curso, lo cierra el último en soltarlo
+            self._usos[lector] = self._usos.get(lector, 0) + 1
+            return lector
+
+    def _soltar_lector(self, lector):
+        with self._lock:
+            self._usos[lector] -= 1
+            if not self._usos[lector] and lector is not self._lector:
+                del self._usos[lector]
+                lector.cerrar()
+
+    def limites(self):
+        lector = self._tomar_lector()
+        try:
+            return {'desde': lector.tick_inicial, 'hasta': lector.tick_final,
+                    'fotogramas_en_cache': len(self._cache), 'aciertos': self.aciertos, 'fallos': self.fallos}
+        finally:
+            self._soltar_lector(lector)
+
+    def fotograma(self, tick):
+        """Fotograma del tick; IndexError si no está grabado."""
+        with self._lock:
+            fotograma = self._cache.get(tick)
+            if fotograma is not None:
+                self._cache.move_to_end(tick)
+                self.aciertos += 1
+                return fotograma
+            self.fallos += 1
+        lector = self._tomar_lector(tick)
+        try:
+            nuevos = [(t, _fotograma(t, estado, lector.width, lector.height))
+                      for t, estado in lector._estados(tick, tick, previos=True)]
+        finally:
+            self._soltar_lector(lector)
+        with self._lock:
+            for t, f in nuevos:
+                self._cache[t] = f
+                self._cache.move_to_end(t)
+            while len(self._cache) > self.capacidad:
+                self._cache.popitem(last=False)
+        return nuevos[-1][1]
+
+    def rango(self, desde, hasta, cada=1):
+        """Genera los fotogramas de desde a hasta (incluido) de `cada` en `cada`, decodificando
+        en secuencia. No pasa por la caché para no desalojar lo que se está mirando."""
+        lector = self._tomar_lector(hasta)
+        try:
+            hasta = min(hasta, lector.tick_final)
+            for tick, estado in lector._estados(desde, hasta):
+                if (tick - desde) % cada == 0:
+                    yield _fotograma(tick, estado, lector.width, lector.height)
+        finally:
+            self._soltar_lector(lector) # También si el cliente corta el stream
+
+    def cerrar(self):
+        """Cierra el lector actual (los que estén en uso se cierran al soltarlos)."""
+        with self._lock:
+            lector, self._lector = self._lector, None
+            if lector is not None and not self._usos.get(lector):
+                self._usos.pop(lector, None)
+                lector.cerrar()